@@ -7,8 +7,23 @@
 
 from common.Control import Control
 from common.Streaming import Data
-from common.Stream import Streaming
+from common.Streaming.ParserContext import ParserContext
+from common.Stream import Streaming, UdpStreaming
 from common.Streaming.BlobServerConfiguration import BlobClientConfig
+from common.data_io.FrameRecorder import FrameRecorder
+from common.PointCloud.RayTable import RayTableCache, DEFAULT_CACHE_DIRECTORY, cam2worldOf
+from common.PointCloud.OrganizedCloud import OrganizedCloud
+from common.PointCloud.HeightMap import HeightMapGrid
+from common.PointCloud.VoxelGrid import VoxelGrid
+from common.PointCloud.SurfaceNormals import NormalEstimator
+from common.Measurement.HeightEstimator import blockTrimmedMeans
+from common.Measurement.BoxDetector import BoxDetector
+from common.Measurement.VolumeEstimator import estimateVolume, polygonRegion
+from common.Measurement.SupportPlane import ReferencePlane, DEFAULT_PLANE_FILE
+from common.Filtering.TemporalFilter import TemporalDepthFilter
+from common.Filtering.SpatialFilter import SpatialDepthFilter
+from common.Filtering.FlyingPixel import FlyingPixelFilter
+from common.UnitConversion import getDistanceToMMFactor
 from Qcommon.decorators import retry, require_connection, safe_disconnect
 import cv2
 import numpy as np
@@ -31,10 +46,17 @@ class QtVisionSick:
     """
     西克相机控制类
     用于获取相机的强度图数据
-    该类获取的流默认为TCP流,如果需要UDP流,请参考sick_visionary_python_samples/visionary_StreamingDemo.py
+    该类获取的流默认为TCP流,如需UDP流请设置transport_protocol="UDP"(分片由UdpStreaming重组)
     """
     
-    def __init__(self, ipAddr="192.168.10.5", port=2122, protocol="Cola2", use_single_step=False):
+    def __init__(self, ipAddr="192.168.10.5", port=2122, protocol="Cola2", use_single_step=False,
+                 use_acquisition_thread=False, max_frame_age_ms=50, frame_timeout=5.0,
+                 transport_protocol="TCP", udp_receiver_ip="", udp_max_packet_size=1024,
+                 record_directory=None, record_budget_mb=2048, ray_table_directory=DEFAULT_CACHE_DIRECTORY,
+                 temporal_filter=None, temporal_filter_frames=5, temporal_jump_threshold_mm=50.0,
+                 spatial_median_size=0, spatial_bilateral_diameter=0, spatial_bilateral_sigma_mm=30.0,
+                 spatial_inpaint_radius=0, flying_pixel_filter=False, flying_pixel_jump_mm=20.0,
+                 flying_pixel_max_angle_deg=15.0, reference_plane_file=DEFAULT_PLANE_FILE):
         """
         初始化西克相机
         
@@ -42,6 +64,26 @@ class QtVisionSick:
             ipAddr (str): 相机IP地址
             port (int): 相机控制端口
             protocol (str): 通信协议
+            use_acquisition_thread (bool): 连续流模式下是否使用后台采集线程持续接收，只保留最新帧
+            max_frame_age_ms (float): 使用采集线程时可直接返回的最新帧的最大帧龄(毫秒)，超过则等待下一帧
+            frame_timeout (float): 使用采集线程时等待下一帧的超时时间(秒)
+            transport_protocol (str): 数据流传输协议，"TCP"或"UDP"
+            udp_receiver_ip (str): UDP模式下本机接收数据的IP地址(相机发送的目标地址)，为空时使用控制连接的本机地址
+            udp_max_packet_size (int): UDP模式下每个分片的最大字节数
+            record_directory (str): 原始帧录制目录，设置后接收到的每一帧都写入该目录(后台线程，不阻塞采集)
+            record_budget_mb (int): 录制文件占用的最大磁盘空间(MB)，超出后删除最旧的分段
+            ray_table_directory (str): 像素射线查找表的缓存目录，重启后无需重新计算；为None时只缓存在内存中
+            temporal_filter (str): 时域深度滤波，None(关闭)、"median"、"ema"或"confidence"(置信度加权平均)
+            temporal_filter_frames (int): 时域滤波使用的最近帧数
+            temporal_jump_threshold_mm (float): 单个像素深度跳变超过该值(毫米)时丢弃该像素的历史(如箱体进入视野)
+            spatial_median_size (int): 空间中值滤波核大小(3或5)，0为关闭
+            spatial_bilateral_diameter (int): 保边双边滤波的邻域直径(像素)，0为关闭
+            spatial_bilateral_sigma_mm (float): 双边滤波的深度sigma(毫米)
+            spatial_inpaint_radius (int): 无效像素小孔洞修补(inpaint)半径，0为关闭
+            flying_pixel_filter (bool): 是否去除物体边缘的飞点(前景与背景之间的混合像素)
+            flying_pixel_jump_mm (float): 飞点检测的最小深度跳变(毫米)
+            flying_pixel_max_angle_deg (float): 相邻点连线与视线的最大夹角(度)，小于该角度视为飞点边缘
+            reference_plane_file (str): 空输送线参考平面的缓存文件(JSON)，重启后无需重新学习；为None时只保存在内存中
         """
         self.ipAddr = ipAddr
         self.control_port = port  # 控制端口
@@ -53,6 +95,38 @@ class QtVisionSick:
         self.logger = LogManager().get_logger()
         self.camera_params = None  # 存储相机参数
         self.use_single_step = False  # 默认使用单步模式
+        self.parser_context = ParserContext()  # 跨帧缓存XML解析结果和帧布局
+        self.use_acquisition_thread = use_acquisition_thread
+        self.max_frame_age_ms = max_frame_age_ms
+        self.frame_timeout = frame_timeout
+        self._last_frame = None  # 上一帧的缓冲区，取下一帧时归还给帧缓冲池
+        self._frame_sequence = 0  # 每接收一个新帧加1，同一帧被多次取用时不变(时域滤波据此跳过重复帧)
+        self._acquired_sequence = None  # 采集线程上次交付帧的序号
+        self.transport_protocol = transport_protocol
+        self.udp_receiver_ip = udp_receiver_ip
+        self.udp_max_packet_size = udp_max_packet_size
+        self.record_directory = record_directory
+        self.record_budget_mb = record_budget_mb
+        self.recorder = None
+        self.ray_tables = RayTableCache(ray_table_directory)  # 按相机内参缓存的像素射线表
+        self.temporal_filter = None  # 时域深度滤波，每个解析的帧都经过该滤波
+        if temporal_filter is not None:
+            self.temporal_filter = TemporalDepthFilter(temporal_filter_frames, temporal_filter,
+                                                       jumpThreshold=temporal_jump_threshold_mm)
+        self.spatial_filter = None  # 空间滤波，在原始uint16距离数据上进行，先于时域滤波
+        self.spatial_bilateral_sigma_mm = spatial_bilateral_sigma_mm
+        if spatial_median_size or spatial_bilateral_diameter or spatial_inpaint_radius:
+            self.spatial_filter = SpatialDepthFilter(medianSize=spatial_median_size,
+                                                     bilateralDiameter=spatial_bilateral_diameter,
+                                                     inpaintRadius=spatial_inpaint_radius)
+        self.box_detector = BoxDetector()  # 高度图上的多箱体检测与尺寸测量，参数可直接修改
+        self.flying_pixel_filter = None  # 飞点去除，在空间/时域滤波之后进行
+        if flying_pixel_filter:
+            self.flying_pixel_filter = FlyingPixelFilter(flying_pixel_jump_mm,
+                                                         maxRayAngle=flying_pixel_max_angle_deg)
+        # 空输送线的参考平面(相机坐标系)，高度相对于该平面计算；每个空帧检查漂移，只在平面移动后重新估计
+        self.reference_plane = ReferencePlane(reference_plane_file)
+        self.normal_estimator = NormalEstimator()  # 有序点云的逐像素法向量和深度梯度，缓冲区按图像尺寸复用
         
     def _check_camera_available(self):
         """
@@ -90,6 +164,8 @@ class QtVisionSick:
             raise ConnectionError(f"Camera at {self.ipAddr}:{self.control_port} is not accessible")
             
         self.use_single_step = use_single_step
+        if self.temporal_filter is not None:
+            self.temporal_filter.reset()  # 不同连接之间的帧不参与同一滤波
         
         # 创建设备控制实例
         self.deviceControl = Control(self.ipAddr, self.protocol, self.control_port)
@@ -125,12 +201,38 @@ class QtVisionSick:
         
         # 配置流设置
         streamingSettings = BlobClientConfig()
-        streamingSettings.setTransportProtocol(self.deviceControl, streamingSettings.PROTOCOL_TCP)
-        streamingSettings.setBlobTcpPort(self.deviceControl, self.streaming_port)
+        if self.transport_protocol == "UDP":
+            # 相机必须知道发送的目标地址：未指定时取控制连接所在网卡的本机地址(到相机的路由)
+            receiver_ip = self.udp_receiver_ip or self.deviceControl.getLocalIpAddress()
+            self.logger.info(f"UDP数据流发送到 {receiver_ip}:{self.streaming_port}")
+            streamingSettings.setTransportProtocol(self.deviceControl, streamingSettings.PROTOCOL_UDP)
+            streamingSettings.setBlobUdpReceiverPort(self.deviceControl, self.streaming_port)
+            streamingSettings.setBlobUdpReceiverIP(self.deviceControl, receiver_ip)
+            streamingSettings.setBlobUdpControlPort(self.deviceControl, self.streaming_port)
+            streamingSettings.setBlobUdpMaxPacketSize(self.deviceControl, self.udp_max_packet_size)
+            streamingSettings.setBlobUdpHeartbeatInterval(self.deviceControl, 0)
+            streamingSettings.setBlobUdpHeaderEnabled(self.deviceControl, True)  # 重组分片需要UDP头
+            streamingSettings.setBlobUdpFecEnabled(self.deviceControl, False)
+            streamingSettings.setBlobUdpAutoTransmit(self.deviceControl, True)
+        else:
+            streamingSettings.setTransportProtocol(self.deviceControl, streamingSettings.PROTOCOL_TCP)
+            streamingSettings.setBlobTcpPort(self.deviceControl, self.streaming_port)
         
-        # 初始化流
-        self.streaming_device = Streaming(self.ipAddr, self.streaming_port)
+        # 初始化流，重新连接后设备配置可能已变化，丢弃缓存的帧布局
+        self.parser_context.reset()
+        self._last_frame = None
+        if self.transport_protocol == "UDP":
+            self.streaming_device = UdpStreaming(self.udp_receiver_ip, self.streaming_port, deviceIpAddress=self.ipAddr)
+        else:
+            self.streaming_device = Streaming(self.ipAddr, self.streaming_port)
         self.streaming_device.openStream()
+        if self.record_directory:
+            if self.recorder is None:
+                budget = self.record_budget_mb * 1024 * 1024
+                self.recorder = FrameRecorder(self.record_directory, segmentSize=min(256 * 1024 * 1024, budget // 4),
+                                              diskBudget=budget)
+                self.recorder.start()
+            self.streaming_device.setRecorder(self.recorder)
         
         # 根据模式决定流的处理方式
         if self.use_single_step:
@@ -140,6 +242,7 @@ class QtVisionSick:
         else:
             self.logger.info("使用连续流模式，启动流")
             self.deviceControl.startStream()
+            self._start_acquisition()
         
         self.is_connected = True
         self.logger.info("Successfully connected to camera")
@@ -221,234 +324,393 @@ class QtVisionSick:
         except Exception:
             return False, (0, 0, 0)
 
+    def _organized_cloud_from_data(self, myData, world=True):
+        """
+        将已解析帧的深度图转换为有序点云
+        
+        Args:
+            myData: 已解析的帧数据
+            world (bool): True为世界坐标系(cam2worldMatrix无效时为相机坐标系)，False为相机坐标系
+            
+        Returns:
+            OrganizedCloud: 有序点云，缺少深度图或相机参数时返回None
+        """
+        if not myData.hasDepthMap:
+            raise ValueError("No depth map data available")
+        camera_params = myData.cameraParams
+        
+        # 检查相机参数是否有必要的属性
+        required_attrs = ['width', 'height', 'cx', 'cy', 'fx', 'fy', 'k1', 'k2', 'f2rc', 'cam2worldMatrix']
+        for attr in required_attrs:
+            if not hasattr(camera_params, attr):
+                return None
+        
+        # 按内参缓存的射线表(已包含畸变校正和cam2world变换)，每个像素只需几次乘加
+        ray_table = self.ray_tables.get(camera_params, withCam2world=world)
+        depthmap = myData.depthmap
+        return OrganizedCloud.fromDepth(depthmap.distance, ray_table, world=world,
+                                        frameNumber=depthmap.frameNumber, timestamp=depthmap.timestamp)
+
     @require_connection
-    def get_3d_coordinates(self):
+    def get_organized_cloud(self, world=True):
         """
-        获取整个画面3D坐标中的z坐标
+        获取整个画面的有序点云
         
+        Args:
+            world (bool): True为世界坐标系(cam2worldMatrix无效时为相机坐标系)，False为相机坐标系
+            
         Returns:
-            tuple: (success, 3d_coordinates_list)
-                success (bool): 是否成功获取3D坐标
-                3d_coordinates_list (list): 包含所有像素点3D坐标的列表，每个元素为(x, y, z)元组
+            OrganizedCloud: (H, W, 3) float32点云和有效性掩码，无效点为(0, 0, 0)；失败时返回None
         """
         try:
-            # 获取帧数据
-            myData = self._get_parsed_frame_data()
-            if not myData.hasDepthMap:
-                raise ValueError("No depth map data available")
-            
-            # 获取深度数据和相机参数
-            depth_data = np.array(myData.depthmap.distance)
-            camera_params = myData.cameraParams
-            
-            # 检查相机参数是否有必要的属性（复用_calculate_3d_coordinates_from_depth的检查逻辑）
-            required_attrs = ['width', 'height', 'cx', 'cy', 'fx', 'fy', 'k1', 'k2', 'f2rc', 'cam2worldMatrix']
-            for attr in required_attrs:
-                if not hasattr(camera_params, attr):
-                    return False, []
-            
-            # 获取图像尺寸
-            width = camera_params.width
-            height = camera_params.height
-            
-            # 创建像素坐标网格
-            x_coords, y_coords = np.meshgrid(np.arange(width), np.arange(height))
-            x_coords = x_coords.flatten()
-            y_coords = y_coords.flatten()
-            
-            # 检查深度值有效性
-            valid_mask = depth_data > 0
-            
-            # 计算相机坐标系下的x和y坐标（矩阵化计算）
-            xp = (camera_params.cx - x_coords) / camera_params.fx
-            yp = (camera_params.cy - y_coords) / camera_params.fy
-            
-            # 计算径向畸变（矩阵化计算）
-            r2 = xp * xp + yp * yp
-            r4 = r2 * r2
-            k = 1 + camera_params.k1 * r2 + camera_params.k2 * r4
-            
-            xd = xp * k
-            yd = yp * k
-            
-            # 计算相机坐标系下的坐标（矩阵化计算）
-            s0 = np.sqrt(xd*xd + yd*yd + 1)
-            x_cam = xd * depth_data / s0
-            y_cam = yd * depth_data / s0
-            z_cam = depth_data / s0 - camera_params.f2rc
-            
-            # 转换到世界坐标系（如果变换矩阵有效）
-            if hasattr(camera_params.cam2worldMatrix, '__len__') and len(camera_params.cam2worldMatrix) == 16:
-                m_c2w = np.array(camera_params.cam2worldMatrix).reshape(4, 4)
-                x_world = (m_c2w[0, 3] + z_cam * m_c2w[0, 2] + y_cam * m_c2w[0, 1] + x_cam * m_c2w[0, 0])
-                y_world = (m_c2w[1, 3] + z_cam * m_c2w[1, 2] + y_cam * m_c2w[1, 1] + x_cam * m_c2w[1, 0])
-                z_world = (m_c2w[2, 3] + z_cam * m_c2w[2, 2] + y_cam * m_c2w[2, 1] + x_cam * m_c2w[2, 0])
-                final_coords = np.column_stack([x_world, y_world, z_world])
-            else:
-                # 使用相机坐标系坐标
-                final_coords = np.column_stack([x_cam, y_cam, z_cam])
-            
-            # 应用有效性掩码，无效点设为(0, 0, 0)
-            final_coords[~valid_mask] = [0.0, 0.0, 0.0]
-            
-            # 转换为元组列表
-            coordinates_3d = [tuple(coord) for coord in final_coords]
+            return self._organized_cloud_from_data(self._get_parsed_frame_data(), world)
+        except Exception as e:
+            self.logger.error(f"获取点云失败: {e}")
+            return None
+
+    @require_connection
+    def get_voxel_grid(self, voxel_size_mm=10.0, world=True):
+        """
+        获取一帧点云的体素网格索引，用于区域查询、最近邻和最高点查找(亚毫秒)以及体素降采样
+        
+        Args:
+            voxel_size_mm (float): 体素边长(毫米)
+            world (bool): True为世界坐标系(cam2worldMatrix无效时为相机坐标系)，False为相机坐标系
             
-            return True, coordinates_3d
+        Returns:
+            VoxelGrid: 查询返回的点索引即像素索引(与get_3d_coordinates列表的下标一致)，失败时返回None
+        """
+        try:
+            myData = self._get_parsed_frame_data()
+            cloud = self._organized_cloud_from_data(myData, world)
+            if cloud is None:
+                self.logger.error("无法获取点云数据")
+                return None
+            # 无回波的像素(约65米处)不参与索引
+            valid = cloud.valid & self._measured_mask(myData).reshape(cloud.valid.shape)
+            return VoxelGrid(cloud, voxel_size_mm, valid)
+        except Exception as e:
+            self.logger.error(f"生成体素网格失败: {e}")
+            return None
+
+    @require_connection
+    def get_surface_normals(self, window_size=5, method="gradient", world=True):
+        """
+        获取一帧点云的逐像素表面法向量和深度梯度幅值，用于判断箱体顶面是否水平、倾斜或压损
+        
+        Args:
+            window_size (int): 邻域窗口边长(像素，奇数)
+            method (str): "gradient"(差分叉乘)或"covariance"(邻域协方差最小特征向量，另外给出曲率)。
+                424x512时gradient约7毫秒，covariance约20毫秒(九个矩平面的盒式滤波和逐像素特征分解)，
+                仅在需要曲率(边缘、压损检测)时使用covariance
+            world (bool): True为世界坐标系(cam2worldMatrix无效时为相机坐标系)，False为相机坐标系
             
+        Returns:
+            SurfaceNormals: (H, W, 3)单位法向量(指向相机)、有效性掩码、深度梯度(毫米/像素)和曲率，
+            数组在下一次调用时被覆盖；失败时返回None
+        """
+        try:
+            myData = self._get_parsed_frame_data()
+            cloud = self._organized_cloud_from_data(myData, world)
+            if cloud is None:
+                self.logger.error("无法获取点云数据")
+                return None
+            estimator = self.normal_estimator
+            if (estimator.windowSize, estimator.method) != (window_size, method):
+                estimator = self.normal_estimator = NormalEstimator(window_size, method)
+            # 法向量朝向相机：世界坐标系下为相机位置，相机坐标系下为原点
+            ray_table = self.ray_tables.get(myData.cameraParams, withCam2world=world)
+            viewpoint = (0.0, 0.0, 0.0)
+            if world and ray_table.worldOrigin is not None:
+                viewpoint = ray_table.worldOrigin
+            valid = cloud.valid & self._measured_mask(myData).reshape(cloud.valid.shape)
+            return estimator.estimate(cloud, valid, viewpoint)
         except Exception as e:
-            self.logger.error(f"获取3D坐标失败: {e}")
+            self.logger.error(f"计算表面法向量失败: {e}")
+            return None
+
+    @require_connection
+    def get_3d_coordinates(self):
+        """
+        获取整个画面3D坐标中的z坐标(兼容接口，新代码请使用get_organized_cloud)
+        
+        Returns:
+            tuple: (success, 3d_coordinates_list)
+                success (bool): 是否成功获取3D坐标
+                3d_coordinates_list (list): 包含所有像素点3D坐标的列表，每个元素为(x, y, z)元组
+        """
+        cloud = self.get_organized_cloud(world=True)
+        if cloud is None:
             return False, []
+        return True, cloud.toList()
 
     @require_connection
     def get_z_coordinates(self):
         """
-        获取3D坐标中的z坐标
+        获取3D坐标中的z坐标(兼容接口，新代码请使用get_organized_cloud(world=False).z)
         
         Returns:
-            list: z坐标列表，对应每个像素点的z坐标值
+            list: z坐标列表，对应每个像素点的z坐标值(相机坐标系)，无效点为0
         """
-        try:
-            # 获取帧数据
-            myData = self._get_parsed_frame_data()
-            if not myData.hasDepthMap:
-                raise ValueError("No depth map data available")
-            
-            # 获取深度数据和相机参数
-            depth_data = np.array(myData.depthmap.distance)
-            camera_params = myData.cameraParams
-            
-            # 检查相机参数是否有必要的属性
-            required_attrs = ['width', 'height', 'cx', 'cy', 'fx', 'fy', 'k1', 'k2', 'f2rc']
-            for attr in required_attrs:
-                if not hasattr(camera_params, attr):
-                    return []
-            
-            # 获取图像尺寸
-            width = camera_params.width
-            height = camera_params.height
-            
-            # 创建像素坐标网格
-            x_coords, y_coords = np.meshgrid(np.arange(width), np.arange(height))
-            x_coords = x_coords.flatten()
-            y_coords = y_coords.flatten()
-            
-            # 检查深度值有效性
-            valid_mask = depth_data > 0
-            
-            # 计算相机坐标系下的x和y坐标（矩阵化计算）
-            xp = (camera_params.cx - x_coords) / camera_params.fx
-            yp = (camera_params.cy - y_coords) / camera_params.fy
-            
-            # 计算径向畸变（矩阵化计算）
-            r2 = xp * xp + yp * yp
-            r4 = r2 * r2
-            k = 1 + camera_params.k1 * r2 + camera_params.k2 * r4
-            
-            xd = xp * k
-            yd = yp * k
-            
-            # 只计算z坐标（优化：不计算x_cam和y_cam）
-            s0 = np.sqrt(xd*xd + yd*yd + 1)
-            z_cam = depth_data / s0 - camera_params.f2rc
-            
-            # 应用有效性掩码，无效点设为0
-            z_cam[~valid_mask] = 0.0
-            
-            # 转换为列表返回
-            return z_cam.tolist()
+        cloud = self.get_organized_cloud(world=False)
+        if cloud is None:
+            return []
+        return cloud.zList()
+
+    @require_connection
+    def get_block_height_statistics(self, grid_size=16, trim_ratio=0.1):
+        """
+        获取一帧z坐标(相机坐标系)的分块统计
+        将z图分为grid_size x grid_size的块，每块去除前后trim_ratio的异常值后求平均(全部块向量化计算)
+        
+        Args:
+            grid_size (int | tuple): 分块数量，整数或(行数, 列数)
+            trim_ratio (float): 每块两端各去除的有效点比例
             
+        Returns:
+            BlockHeightStatistics: 每块的截尾均值、有效点数、最小值和最大值，失败时返回None
+        """
+        try:
+            cloud = self.get_organized_cloud(world=False)
+            if cloud is None:
+                self.logger.error("无法获取z坐标数据")
+                return None
+            return blockTrimmedMeans(cloud.z, grid_size, trim_ratio, cloud.valid & (cloud.z > 0))
         except Exception as e:
-            self.logger.error(f"获取Z坐标失败: {e}")
-            return []
+            self.logger.error(f"分块统计z坐标失败: {e}")
+            return None
 
     @require_connection
-    def get_min_z_coordinate(self):
+    def get_min_z_coordinate(self, grid_size=16, trim_ratio=0.1):
         """
-        获取最小z坐标，使用高效的分块平均算法
+        获取最小z坐标，使用向量化的分块截尾平均算法
         算法步骤：
-        1. 获取整张图的z坐标数据
-        2. 将图像分为16x16的块
-        3. 对每个块去除前后10%的异常值
+        1. 获取一帧的z坐标图
+        2. 将图像分为grid_size x grid_size的块
+        3. 对每个块去除前后trim_ratio(默认10%)的异常值
         4. 计算每块的平均值
         5. 返回所有块平均值中的最小值
         
+        Args:
+            grid_size (int | tuple): 分块数量，整数或(行数, 列数)
+            trim_ratio (float): 每块两端各去除的有效点比例
+            
         Returns:
             float: 最小的块平均z坐标值，如果没有有效数据则返回0
         """
+        statistics = self.get_block_height_statistics(grid_size, trim_ratio)
+        if statistics is None:
+            return 0.0
+        min_average, block = statistics.minimum()
+        if min_average is None:
+            self.logger.warning("没有有效的块数据")
+            return 0.0
+        self.logger.info(f"计算得到的最小块平均z坐标: {min_average} (块{block})")
+        return min_average
+
+    @require_connection
+    def learn_reference_plane(self):
+        """
+        从空输送线(无货物)的一帧学习参考平面：RANSAC拟合相机坐标系下的主平面并最小二乘精化，保存到缓存文件
+        只需在安装或相机移动后调用一次，之后每个空帧自动检查漂移
+        
+        Returns:
+            Plane: 参考平面(法向量朝向相机)，失败时返回None
+        """
         try:
-            # 获取z坐标数据
-            z_coordinates = self.get_z_coordinates()
-            if not z_coordinates:
-                self.logger.error("无法获取z坐标数据")
-                return 0.0
-            
-            # 获取相机参数以确定图像尺寸
-            camera_params = self.get_camera_params()
-            if not camera_params:
-                # 尝试获取一帧数据来获取相机参数
-                myData = self._get_parsed_frame_data()
-                camera_params = myData.cameraParams
-            
-            if not camera_params:
-                self.logger.error("无法获取相机参数")
-                return 0.0
-            
-            width = camera_params.width
-            height = camera_params.height
+            cloud, valid = self._camera_cloud_from_data(self._get_parsed_frame_data())
+            if cloud is None:
+                self.logger.error("无法获取点云数据")
+                return None
+            plane = self.reference_plane.learn(cloud, valid)
+            if plane is None:
+                self.logger.error("有效点不足，无法拟合参考平面")
+                return None
+            self.logger.info(f"已学习参考平面: {plane}")
+            return plane
+        except Exception as e:
+            self.logger.error(f"学习参考平面失败: {e}")
+            return None
+
+    @require_connection
+    def get_parsed_frame(self):
+        """
+        获取一帧解析(并滤波)后的数据，可传给get_max_height_above_reference、get_volume_statistics等接口，
+        使多个结果来自同一帧且只取一次帧；数组是帧缓冲区的视图，在下一次取帧前有效
+        
+        Returns:
+            Data: 解析后的帧数据，失败时返回None
+        """
+        try:
+            return self._get_parsed_frame_data()
+        except Exception as e:
+            self.logger.error(f"获取帧数据失败: {e}")
+            return None
+
+    @require_connection
+    def get_heights_above_reference(self, my_data=None):
+        """
+        获取一帧每个像素相对于参考平面的高度(沿平面法向朝向相机为正)，相机或输送线轻微移动不影响结果
+        参考平面只由learn_reference_plane()在空输送线上学习：带货的帧可能把箱体顶面当作参考平面并保存，
+        之后的空帧离它太远，漂移检查无法纠正
+        
+        Args:
+            my_data (Data): get_parsed_frame()取得的帧，None时取一帧新数据
             
-            # 将z坐标数据转换为numpy数组并重塑为图像形状
-            z_array = np.array(z_coordinates).reshape((height, width))
+        Returns:
+            numpy.ndarray: (H, W) float32高度(毫米)，无效像素为NaN；尚未学习参考平面或失败时返回None
+        """
+        try:
+            if not self.reference_plane.isLearned:
+                self.logger.warning("尚未学习参考平面，请先在空输送线上调用learn_reference_plane()")
+                return None
+            if my_data is None:
+                my_data = self._get_parsed_frame_data()
+            cloud, valid = self._camera_cloud_from_data(my_data)
+            if cloud is None:
+                self.logger.error("无法获取点云数据")
+                return None
+            self._check_reference_plane(cloud, valid)
+            return self.reference_plane.heights(cloud, valid)
+        except Exception as e:
+            self.logger.error(f"计算相对参考平面的高度失败: {e}")
+            return None
+
+    @require_connection
+    def get_max_height_above_reference(self, grid_size=16, trim_ratio=0.1, my_data=None):
+        """
+        获取货物相对于参考平面的最大高度，使用与get_min_z_coordinate相同的分块截尾平均
+        
+        Args:
+            grid_size (int | tuple): 分块数量，整数或(行数, 列数)
+            trim_ratio (float): 每块两端各去除的有效点比例
+            my_data (Data): get_parsed_frame()取得的帧，None时取一帧新数据
             
-            # 分块参数
-            num_blocks = 16  # 16x16的块
-            block_height = height // num_blocks
-            block_width = width // num_blocks
+        Returns:
+            float: 最大的块平均高度(毫米)，尚未学习参考平面或没有有效数据时返回0
+        """
+        heights = self.get_heights_above_reference(my_data)
+        if heights is None:
+            return 0.0
+        try:
+            statistics = blockTrimmedMeans(heights, grid_size, trim_ratio, np.isfinite(heights))
+            max_average, block = statistics.maximum()
+        except Exception as e:
+            self.logger.error(f"分块统计高度失败: {e}")
+            return 0.0
+        if max_average is None:
+            self.logger.warning("没有有效的块数据")
+            return 0.0
+        self.logger.info(f"相对参考平面的最大块平均高度: {max_average} (块{block})")
+        return max_average
+
+    @require_connection
+    def get_height_map(self, cell_size_mm=5.0, x_range_mm=None, y_range_mm=None, with_intensity=False):
+        """
+        获取一帧世界坐标点云的俯视正交高度图，每个网格单元取最高点的z值，与目标在视野中的位置无关
+        
+        Args:
+            cell_size_mm (float): 网格单元边长(毫米)
+            x_range_mm (tuple): 网格的世界坐标x范围(min, max)，None时取点云范围(按单元边长对齐)
+            y_range_mm (tuple): 网格的世界坐标y范围(min, max)，None时取点云范围(按单元边长对齐)
+            with_intensity (bool): 是否同时生成强度正射图(每个单元最高点的强度)
             
-            block_averages = []
+        Returns:
+            HeightMap: 高度图(空单元为NaN)、每个单元的点数和可选的强度图，失败时返回None
+        """
+        try:
+            return self._height_map_from_data(self._get_parsed_frame_data(), cell_size_mm, x_range_mm, y_range_mm,
+                                              with_intensity)
+        except Exception as e:
+            self.logger.error(f"生成高度图失败: {e}")
+            return None
+
+    def _height_map_from_data(self, myData, cell_size_mm, x_range_mm=None, y_range_mm=None, with_intensity=False):
+        """
+        由已解析帧生成俯视高度图，点云无效时返回None
+        """
+        cloud = self._organized_cloud_from_data(myData, world=True)
+        if cloud is None:
+            self.logger.error("无法获取点云数据")
+            return None
+        # 无回波的像素(约65米处)会使网格范围失效
+        valid = cloud.valid & self._measured_mask(myData).reshape(cloud.valid.shape)
+        if x_range_mm is None or y_range_mm is None:
+            grid = HeightMapGrid.around(cloud, cell_size_mm, valid)
+            x_range_mm = x_range_mm or (grid.xMin, grid.xMax)
+            y_range_mm = y_range_mm or (grid.yMin, grid.yMax)
+        grid = HeightMapGrid(x_range_mm, y_range_mm, cell_size_mm)
+        intensity = myData.depthmap.intensity if with_intensity else None
+        return grid.rasterize(cloud, valid, intensity)
+
+    @require_connection
+    def get_box_dimensions(self, cell_size_mm=5.0, x_range_mm=None, y_range_mm=None, support_height_mm=None):
+        """
+        检测视野中支撑面(输送线/地面)上的所有箱体，并测量长宽高、偏航角和中心
+        在俯视高度图上按高度分割前景，连通域标记后对每个箱体拟合最小外接矩形(世界坐标)
+        
+        Args:
+            cell_size_mm (float): 高度图网格单元边长(毫米)，决定长宽的分辨率
+            x_range_mm (tuple): 高度图的世界坐标x范围，None时取点云范围
+            y_range_mm (tuple): 高度图的世界坐标y范围，None时取点云范围
+            support_height_mm (float | numpy.ndarray): 支撑面高度(世界坐标z)，None时使用已学习的参考平面，
+                                                       未学习时由高度直方图估计
             
-            # 对每个块进行处理
-            for i in range(num_blocks):
-                for j in range(num_blocks):
-                    # 计算当前块的边界
-                    start_row = i * block_height
-                    end_row = min((i + 1) * block_height, height)
-                    start_col = j * block_width
-                    end_col = min((j + 1) * block_width, width)
-                    
-                    # 提取当前块的z值
-                    block_z = z_array[start_row:end_row, start_col:end_col]
-                    
-                    # 过滤有效的z值（大于0）
-                    valid_z = block_z[block_z > 0]
-                    
-                    if len(valid_z) > 0:
-                        # 去掉前10%和后10%的点（去除异常值）
-                        num_points_to_remove = int(np.ceil(len(valid_z) * 0.1))
-                        if num_points_to_remove > 0 and len(valid_z) > 2 * num_points_to_remove:
-                            valid_z_sorted = np.sort(valid_z)
-                            # 去除前10%和后10%
-                            trimmed_z = valid_z_sorted[num_points_to_remove:-num_points_to_remove]
-                        else:
-                            trimmed_z = valid_z
-                        
-                        # 计算当前块的平均值
-                        if len(trimmed_z) > 0:
-                            block_average = np.mean(trimmed_z)
-                            block_averages.append(block_average)
+        Returns:
+            list: BoxDimensions列表(按面积从大到小)，length/width/height(毫米)、yaw(度，长边与世界x轴夹角，
+                  0-180)、center、centroid，可用toDict()转换；失败时返回空列表
+        """
+        try:
+            myData = self._get_parsed_frame_data()
+            height_map = self._height_map_from_data(myData, cell_size_mm, x_range_mm, y_range_mm)
+            if height_map is None:
+                return []
+            if support_height_mm is None:
+                support_height_mm = self._reference_support(myData, height_map)
+            boxes = self.box_detector.detect(height_map, support_height_mm)
+            support = self.box_detector.supportHeight
+            support = float(np.mean(support)) if support is not None else None
+            self.logger.info(f"检测到{len(boxes)}个箱体，支撑面高度: {support}")
+            return boxes
+        except Exception as e:
+            self.logger.error(f"箱体检测失败: {e}")
+            return []
+
+    @require_connection
+    def get_volume_statistics(self, cell_size_mm=5.0, x_range_mm=None, y_range_mm=None, reference_height_mm=None,
+                              region_corners_mm=None, min_height_mm=10.0, my_data=None):
+        """
+        估计不规则货物(袋装、混装)的体积：在俯视高度图的区域内对高于参考平面的高度积分
+        
+        Args:
+            cell_size_mm (float): 高度图网格单元边长(毫米)
+            x_range_mm (tuple): 高度图的世界坐标x范围，None时取点云范围
+            y_range_mm (tuple): 高度图的世界坐标y范围，None时取点云范围
+            reference_height_mm (float | numpy.ndarray): 参考平面高度(世界坐标z)，None时使用已学习的参考平面，
+                                                         未学习时由高度直方图估计支撑面
+            region_corners_mm (list): 积分区域多边形的世界坐标角点[(x, y), ...]，None时为整个高度图
+            min_height_mm (float): 高于参考平面该值的单元才计入占用面积和体积
+            my_data (Data): get_parsed_frame()取得的帧，None时取一帧新数据
             
-            # 返回所有块平均值中的最小值
-            if block_averages:
-                min_average = min(block_averages)
-                self.logger.info(f"计算得到的最小块平均z坐标: {min_average}")
-                return min_average
-            else:
-                self.logger.warning("没有有效的块数据")
-                return 0.0
-                
+        Returns:
+            VolumeStatistics: 体积、占用面积、最大/分位高度和填充率，可用toDict()转换；失败时返回None
+        """
+        try:
+            myData = my_data if my_data is not None else self._get_parsed_frame_data()
+            height_map = self._height_map_from_data(myData, cell_size_mm, x_range_mm, y_range_mm)
+            if height_map is None:
+                return None
+            if reference_height_mm is None:
+                reference_height_mm = self._reference_support(myData, height_map)
+            region = None
+            if region_corners_mm is not None:
+                region = polygonRegion(height_map.grid, region_corners_mm)
+            statistics = estimateVolume(height_map, reference_height_mm, region, min_height_mm)
+            self.logger.info(f"体积估计: {statistics}")
+            return statistics
         except Exception as e:
-            self.logger.error(f"获取最小z坐标失败: {e}")
-            return 0.0
+            self.logger.error(f"体积估计失败: {e}")
+            return None
 
     @require_connection
     def get_frame(self):
@@ -483,7 +745,7 @@ class QtVisionSick:
             list: depth_data
         """
         myData = self._get_parsed_frame_data()
-        return list(myData.depthmap.distance)
+        return np.ravel(myData.depthmap.distance).tolist()
     
     @require_connection
     def get_intensity_data(self):
@@ -496,7 +758,7 @@ class QtVisionSick:
         myData = self._get_parsed_frame_data()
         if not myData.hasDepthMap:
             raise ValueError("No depth map data available")
-        intensityData = list(myData.depthmap.intensity)
+        intensityData = np.ravel(myData.depthmap.intensity).tolist()
         return intensityData
 
     @require_connection
@@ -510,9 +772,23 @@ class QtVisionSick:
         myData = self._get_parsed_frame_data()
         if not myData.hasDepthMap:
             raise ValueError("No depth map data available")
-        confidenceData = list(myData.depthmap.confidence)
+        confidenceData = np.ravel(myData.depthmap.confidence).tolist()
         return confidenceData
 
+    @require_connection
+    def get_state_map(self):
+        """
+        获取当前帧状态图/置信度通道解码后的掩码
+
+        Returns:
+            StateMap: 按名称访问的布尔掩码(如state_map.valid、state_map['saturated'])，首次访问时解码并缓存
+        """
+        myData = self._get_parsed_frame_data()
+        if not myData.hasDepthMap:
+            raise ValueError("No depth map data available")
+        # 帧缓存的StateMap引用的是帧缓冲区(下一次取帧时归还给缓冲池)，返回给调用方的必须是拷贝
+        return myData.stateMap.copy()
+
     @require_connection
     def get_intensity_image(self):
         """
@@ -524,12 +800,8 @@ class QtVisionSick:
         myData = self._get_parsed_frame_data()
         if not myData.hasDepthMap:
             raise ValueError("No depth map data available")
-        # 获取强度数据
-        intensityData = list(myData.depthmap.intensity)
-        numCols = myData.cameraParams.width
-        numRows = myData.cameraParams.height
-        # 重塑数据为图像
-        image = np.array(intensityData).reshape((numRows, numCols))
+        # 获取强度图像（解码结果已是(height, width)数组）
+        image = myData.depthmap.intensity
         # 直接调整对比度，不进行归一化
         adjusted_image = cv2.convertScaleAbs(image, alpha=0.05, beta=1)
         return adjusted_image
@@ -542,13 +814,9 @@ class QtVisionSick:
             if not myData.hasDepthMap:
                 raise ValueError("No depth map data available")
             # 获取深度数据
-            distance_data = list(myData.depthmap.distance)
-            # 获取强度数据
-            intensityData = list(myData.depthmap.intensity)
-            numCols = myData.cameraParams.width
-            numRows = myData.cameraParams.height
-            # 重塑数据为图像
-            image = np.array(intensityData).reshape((numRows, numCols))
+            distance_data = np.ravel(myData.depthmap.distance).tolist()
+            # 获取强度图像（解码结果已是(height, width)数组）
+            image = myData.depthmap.intensity
             # 直接调整对比度，不进行归一化
             adjusted_image = cv2.convertScaleAbs(image, alpha=0.05, beta=1)
             return CameraFrame(
@@ -592,13 +860,9 @@ class QtVisionSick:
         if not myData.hasDepthMap:
             raise ValueError("No depth map data available")
         # 获取深度数据
-        distance_data = list(myData.depthmap.distance)
-        # 获取强度数据
-        intensityData = list(myData.depthmap.intensity)
-        numCols = myData.cameraParams.width
-        numRows = myData.cameraParams.height
-        # 重塑数据为图像
-        image = np.array(intensityData).reshape((numRows, numCols))
+        distance_data = np.ravel(myData.depthmap.distance).tolist()
+        # 获取强度图像（解码结果已是(height, width)数组）
+        image = myData.depthmap.intensity
         # 直接调整对比度，不进行归一化
         adjusted_image = cv2.convertScaleAbs(image, alpha=0.05, beta=1)
         # 保存相机参数
@@ -629,6 +893,7 @@ class QtVisionSick:
             # 启动连续流
             self.deviceControl.startStream()
             self.use_single_step = False
+            self._start_acquisition()
             self.logger.info("已切换到连续流模式")
             return True
         except Exception as e:
@@ -662,6 +927,12 @@ class QtVisionSick:
                     self.deviceControl.stopStream()
                     time.sleep(0.2)  # 等待相机处理命令
                     self.logger.info("数据流已停止")
+
+                    # UDP模式下恢复设备默认的TCP传输
+                    if self.transport_protocol == "UDP":
+                        streamingSettings = BlobClientConfig()
+                        streamingSettings.setTransportProtocol(self.deviceControl, streamingSettings.PROTOCOL_TCP)
+                        streamingSettings.setBlobTcpPort(self.deviceControl, self.streaming_port)
                 except Exception as e:
                     self.logger.warning(f"停止流时出错: {str(e)}")
                     
@@ -672,6 +943,11 @@ class QtVisionSick:
                         self.logger.info("流连接已关闭")
                     except Exception as e:
                         self.logger.warning(f"关闭流连接时出错: {str(e)}")
+
+                # 写完队列中的帧并关闭录制文件
+                if self.recorder is not None:
+                    self.recorder.close()
+                    self.recorder = None
                     
                 # 登出设备
                 try:
@@ -690,16 +966,155 @@ class QtVisionSick:
             self.is_connected = False
             self.logger.info("相机连接已完全断开")
 
+    def _start_acquisition(self):
+        """连续流模式下按配置启动后台采集线程"""
+        if self.use_acquisition_thread and not self.use_single_step:
+            # 采集线程重启后序号从头计数
+            self._acquired_sequence = None
+            self.streaming_device.startAcquisition()
+            self.logger.info("后台采集线程已启动")
+
+    def get_acquisition_stats(self):
+        """
+        获取后台采集线程的统计信息
+        
+        Returns:
+            dict: acquired(已接收帧数), dropped(未被取用即被覆盖的帧数), running(线程是否运行)
+        """
+        if self.streaming_device is None:
+            return {"acquired": 0, "dropped": 0, "running": False}
+        return {
+            "acquired": self.streaming_device.acquiredFrames,
+            "dropped": self.streaming_device.droppedFrames,
+            "running": self.streaming_device.isAcquiring()
+        }
+
+    def _receive_frame(self):
+        """接收一帧原始数据；采集线程运行时取最新帧，过旧则等待下一帧"""
+        if self.streaming_device.isAcquiring():
+            wholeFrame = self.streaming_device.get_latest(self.max_frame_age_ms)
+            if wholeFrame is None:
+                wholeFrame = self.streaming_device.wait_next(self.frame_timeout)
+            sequence = self.streaming_device.consumedSequence
+            if sequence != self._acquired_sequence:
+                self._acquired_sequence = sequence
+                self._frame_sequence += 1
+            return wholeFrame
+        # 各接口只返回拷贝(列表、新数组或拷贝后的StateMap)，不会把帧缓冲区的视图交给调用方，
+        # 上一帧的缓冲区此时已不再使用，归还以便复用
+        if self._last_frame is not None:
+            self.streaming_device.releaseFrame(self._last_frame)
+            self._last_frame = None
+        self.streaming_device.getFrame()
+        self._last_frame = self.streaming_device.frame
+        self._frame_sequence += 1
+        return self._last_frame
+
     def _get_parsed_frame_data(self):
         """获取并解析帧数据的通用方法"""
-        self.streaming_device.getFrame()
-        wholeFrame = self.streaming_device.frame
-        myData = Data.Data()
-        myData.read(wholeFrame)
+        wholeFrame = self._receive_frame()
+        myData = Data.Data(parserContext=self.parser_context)
+        # 以numpy视图解码，避免逐像素生成Python对象；空间滤波需要原始的uint16距离数据
+        myData.read(wholeFrame, convertToMM=self.spatial_filter is None, asNumpy=True)
         if not myData.hasDepthMap:
             raise ValueError("No depth map data available")
+        if self.spatial_filter is not None:
+            self._apply_spatial_filter(myData)
+        if self.temporal_filter is not None:
+            self._apply_temporal_filter(myData)
+        if self.flying_pixel_filter is not None:
+            self._apply_flying_pixel_filter(myData)
         return myData
+
+    def _apply_spatial_filter(self, myData):
+        """
+        对原始uint16距离数据进行空间滤波，再换算为毫米
+        """
+        factor = getDistanceToMMFactor(myData.xmlParser)
+        self.spatial_filter.bilateralSigmaColor = self.spatial_bilateral_sigma_mm / factor
+        state_map = myData.stateMap
+        valid = state_map.valid if state_map is not None and state_map.isStatemap else None
+        filtered = self.spatial_filter.apply(myData.depthmap.distance, valid)
+        # 换算为毫米时生成新数组，滤波器的输出缓冲区在下一帧会被覆盖
+        myData.depthmap.distance = np.multiply(filtered, factor)
+        self.logger.debug(f"空间滤波耗时: {dict(self.spatial_filter.timings)} ms")
+
+    def _apply_temporal_filter(self, myData):
+        """
+        用时域滤波结果替换帧的距离数据(毫米)，状态图/置信度为0的像素不参与滤波
+        """
+        state_map = myData.stateMap
+        weights = None
+        if state_map is not None and state_map.confidence.size:
+            # 状态图设备只区分有效/无效，置信度设备按置信度加权
+            weights = state_map.valid if state_map.isStatemap else state_map.confidence
+        # 采集线程下连续的get_*调用可能取到同一帧，按接收序号只加入一次；
+        # 不用设备帧号：旧格式(version 1)的深度图没有帧号，每帧都是-1
+        filtered = self.temporal_filter.update(myData.depthmap.distance, weights, self._frame_sequence)
+        # 返回副本，滤波器的输出缓冲区在下一帧会被覆盖
+        myData.depthmap.distance = filtered.copy()
     
+    def _measured_mask(self, myData):
+        """
+        有测量值的像素：距离大于0，且不是无回波标记值0xFFFF(置信度设备，换算为毫米后)
+        """
+        distance = np.asarray(myData.depthmap.distance)
+        return (distance > 0) & (distance < 0xFFFF * getDistanceToMMFactor(myData.xmlParser))
+
+    def _camera_cloud_from_data(self, myData):
+        """
+        相机坐标系点云和有测量值的像素掩码，用于参考平面
+        """
+        cloud = self._organized_cloud_from_data(myData, world=False)
+        if cloud is None:
+            return None, None
+        return cloud, cloud.valid & self._measured_mask(myData).reshape(cloud.valid.shape)
+
+    def _check_reference_plane(self, cloud, valid):
+        """
+        空帧上检查参考平面是否漂移，漂移时用该帧重新估计
+        """
+        result = self.reference_plane.update(cloud, valid)
+        if result.reestimated:
+            self.logger.info(f"参考平面漂移(偏移{result.offset:.1f} mm，倾斜{result.angle:.2f}度)，"
+                             f"已重新估计: {self.reference_plane.plane}")
+        return result
+
+    def _reference_support(self, myData, height_map):
+        """
+        已学习的参考平面在高度图每个单元中心的世界坐标高度(倾斜平面逐单元不同)，未学习或没有cam2world时返回None
+        """
+        if not self.reference_plane.isLearned:
+            return None
+        cam2world = cam2worldOf(myData.cameraParams)
+        if cam2world is None:
+            return None
+        cloud, valid = self._camera_cloud_from_data(myData)
+        if cloud is not None:
+            self._check_reference_plane(cloud, valid)
+        world_plane = self.reference_plane.plane.transform(cam2world)
+        xs, ys = height_map.grid.cellCenters()
+        return world_plane.zAt(xs[np.newaxis, :], ys[:, np.newaxis]).astype(np.float32)
+
+    def _apply_flying_pixel_filter(self, myData):
+        """
+        检测飞点并将其距离置0(无效)，同时作为'flyingPixel'掩码加入状态图的有效性掩码
+        """
+        camera_params = myData.cameraParams
+        ray_table = self.ray_tables.get(camera_params, withCam2world=False)
+        distance = np.asarray(myData.depthmap.distance)
+        state_map = myData.stateMap
+        if state_map is not None and state_map.isStatemap:
+            valid = state_map.valid
+        else:
+            valid = self._measured_mask(myData)
+        flying = self.flying_pixel_filter.detect(distance.reshape(ray_table.height, ray_table.width),
+                                                 ray_table, valid)
+        myData.depthmap.distance = np.where(flying.reshape(distance.shape), 0, distance)
+        if state_map is not None:
+            state_map.addInvalidMask('flyingPixel', flying.copy())
+        self.logger.debug(f"飞点去除: {int(np.count_nonzero(flying))}个像素，耗时{self.flying_pixel_filter.time:.2f} ms")
+
     def __enter__(self):
         """上下文管理器入口"""
         self.connect()
@@ -0,0 +1,71 @@
+"""
+@Description :   多箱体检测与尺寸测量耗时：合成高度图上随机摆放的多个旋转箱体，对比检测结果与真值
+                 在SDK目录下运行: python -m benchmarks.bench_box_detector
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import timeit
+
+import cv2
+import numpy as np
+
+from common.Measurement.BoxDetector import BoxDetector
+from common.PointCloud.HeightMap import HeightMap, HeightMapGrid
+
+parser = argparse.ArgumentParser(description="Benchmark of the multi-box detection on a height map.")
+parser.add_argument('-n', '--repeat', required=False, type=int,
+                    default=50, help="Number of detections per measurement.")
+parser.add_argument('-b', '--boxes', required=False, type=int,
+                    default=30, help="Number of boxes in the scene.")
+parser.add_argument('-c', '--cell', required=False, type=float,
+                    default=5.0, help="Cell size in mm.")
+args = parser.parse_args()
+
+
+def synthetic_scene(box_count, cell_size, seed=0):
+    """
+    4m x 3m的地面(高度0，噪声2毫米)上按网格摆放随机尺寸和角度的箱体，返回高度图和真值(长, 宽, 高, 角度, x, y)
+    """
+    rng = np.random.default_rng(seed)
+    grid = HeightMapGrid((-2000.0, 2000.0), (-1500.0, 1500.0), cell_size)
+    height = rng.normal(0.0, 2.0, grid.shape).astype(np.float32)
+    columns = int(np.ceil(np.sqrt(box_count * 4.0 / 3.0)))
+    rows = int(np.ceil(box_count / columns))
+    pitch = min(4000.0 / columns, 3000.0 / rows)
+    truth = []
+    for index in range(box_count):
+        x = -2000.0 + (index % columns + 0.5) * pitch
+        y = -1500.0 + (index // columns + 0.5) * pitch
+        length = rng.uniform(0.35, 0.6) * pitch
+        width = rng.uniform(0.5, 1.0) * length
+        box_height = rng.uniform(100.0, 500.0)
+        yaw = rng.uniform(0.0, 180.0)
+        corners = cv2.boxPoints((((x - grid.xMin) / cell_size - 0.5, (y - grid.yMin) / cell_size - 0.5),
+                                 (length / cell_size, width / cell_size), yaw))
+        footprint = np.zeros(grid.shape, dtype=np.uint8)
+        cv2.fillPoly(footprint, [np.round(corners).astype(np.int32)], 1)
+        height[footprint > 0] = box_height
+        truth.append((length, width, box_height, yaw, x, y))
+    return HeightMap(grid, height, np.ones(grid.shape, dtype=np.intp)), truth
+
+
+height_map, truth = synthetic_scene(args.boxes, args.cell)
+detector = BoxDetector()
+boxes = detector.detect(height_map, 0.0)
+errors = []
+for box in boxes:
+    length, width, box_height, yaw, x, y = min(truth, key=lambda t: (t[4] - box.center[0]) ** 2 +
+                                               (t[5] - box.center[1]) ** 2)
+    yaw_error = abs((box.yaw - yaw + 90.0) % 180.0 - 90.0)
+    errors.append((box.length - length, box.width - width, box.height - box_height, yaw_error))
+errors = np.abs(np.array(errors))
+
+print("{} boxes on {}x{} cells of {} mm, {} detected".format(args.boxes, height_map.shape[1], height_map.shape[0],
+                                                            args.cell, len(boxes)))
+print("  max error: length {:.1f} mm, width {:.1f} mm, height {:.1f} mm, yaw {:.2f} deg".format(*errors.max(axis=0)))
+seconds = timeit.timeit(lambda: detector.detect(height_map, 0.0), number=args.repeat)
+print("  detection {:8.3f} ms".format(seconds * 1000 / args.repeat))
+seconds = timeit.timeit(lambda: detector.detect(height_map), number=args.repeat)
+print("  detection with support estimation {:8.3f} ms".format(seconds * 1000 / args.repeat))
@@ -0,0 +1,62 @@
+"""
+@Description :   BLOB帧解码性能对比：struct元组解码 vs. numpy零拷贝解码
+                 在SDK目录下运行: python -m benchmarks.bench_decode
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from common.Streaming import Data
+from common.data_io.SsrLoader import readSsrBlobFrames
+
+parser = argparse.ArgumentParser(description="Benchmark of the depth map decoding.")
+parser.add_argument('-f', '--filename', required=False, type=str,
+                    default="sick_visionary_python_samples/sample_data/visionaryT_sample.ssr",
+                    help="The SSR file the frames are taken from.")
+parser.add_argument('-n', '--repeat', required=False, type=int,
+                    default=200, help="Number of decoded frames per measurement.")
+args = parser.parse_args()
+
+frames = readSsrBlobFrames(args.filename)
+if not frames:
+    raise SystemExit("No frames in {}".format(args.filename))
+
+
+def decode_tuple(frame):
+    """ 原有路径：元组解码后再由QtVisionSick转换为list和ndarray """
+    myData = Data.Data()
+    myData.read(frame)
+    depth = np.array(list(myData.depthmap.distance))
+    intensity = np.array(list(myData.depthmap.intensity))
+    confidence = np.array(list(myData.depthmap.confidence))
+    return depth, intensity, confidence
+
+
+def decode_numpy(frame, convertToMM):
+    """ numpy路径：各通道直接为帧缓冲区上的视图 """
+    myData = Data.Data()
+    myData.read(frame, convertToMM=convertToMM, asNumpy=True)
+    depthmap = myData.depthmap
+    return depthmap.distance, depthmap.intensity, depthmap.confidence
+
+
+# 两条路径结果必须一致
+reference = decode_tuple(frames[0])
+candidate = decode_numpy(frames[0], True)
+for ref, cand in zip(reference, candidate):
+    assert np.array_equal(ref, np.ravel(cand)), "numpy decoding differs from tuple decoding"
+
+cases = [
+    ("tuple + list + np.array", lambda frame: decode_tuple(frame)),
+    ("numpy (convertToMM)", lambda frame: decode_numpy(frame, True)),
+    ("numpy (raw, zero-copy)", lambda frame: decode_numpy(frame, False)),
+]
+
+print("{} frames of {} bytes".format(len(frames), len(frames[0])))
+for name, func in cases:
+    seconds = timeit.timeit(lambda: [func(frames[i % len(frames)]) for i in range(args.repeat)], number=1)
+    print("{:<26s} {:8.3f} ms/frame".format(name, seconds * 1000 / args.repeat))
@@ -0,0 +1,43 @@
+"""
+@Description :   飞点检测耗时：深度跳变与视线夹角判据，基于整幅深度图的平移视图向量化计算
+                 在SDK目录下运行: python -m benchmarks.bench_flying_pixel
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from common.Filtering.FlyingPixel import FlyingPixelFilter
+
+from benchmarks.scenes import add_filename_argument, decode, load_scenes, ray_tables
+
+parser = argparse.ArgumentParser(description="Benchmark of the flying pixel detection.")
+add_filename_argument(parser)
+parser.add_argument('-n', '--repeat', required=False, type=int,
+                    default=100, help="Number of detections per measurement.")
+args = parser.parse_args()
+
+
+def scene_of(frame):
+    myData = decode(frame)
+    ray_table = ray_tables.get(myData.cameraParams, withCam2world=False)
+    distance = np.asarray(myData.depthmap.distance).reshape(ray_table.height, ray_table.width)
+    return distance, ray_table
+
+
+scenes = load_scenes(args.filename, scene_of)
+
+for name, (distance, ray_table) in scenes:
+    valid = (distance > 0) & (distance < 0xFFFF)
+    print("{} ({}x{})".format(name, distance.shape[1], distance.shape[0]))
+    for case, flying_pixel_filter, table in (
+            ("discontinuity only", FlyingPixelFilter(), None),
+            ("discontinuity + ray angle", FlyingPixelFilter(), ray_table),
+            ("horizontal/vertical only", FlyingPixelFilter(diagonals=False), ray_table)):
+        flying = flying_pixel_filter.detect(distance, table, valid)  # 分配缓冲区
+        seconds = timeit.timeit(lambda: flying_pixel_filter.detect(distance, table, valid), number=args.repeat)
+        print("  {:<26s} {:8.3f} ms  ({} flying pixels)".format(case, seconds * 1000 / args.repeat,
+                                                                 int(np.count_nonzero(flying))))
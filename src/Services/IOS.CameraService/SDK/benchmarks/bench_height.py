@@ -0,0 +1,77 @@
+"""
+@Description :   最小高度估计性能对比：原有16x16分块Python循环 vs. 向量化分块截尾平均
+                 在SDK目录下运行: python -m benchmarks.bench_height
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import math
+import timeit
+
+import numpy as np
+
+from common.Measurement.HeightEstimator import blockTrimmedMeans
+from common.PointCloud.OrganizedCloud import OrganizedCloud
+
+from benchmarks.scenes import add_filename_argument, decode, load_scenes, ray_tables
+
+parser = argparse.ArgumentParser(description="Benchmark of the block-trimmed height estimation.")
+add_filename_argument(parser)
+parser.add_argument('-n', '--repeat', required=False, type=int,
+                    default=100, help="Number of estimations per measurement.")
+parser.add_argument('-g', '--grid', required=False, type=int,
+                    default=16, help="Number of blocks per row and column.")
+parser.add_argument('-t', '--trim', required=False, type=float,
+                    default=0.1, help="Ratio of the values removed at both ends of a block.")
+args = parser.parse_args()
+
+
+def legacy_min_block_height(z_map, grid_size=16, trim_ratio=0.1):
+    """原有QtVisionSick.get_min_z_coordinate的逐块循环，作为对比基准"""
+    height, width = z_map.shape
+    block_height = height // grid_size
+    block_width = width // grid_size
+    block_averages = []
+    for i in range(grid_size):
+        for j in range(grid_size):
+            block_z = z_map[i * block_height:min((i + 1) * block_height, height),
+                            j * block_width:min((j + 1) * block_width, width)]
+            valid_z = block_z[block_z > 0]
+            if len(valid_z) > 0:
+                num_points_to_remove = int(math.ceil(len(valid_z) * trim_ratio))
+                if num_points_to_remove > 0 and len(valid_z) > 2 * num_points_to_remove:
+                    trimmed_z = np.sort(valid_z)[num_points_to_remove:-num_points_to_remove]
+                else:
+                    trimmed_z = valid_z
+                if len(trimmed_z) > 0:
+                    block_averages.append(np.mean(trimmed_z))
+    return min(block_averages) if block_averages else None
+
+
+def z_map_of(frame):
+    myData = decode(frame)
+    ray_table = ray_tables.get(myData.cameraParams, withCam2world=False)
+    return OrganizedCloud.fromDepth(myData.depthmap.distance, ray_table, world=False).z
+
+
+scenes = load_scenes(args.filename, z_map_of)
+
+for name, z_map in scenes:
+    # 原有实现先转换为list再重建数组，这里只比较分块计算本身
+    z_list = z_map.astype(np.float64).ravel().tolist()
+
+    def legacy():
+        return legacy_min_block_height(np.array(z_list).reshape(z_map.shape), args.grid, args.trim)
+
+    def vectorized():
+        return blockTrimmedMeans(z_map, args.grid, args.trim).minimum()[0]
+
+    reference = legacy()
+    candidate = vectorized()
+    assert abs(reference - candidate) < 1e-2, "vectorized estimation differs: {} vs {}".format(reference, candidate)
+
+    print("{} ({}x{}), min z = {:.3f}".format(name, z_map.shape[1], z_map.shape[0], candidate))
+    for case, func in (("python loop (list input)", legacy), ("vectorized", vectorized)):
+        seconds = timeit.timeit(func, number=args.repeat)
+        print("  {:<26s} {:8.3f} ms".format(case, seconds * 1000 / args.repeat))
@@ -0,0 +1,46 @@
+"""
+@Description :   俯视正交高度图栅格化耗时：世界坐标点云投影到固定XY网格，每个单元取最高点(np.maximum.at)
+                 在SDK目录下运行: python -m benchmarks.bench_height_map
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from common.PointCloud.HeightMap import HeightMapGrid
+from common.PointCloud.OrganizedCloud import OrganizedCloud
+
+from benchmarks.scenes import add_filename_argument, decode, load_scenes, ray_tables
+
+parser = argparse.ArgumentParser(description="Benchmark of the height map rasterization.")
+add_filename_argument(parser)
+parser.add_argument('-n', '--repeat', required=False, type=int,
+                    default=100, help="Number of rasterizations per measurement.")
+parser.add_argument('-c', '--cell', required=False, type=float,
+                    default=5.0, help="Cell size in mm.")
+args = parser.parse_args()
+
+
+def scene_of(frame):
+    myData = decode(frame)
+    ray_table = ray_tables.get(myData.cameraParams, withCam2world=True)
+    cloud = OrganizedCloud.fromDepth(myData.depthmap.distance, ray_table)
+    # 无回波的像素(0xFFFF)不参与
+    valid = cloud.valid & (np.asarray(myData.depthmap.distance) < 0xFFFF)
+    return cloud, valid, myData.depthmap.intensity
+
+
+scenes = load_scenes(args.filename, scene_of)
+
+for name, (cloud, valid, intensity) in scenes:
+    grid = HeightMapGrid.around(cloud, args.cell, valid)
+    height_map = grid.rasterize(cloud, valid)
+    print("{} ({}x{}) -> {}x{} cells of {} mm, coverage {:.1%}".format(
+        name, cloud.width, cloud.height, grid.cols, grid.rows, args.cell, height_map.coverage))
+    for case, func in (("height map", lambda: grid.rasterize(cloud, valid)),
+                       ("height map + orthophoto", lambda: grid.rasterize(cloud, valid, intensity))):
+        seconds = timeit.timeit(func, number=args.repeat)
+        print("  {:<26s} {:8.3f} ms".format(case, seconds * 1000 / args.repeat))
@@ -0,0 +1,51 @@
+"""
+@Description :   有序点云逐像素法向量与深度梯度耗时：差分叉乘(gradient)与邻域协方差(covariance)两种方法，
+                 合成帧(地面为世界坐标z=0，水平箱体顶面)上与真值法向量(0, 0, 1)对比，并测量缓冲区复用的效果
+                 在SDK目录下运行: python -m benchmarks.bench_normals
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from common.PointCloud.OrganizedCloud import OrganizedCloud
+from common.PointCloud.SurfaceNormals import NORMAL_METHODS, NormalEstimator, estimateNormals
+
+from benchmarks.scenes import decode, ray_tables, synthetic_frame
+
+parser = argparse.ArgumentParser(description="Benchmark of the surface normal estimation.")
+parser.add_argument('-n', '--repeat', required=False, type=int,
+                    default=20, help="Number of estimations per measurement.")
+parser.add_argument('-w', '--window', required=False, type=int,
+                    default=5, help="Edge length of the neighborhood in pixels (odd).")
+args = parser.parse_args()
+
+myData = decode(synthetic_frame())
+ray_table = ray_tables.get(myData.cameraParams, withCam2world=True)
+cloud = OrganizedCloud.fromDepth(myData.depthmap.distance, ray_table)
+# 合成场景：地面z=0，箱体顶面z=300，两者的法向量都是世界坐标z轴
+floor = cloud.valid & (cloud.z < 20.0)
+top = cloud.valid & (cloud.z > 280.0)
+print("synthetic {}x{}, window {}x{}".format(cloud.width, cloud.height, args.window, args.window))
+
+for method in NORMAL_METHODS:
+    estimator = NormalEstimator(args.window, method)
+    normals = estimator.estimate(cloud, viewpoint=ray_table.worldOrigin)
+    angle = normals.angleTo()
+    print("{}: valid {:.1%}, angle to z median floor {:.2f} deg, box top {:.2f} deg, flat (< 5 deg) {:.1%}".format(
+        method, normals.valid.mean(), np.nanmedian(angle[floor]), np.nanmedian(angle[top]),
+        normals.flatMask(5.0).sum() / max(normals.valid.sum(), 1)))
+    print("  depth gradient median {:.2f} mm/pixel, max {:.1f} mm/pixel".format(
+        np.nanmedian(normals.gradient), np.nanmax(normals.gradient)))
+    if normals.curvature is not None:
+        print("  curvature median {:.4f}, 99th percentile {:.4f}".format(
+            np.nanmedian(normals.curvature), np.nanpercentile(normals.curvature, 99)))
+
+    seconds = timeit.timeit(lambda: estimator.estimate(cloud, viewpoint=ray_table.worldOrigin), number=args.repeat)
+    print("  reused buffers    {:8.3f} ms".format(seconds * 1000 / args.repeat))
+    seconds = timeit.timeit(lambda: estimateNormals(cloud, windowSize=args.window, method=method,
+                                                    viewpoint=ray_table.worldOrigin), number=args.repeat)
+    print("  new buffers       {:8.3f} ms".format(seconds * 1000 / args.repeat))
@@ -0,0 +1,57 @@
+"""
+@Description :   支撑平面RANSAC拟合与漂移检查耗时：合成帧(地面为世界坐标z=0)上拟合参考平面，与真值对比，
+                 并测量倾斜、平移后的漂移检查和重新估计
+                 在SDK目录下运行: python -m benchmarks.bench_plane
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import math
+import timeit
+
+import numpy as np
+
+from common.Measurement.SupportPlane import Plane, ReferencePlane, fitPlaneRansac
+from common.PointCloud.OrganizedCloud import OrganizedCloud
+
+from benchmarks.scenes import decode, ray_tables, synthetic_frame
+
+parser = argparse.ArgumentParser(description="Benchmark of the RANSAC support plane estimation.")
+parser.add_argument('-n', '--repeat', required=False, type=int,
+                    default=50, help="Number of fits per measurement.")
+parser.add_argument('-t', '--tilt', required=False, type=float,
+                    default=0.3, help="Tilt of the moved camera in degrees.")
+parser.add_argument('-s', '--shift', required=False, type=float,
+                    default=8.0, help="Shift of the moved camera in mm.")
+args = parser.parse_args()
+
+myData = decode(synthetic_frame())
+cloud = OrganizedCloud.fromDepth(myData.depthmap.distance, ray_tables.get(myData.cameraParams, withCam2world=False),
+                                 world=False)
+cam2world = ray_tables.get(myData.cameraParams, withCam2world=True).cam2world
+
+plane, inliers = fitPlaneRansac(cloud, seed=0)
+floor = plane.transform(cam2world)
+print("synthetic {}x{}: {}, inliers {:.1%}".format(cloud.width, cloud.height, plane, inliers.sum() / len(cloud)))
+print("  world plane: tilt {:.4f} deg, height {:.2f} mm (true: 0, 0)".format(
+    floor.angleTo(Plane((0.0, 0.0, 1.0), 0.0)), float(floor.zAt(0.0, 0.0))))
+seconds = timeit.timeit(lambda: fitPlaneRansac(cloud), number=args.repeat)
+print("  RANSAC fit     {:8.3f} ms".format(seconds * 1000 / args.repeat))
+
+# 相机移动：绕x轴倾斜并沿z轴平移，只保留地面(空输送线)的像素
+angle = math.radians(args.tilt)
+moved = np.eye(4)
+moved[1, 1] = moved[2, 2] = math.cos(angle)
+moved[1, 2], moved[2, 1] = -math.sin(angle), math.sin(angle)
+moved[2, 3] = args.shift
+empty = cloud.transform(moved)
+empty.valid &= plane.heights(cloud) < 20.0
+
+reference = ReferencePlane(filename=None)
+reference.plane = plane
+seconds = timeit.timeit(lambda: reference.check(empty), number=args.repeat)
+print("  drift check    {:8.3f} ms".format(seconds * 1000 / args.repeat))
+result = reference.update(empty)
+print("  moved by {} deg, {} mm: {}, re-estimated {}".format(args.tilt, args.shift, result, result.reestimated))
+print("  after re-estimation: {}".format(reference.check(empty)))
@@ -0,0 +1,53 @@
+"""
+@Description :   空间深度滤波各阶段耗时：中值、双边滤波和小孔洞修补(inpaint)，直接作用于uint16原始距离数据
+                 在SDK目录下运行: python -m benchmarks.bench_spatial
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import collections
+
+import numpy as np
+
+from common.Filtering.SpatialFilter import SpatialDepthFilter
+
+from benchmarks.scenes import add_filename_argument, decode, load_scenes
+
+parser = argparse.ArgumentParser(description="Benchmark of the spatial depth filter stages.")
+add_filename_argument(parser)
+parser.add_argument('-n', '--repeat', required=False, type=int,
+                    default=100, help="Number of filter runs per measurement.")
+args = parser.parse_args()
+
+CONFIGURATIONS = (
+    ("median 3", dict(medianSize=3)),
+    ("median 5", dict(medianSize=5)),
+    ("bilateral 5", dict(medianSize=0, bilateralDiameter=5)),
+    ("inpaint r=2", dict(medianSize=0, inpaintRadius=2)),
+    ("inpaint + median 3 + bilateral 5", dict(medianSize=3, bilateralDiameter=5, inpaintRadius=2)),
+)
+
+
+def distance_of(frame):
+    myData = decode(frame, convertToMM=False)
+    return np.array(myData.depthmap.distance, dtype=np.uint16)
+
+
+scenes = load_scenes(args.filename, distance_of)
+
+for name, distance in scenes:
+    invalid = np.count_nonzero((distance == 0) | (distance == 0xFFFF)) / distance.size
+    print("{} ({}x{}), {:.1%} invalid pixels".format(name, distance.shape[1], distance.shape[0], invalid))
+    for case, options in CONFIGURATIONS:
+        spatial_filter = SpatialDepthFilter(**options)
+        spatial_filter.apply(distance)  # 分配缓冲区
+        stages = collections.OrderedDict()
+        for _ in range(args.repeat):
+            spatial_filter.apply(distance)
+            for stage, milliseconds in spatial_filter.timings.items():
+                stages[stage] = stages.get(stage, 0.0) + milliseconds
+        total = sum(stages.values()) / args.repeat
+        details = ", ".join("{} {:.3f}".format(stage, milliseconds / args.repeat)
+                            for stage, milliseconds in stages.items())
+        print("  {:<34s} {:8.3f} ms  ({}, {} filled)".format(case, total, details, spatial_filter.filledPixels))
@@ -0,0 +1,80 @@
+"""
+@Description :   体素网格索引耗时：建立索引、体素降采样，以及区域查询/区域最高点/最近邻与逐点暴力扫描的对比
+                 在SDK目录下运行: python -m benchmarks.bench_voxel_grid
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from common.PointCloud.OrganizedCloud import OrganizedCloud
+from common.PointCloud.VoxelGrid import VoxelGrid
+
+from benchmarks.scenes import decode, ray_tables, synthetic_frame
+
+parser = argparse.ArgumentParser(description="Benchmark of the voxel grid index.")
+parser.add_argument('-n', '--repeat', required=False, type=int,
+                    default=100, help="Number of queries per measurement.")
+parser.add_argument('-v', '--voxel', required=False, type=float,
+                    default=10.0, help="Voxel size in mm.")
+parser.add_argument('-r', '--region', required=False, type=float,
+                    default=100.0, help="Half edge length of the query region in mm.")
+args = parser.parse_args()
+
+myData = decode(synthetic_frame())
+ray_table = ray_tables.get(myData.cameraParams, withCam2world=True)
+cloud = OrganizedCloud.fromDepth(myData.depthmap.distance, ray_table)
+points = cloud.points.reshape(-1, 3)
+valid = cloud.valid.ravel()
+
+grid = VoxelGrid(cloud, args.voxel)
+print("synthetic {}x{}: {} points -> {} voxels of {} mm".format(cloud.width, cloud.height, len(cloud), len(grid),
+                                                               args.voxel))
+
+
+def measure(name, func, repeat=args.repeat):
+    seconds = timeit.timeit(func, number=repeat)
+    print("  {:<40s} {:8.3f} ms".format(name, seconds * 1000 / repeat))
+
+
+measure("index", lambda: VoxelGrid(cloud, args.voxel), 10)
+for mode in ('centroid', 'max-z', 'center'):
+    measure("downsample {}".format(mode), lambda: grid.downsample(mode), 10)
+
+# 箱体顶面中心附近的区域，z不限
+lower = (-args.region, -args.region, None)
+upper = (args.region, args.region, None)
+brute_lower = np.array([-args.region, -args.region, -np.inf], dtype=np.float32)
+brute_upper = np.array([args.region, args.region, np.inf], dtype=np.float32)
+
+
+def brute_force_box():
+    return np.flatnonzero(valid & np.all((points >= brute_lower) & (points <= brute_upper), axis=1))
+
+
+def brute_force_highest():
+    inside = brute_force_box()
+    return inside[np.argmax(points[inside, 2])] if inside.size else None
+
+
+def brute_force_nearest(point):
+    distances = np.sum(np.square(points - point), axis=1)
+    distances[~valid] = np.inf
+    return int(np.argmin(distances))
+
+
+assert np.array_equal(np.sort(grid.queryBox(lower, upper)), brute_force_box())
+assert points[grid.highestPoint(lower, upper), 2] == points[brute_force_highest(), 2]
+target = np.array([0.0, 0.0, 320.0], dtype=np.float32)
+assert grid.nearest(target, 100.0)[0] == brute_force_nearest(target)
+print("  region of {0:g} x {0:g} mm: {1} points, highest z {2:.1f} mm".format(
+    2 * args.region, grid.queryBox(lower, upper).size, points[grid.highestPoint(lower, upper), 2]))
+measure("box query", lambda: grid.queryBox(lower, upper))
+measure("box query (brute force)", brute_force_box, 10)
+measure("highest point in region", lambda: grid.highestPoint(lower, upper))
+measure("highest point in region (brute force)", brute_force_highest, 10)
+measure("nearest neighbor", lambda: grid.nearest(target, 100.0))
+measure("nearest neighbor (brute force)", lambda: brute_force_nearest(target), 10)
@@ -0,0 +1,45 @@
+"""
+@Description :   基准测试共用的测试场景：SSR录像的第一帧和合成帧(地面+箱体，seed=0)，以及只在内存中缓存的射线表
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+from common.PointCloud.RayTable import RayTableCache
+from common.Streaming import Data
+from common.data_io.SsrLoader import readSsrBlobFrames
+from emulator.FrameSources import SyntheticFrameSource
+
+DEFAULT_SSR = "sick_visionary_python_samples/sample_data/visionaryT_sample.ssr"
+
+# 基准测试不写入射线表缓存目录
+ray_tables = RayTableCache(cacheDirectory=None)
+
+
+def add_filename_argument(parser):
+    """添加SSR文件参数(-f/--filename)"""
+    parser.add_argument('-f', '--filename', required=False, type=str, default=DEFAULT_SSR,
+                        help="The SSR file the frames are taken from.")
+
+
+def synthetic_frame():
+    """合成场景的第一帧(blob)，每次调用结果相同"""
+    return SyntheticFrameSource(seed=0).nextFrame(1, 0)
+
+
+def decode(frame, convertToMM=True):
+    """解码一帧blob，深度图为numpy数组"""
+    myData = Data.Data()
+    myData.read(frame, convertToMM=convertToMM, asNumpy=True)
+    return myData
+
+
+def load_scenes(filename, scene_of):
+    """
+    返回[(名称, scene_of(帧))]：SSR录像的第一帧(录像中有帧时)和合成帧
+    """
+    scenes = []
+    frames = readSsrBlobFrames(filename)
+    if frames:
+        scenes.append(("SSR sample", scene_of(frames[0])))
+    scenes.append(("synthetic 512x424", scene_of(synthetic_frame())))
+    return scenes
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Services the streaming channels of several cameras with one I/O thread (selectors, i.e. epoll
+                 on Linux) and a decoder pool. Decoded frames are grouped by device timestamp into framesets.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import collections
+import logging
+import queue
+import selectors
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.Streaming import Data
+from common.Streaming.BinaryParser import timeStampToMs
+from common.Streaming.ParserContext import ParserContext
+
+logger = logging.getLogger(__name__)
+
+
+class HubFrame:
+    """ One decoded frame of a camera of the hub.
+
+    The arrays of data are views on the received frame buffer, which belongs to the frame pool of the stream.
+    release() hands the buffer back for reuse; data must not be used afterwards.
+    """
+
+    def __init__(self, cameraName, data, deviceTimeMs, receiveTime, buffer=None, stream=None):
+        self.cameraName = cameraName
+        self.data = data  # common.Streaming.Data.Data (decoded with asNumpy=True)
+        self.deviceTimeMs = deviceTimeMs  # device timestamp in ms, see timeStampToMs()
+        self.receiveTime = receiveTime  # time.time() when the frame header was received
+        self._buffer = buffer
+        self._stream = stream
+
+    def release(self):
+        """ Returns the frame buffer to the frame pool of the stream; calling it again does nothing """
+        buffer, self._buffer = self._buffer, None
+        if buffer is not None:
+            self._stream.releaseFrame(buffer)
+
+
+def releaseFrameset(frameset):
+    """ Releases every HubFrame of a frameset returned by CameraHub.getFrameset() """
+    for hubFrame in frameset.values():
+        hubFrame.release()
+
+
+class _HubCamera:
+    """ State of one camera of the hub """
+
+    FPS_WINDOW = 30
+
+    def __init__(self, name, stream, parserContext):
+        self.name = name
+        self.stream = stream
+        self.parserContext = parserContext
+        self.connected = True
+        self.socketTimeout = None  # timeout of the stream socket, restored when the hub stops
+        self.lock = threading.Lock()
+        self.decoding = False  # at most one frame per camera is decoded at a time (the parser context is shared)
+        self.pendingFrame = None  # newest received frame waiting for the decoder
+        self.synced = collections.deque()  # decoded frames waiting for a frameset
+        self.receiveTimes = collections.deque(maxlen=self.FPS_WINDOW)
+        # statistics
+        self.receivedFrames = 0
+        self.decodedFrames = 0
+        self.droppedFrames = 0  # replaced while waiting for the decoder
+        self.unsyncedFrames = 0  # no partner frame within the skew window
+        self.decodeErrors = 0
+
+    def fps(self):
+        if len(self.receiveTimes) < 2:
+            return 0.0
+        span = self.receiveTimes[-1] - self.receiveTimes[0]
+        return (len(self.receiveTimes) - 1) / span if span > 0 else 0.0
+
+
+class CameraHub:
+    """ Receives the frames of N cameras without a blocking thread per camera.
+
+    The streams (Streaming or UdpStreaming, already opened and streaming in continuous mode) are registered
+    with addCamera(), e.g. hub.addCamera("left", camera.streaming_device, camera.parser_context) for a
+    connected QtVisionSick. One I/O thread waits for all sockets, a pool of decoder threads parses the frames.
+    While the hub runs the sockets are non-blocking: the I/O thread only receives what has arrived
+    (Streaming.receiveAvailable()), so a slow or stalled camera never delays the others.
+    A frame that arrives while the previous frame of the same camera is still waiting for the decoder
+    replaces it (dropped frame, its buffer goes back to the frame pool), so a slow decoder never delays the
+    newest data.
+
+    Frames of different cameras whose device timestamps differ by at most maxSkewMs form a frameset
+    (dict camera name -> HubFrame), which is returned by getFrameset() or passed to onFrameset.
+    The device clocks have to be synchronized (e.g. NTP/PTP) for a small skew window.
+
+    The decoded frames are views on the pooled receive buffers. The hub releases the frames it drops (stale or
+    unsynced frames, framesets evicted from the full queue); a frameset returned by getFrameset() belongs to the
+    caller, who releases it with releaseFrameset() when done, otherwise every frame needs a new buffer.
+    """
+
+    def __init__(self, maxSkewMs=10.0, decodeWorkers=None, maxQueuedFramesets=4, maxSyncQueue=8,
+                 onFrameset=None):
+        """
+        maxSkewMs:          maximal difference of the device timestamps within a frameset
+        decodeWorkers:      number of decoder threads, default: number of cameras when started
+        maxQueuedFramesets: framesets not fetched with getFrameset() are dropped beyond this number
+        maxSyncQueue:       decoded frames per camera waiting for their partners
+        onFrameset:         optional callback, called in a decoder thread with every frameset; the frames are
+                            only guaranteed to be valid during the call (the frameset is queued for
+                            getFrameset() as well and released if it is evicted), copy what is kept
+        """
+        self.maxSkewMs = maxSkewMs
+        self.decodeWorkers = decodeWorkers
+        self.maxSyncQueue = maxSyncQueue
+        self.onFrameset = onFrameset
+        self._cameras = collections.OrderedDict()
+        self._framesets = queue.Queue(maxQueuedFramesets)
+        self._syncLock = threading.Lock()
+        self._selector = None
+        self._executor = None
+        self._ioThread = None
+        self._running = False
+        self._wakeup = None
+        self.framesets = 0
+        self.droppedFramesets = 0
+
+    def addCamera(self, name, stream, parserContext=None):
+        """ Registers an opened stream. Cameras can only be added while the hub is stopped. """
+        if self._running:
+            raise RuntimeError("Cameras can only be added while the hub is stopped")
+        if name in self._cameras:
+            raise ValueError("Camera {} is already registered".format(name))
+        self._cameras[name] = _HubCamera(name, stream, parserContext if parserContext is not None else ParserContext())
+
+    def start(self):
+        if self._running:
+            return
+        if not self._cameras:
+            raise RuntimeError("No camera registered")
+        self._selector = selectors.DefaultSelector()
+        self._wakeup = socket.socketpair()
+        self._wakeup[0].setblocking(False)
+        self._selector.register(self._wakeup[0], selectors.EVENT_READ, None)
+        for camera in self._cameras.values():
+            camera.socketTimeout = camera.stream.sock_stream.gettimeout()
+            camera.stream.sock_stream.setblocking(False)
+            self._selector.register(camera.stream, selectors.EVENT_READ, camera)
+        workers = self.decodeWorkers or len(self._cameras)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="CameraHubDecoder")
+        self._running = True
+        self._ioThread = threading.Thread(target=self._ioLoop, name="CameraHubIO", daemon=True)
+        self._ioThread.start()
+        logger.info("Camera hub started with %d cameras and %d decoder threads" % (len(self._cameras), workers))
+
+    def stop(self, timeout=5.0):
+        """ Stops the threads; the streams stay open """
+        if not self._running:
+            return
+        self._running = False
+        try:
+            self._wakeup[1].send(b'\0')
+        except OSError:
+            pass
+        self._ioThread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self._selector.close()
+        for sock in self._wakeup:
+            sock.close()
+        for camera in self._cameras.values():
+            try:
+                camera.stream.sock_stream.settimeout(camera.socketTimeout)
+            except OSError:
+                pass
+            with camera.lock:
+                if camera.pendingFrame is not None:
+                    camera.stream.releaseFrame(camera.pendingFrame[0])
+                    camera.pendingFrame = None
+        with self._syncLock:
+            # frames waiting for their partners are stale when the hub is started again
+            for camera in self._cameras.values():
+                while camera.synced:
+                    camera.synced.popleft().release()
+        self._ioThread = None
+        logger.info("Camera hub stopped")
+
+    def getFrameset(self, timeout=None):
+        """ Returns the oldest frameset not fetched yet (dict camera name -> HubFrame).
+            Raises queue.Empty if there is none within timeout seconds.
+            Release the frameset with releaseFrameset() (or HubFrame.release()) when its data is not used anymore,
+            so the receive buffers are reused.
+        """
+        return self._framesets.get(timeout=timeout)
+
+    def getStatistics(self):
+        """ Returns per camera: fps, received, decoded, dropped, unsynced, decodeErrors, connected """
+        statistics = {}
+        for camera in self._cameras.values():
+            statistics[camera.name] = {'fps': camera.fps(),
+                                       'received': camera.receivedFrames,
+                                       'decoded': camera.decodedFrames,
+                                       'dropped': camera.droppedFrames,
+                                       'unsynced': camera.unsyncedFrames,
+                                       'decodeErrors': camera.decodeErrors,
+                                       'connected': camera.connected}
+        return statistics
+
+    def _ioLoop(self):
+        while self._running:
+            for key, _ in self._selector.select(timeout=1.0):
+                camera = key.data
+                if camera is None:
+                    self._wakeup[0].recv(64)
+                    continue
+                self._receive(camera)
+
+    def _receive(self, camera):
+        """ Takes all frames the socket of camera has completed so far, without waiting for more; frames which
+            are already in the stream buffer are not signaled by the selector
+        """
+        while True:
+            try:
+                frame = camera.stream.receiveAvailable()
+            except Exception as err:
+                logger.error("Camera %s: receiving failed, removing it from the hub: %s" % (camera.name, err))
+                camera.connected = False
+                self._selector.unregister(camera.stream)
+                return
+            if frame is None:
+                return
+            self._enqueue(camera, frame, camera.stream.frame_acq_time_s)
+
+    def _enqueue(self, camera, frame, receiveTime):
+        with camera.lock:
+            camera.receivedFrames += 1
+            camera.receiveTimes.append(receiveTime)
+            if camera.pendingFrame is not None:
+                # not decoded yet, nothing refers to the buffer
+                camera.droppedFrames += 1
+                camera.stream.releaseFrame(camera.pendingFrame[0])
+            camera.pendingFrame = (frame, receiveTime)
+            if camera.decoding:
+                return
+            camera.decoding = True
+        self._executor.submit(self._decodeLoop, camera)
+
+    def _decodeLoop(self, camera):
+        while True:
+            with camera.lock:
+                if camera.pendingFrame is None or not self._running:
+                    camera.decoding = False
+                    return
+                frame, receiveTime = camera.pendingFrame
+                camera.pendingFrame = None
+            try:
+                myData = Data.Data(parserContext=camera.parserContext)
+                myData.read(frame, asNumpy=True)
+            except Exception as err:
+                logger.error("Camera %s: decoding failed: %s" % (camera.name, err))
+                camera.decodeErrors += 1
+                camera.stream.releaseFrame(frame)
+                continue
+            camera.decodedFrames += 1
+            deviceTimeMs = timeStampToMs(myData.depthmap.timestamp) if myData.hasDepthMap else None
+            if deviceTimeMs is None:
+                # no usable device clock, fall back to the receive time
+                deviceTimeMs = receiveTime * 1000.0
+            self._synchronize(HubFrame(camera.name, myData, deviceTimeMs, receiveTime, frame, camera.stream))
+
+    def _synchronize(self, hubFrame):
+        """ Matches the oldest waiting frame of every camera; a frame which is older than maxSkewMs
+            compared to the newest of these frames can never be matched and is dropped.
+        """
+        completed = []
+        with self._syncLock:
+            camera = self._cameras[hubFrame.cameraName]
+            camera.synced.append(hubFrame)
+            if len(camera.synced) > self.maxSyncQueue:
+                camera.synced.popleft().release()
+                camera.unsyncedFrames += 1
+            cameras = [camera for camera in self._cameras.values() if camera.connected or camera.synced]
+            while all(camera.synced for camera in cameras):
+                heads = [camera.synced[0] for camera in cameras]
+                newest = max(head.deviceTimeMs for head in heads)
+                stale = [camera for camera, head in zip(cameras, heads) if newest - head.deviceTimeMs > self.maxSkewMs]
+                if not stale:
+                    completed.append(collections.OrderedDict((camera.name, camera.synced.popleft())
+                                                             for camera in cameras))
+                    continue
+                for camera in stale:
+                    camera.synced.popleft().release()
+                    camera.unsyncedFrames += 1
+        for frameset in completed:
+            self._publish(frameset)
+
+    def _publish(self, frameset):
+        self.framesets += 1
+        if self.onFrameset is not None:
+            try:
+                self.onFrameset(frameset)
+            except Exception as err:
+                logger.error("Frameset callback failed: %s" % err)
+        while True:
+            try:
+                self._framesets.put_nowait(frameset)
+                return
+            except queue.Full:
+                try:
+                    releaseFrameset(self._framesets.get_nowait())
+                    self.droppedFramesets += 1
+                except queue.Empty:
+                    pass
@@ -163,6 +163,10 @@ class Control:
 
         logger.info("done.")
 
+    def getLocalIpAddress(self):
+        """ IP address of the local adapter of the control channel, i.e. the address the device reaches us at """
+        return self.sock_sopas.getsockname()[0]
+
     def close(self):
         """ close device control channel """
         if self.sock_sopas is not None:
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Vectorized flying pixel detection for ToF depth maps: pixels between a foreground and a background
+                 surface (mixed echoes at object edges), found with depth discontinuity and ray angle criteria on
+                 shifted views of the whole depth map.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import math
+import time
+
+import numpy as np
+
+# neighbor directions (row shift, column shift): horizontal, vertical and both diagonals
+AXES = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def _flatOffset(shift, width):
+    """ Offset of the neighbor p + shift in the flat layout with one padding column per row """
+    return shift[0] * (width + 1) + shift[1]
+
+
+def _padded(image, fill):
+    """ Returns the (height, width) image as flat array with one column of fill values after each row """
+    padded = np.full((image.shape[0], image.shape[1] + 1), fill, dtype=np.float32)
+    padded[:, :-1] = image
+    return padded.ravel()
+
+
+def neighborRayCosines(rayTable):
+    """ Returns the cosine of the angle between the viewing rays of each pixel p and its neighbor p + shift for
+        every direction of AXES, as flat arrays in the padded layout of FlyingPixelFilter (0 without neighbor)
+    """
+    rays = [_padded(ray, 0.0).astype(np.float64) for ray in (rayTable.rayX, rayTable.rayY, rayTable.rayZ)]
+    cosines = []
+    for shift in AXES:
+        offset = _flatOffset(shift, rayTable.width)
+        cosine = np.zeros(rays[0].size)
+        for ray in rays:
+            cosine[:-offset] += ray[:-offset] * ray[offset:]
+        cosines.append(cosine)
+    return cosines
+
+
+class FlyingPixelFilter:
+    """ Detects flying pixels in a radial distance map.
+
+    The edge between a pixel p and its neighbor q is a veil edge if
+      - the distances differ by more than jumpThreshold + jumpRatio * (d_p + d_q) / 2 and
+      - (with a ray table) the line between the 3D points of p and q encloses an angle of less than maxRayAngle
+        degrees with the viewing ray, i.e. the "surface" between them is seen edge-on. With the cosine c of the
+        angle between both rays, the squared distance of the points is (d_q - d_p)^2 + 2 d_p d_q (1 - c), the
+        second term is the squared offset across the ray. The criterion is
+        2 d_p d_q (1 - c) < tan^2(maxRayAngle) (d_q - d_p)^2, no 3D points are needed.
+    A pixel is a flying pixel if it lies between its two neighbors of one direction (horizontal, vertical or
+    diagonal) with a veil edge to both of them: one neighbor is much closer, the opposite one much farther.
+    The outermost pixels of a real edge have a veil edge on one side only and are kept.
+
+    The depth map is copied into a flat buffer with one NaN column after each row, so the neighbors of all
+    pixels in one direction are a shifted contiguous view of the same buffer, and invalid pixels (NaN) fail
+    every comparison. The buffers are allocated once per image size, detect() returns the mask buffer, which
+    is overwritten by the next call.
+    """
+
+    def __init__(self, jumpThreshold=20.0, jumpRatio=0.01, maxRayAngle=15.0, diagonals=True):
+        """
+        jumpThreshold: smallest distance difference of a veil edge, in distance units (mm)
+        jumpRatio:     additional threshold relative to the distance (ToF noise grows with the distance)
+        maxRayAngle:   largest angle between viewing ray and edge in degrees, None disables the criterion
+        diagonals:     also check the diagonal neighbors, else horizontal and vertical ones only
+        """
+        self.jumpThreshold = jumpThreshold
+        self.jumpRatio = jumpRatio
+        self.maxRayAngle = maxRayAngle
+        self.axes = AXES if diagonals else AXES[:2]
+        self.time = 0.0  # cost of the last detect() in ms
+        self._shape = None
+        self._rayTableKey = None
+        self._offsetFactors = None
+
+    def _allocate(self, shape):
+        self._shape = shape
+        size = shape[0] * (shape[1] + 1)
+        self._padded = np.full((shape[0], shape[1] + 1), np.nan, dtype=np.float32)
+        self._depth = self._padded.ravel()
+        self._halfThreshold = np.empty(size, dtype=np.float32)
+        self._difference = np.empty(size, dtype=np.float32)
+        self._squaredDifference = np.empty(size, dtype=np.float32)
+        self._threshold = np.empty(size, dtype=np.float32)
+        self._veil = np.empty(size, dtype=bool)
+        self._between = np.empty(size, dtype=bool)
+        self._flatMask = np.zeros(size, dtype=bool)
+        self._mask = self._flatMask.reshape(shape[0], shape[1] + 1)[:, :-1]
+        self._rayTableKey = None
+
+    def _rayOffsetFactors(self, rayTable):
+        """ 2 (1 - c) / tan^2(maxRayAngle) per edge, cached per ray table """
+        key = (rayTable.key, self.maxRayAngle)
+        if key != self._rayTableKey:
+            tanSquared = math.tan(math.radians(self.maxRayAngle)) ** 2
+            cosines = neighborRayCosines(rayTable)
+            self._offsetFactors = [(2.0 * (1.0 - cosines[AXES.index(shift)]) / tanSquared).astype(np.float32)
+                                   for shift in self.axes]
+            self._rayTableKey = key
+        return self._offsetFactors
+
+    def detect(self, distance, rayTable=None, valid=None):
+        """ Returns the (height, width) bool mask of the flying pixels.
+
+        distance: (height, width) radial distance map, 0 marks invalid pixels
+        rayTable: RayTable of the camera for the ray angle criterion, None to use the discontinuity only
+        valid:    optional bool mask of valid pixels, edges to invalid pixels are never veil edges
+        """
+        start = time.perf_counter()
+        distance = np.asarray(distance)
+        if distance.ndim == 1 and rayTable is not None:
+            distance = distance.reshape(rayTable.height, rayTable.width)
+        if distance.shape != self._shape:
+            self._allocate(distance.shape)
+        width = distance.shape[1]
+        image = self._padded[:, :-1]
+        np.copyto(image, distance, casting='unsafe')
+        image[image <= 0] = np.nan
+        if valid is not None:
+            image[~np.asarray(valid, dtype=bool).reshape(image.shape)] = np.nan
+        depth = self._depth
+        halfThreshold = self._halfThreshold
+        np.multiply(depth, np.float32(0.5 * self.jumpRatio), out=halfThreshold)
+        halfThreshold += np.float32(0.5 * self.jumpThreshold)
+        offsetFactors = None
+        if rayTable is not None and self.maxRayAngle is not None:
+            offsetFactors = self._rayOffsetFactors(rayTable)
+
+        flatMask = self._flatMask
+        flatMask[:] = False
+        for axis, shift in enumerate(self.axes):
+            offset = _flatOffset(shift, width)
+            edges = depth.size - offset
+            # edge from p to p + shift, stored at p
+            near, far = depth[:edges], depth[offset:]
+            difference = self._difference[:edges]
+            squaredDifference = self._squaredDifference[:edges]
+            threshold = self._threshold[:edges]
+            veil = self._veil[:edges]
+            np.subtract(far, near, out=difference)
+            np.multiply(difference, difference, out=squaredDifference)
+            np.add(halfThreshold[:edges], halfThreshold[offset:], out=threshold)
+            threshold *= threshold
+            np.greater(squaredDifference, threshold, out=veil)
+            if offsetFactors is not None:
+                np.multiply(near, far, out=threshold)
+                threshold *= offsetFactors[axis][:edges]
+                veil &= np.greater(squaredDifference, threshold, out=self._between[:edges])
+            # p lies between p - shift and p + shift if both edges are veil edges in the same direction
+            inner = edges - offset
+            between = self._between[:inner]
+            np.multiply(difference[:inner], difference[offset:], out=threshold[:inner])
+            np.greater(threshold[:inner], 0, out=between)
+            between &= veil[:inner]
+            between &= veil[offset:]
+            flatMask[offset:edges] |= between
+        self.time = (time.perf_counter() - start) * 1000
+        return self._mask
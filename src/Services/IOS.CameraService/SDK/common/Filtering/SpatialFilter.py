@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Spatial filtering of uint16 depth maps with OpenCV: filling of small holes (inpainting of
+                 invalid pixels), median and edge preserving bilateral filter, working on preallocated buffers.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import collections
+import time
+
+import cv2
+import numpy as np
+
+INPAINT_METHODS = {'telea': cv2.INPAINT_TELEA, 'ns': cv2.INPAINT_NS}
+# distance values without measurement: 0 (filtered pixel) and 0xFFFF (no echo / out of range)
+NO_DISTANCE = 0xFFFF
+
+
+class SpatialDepthFilter:
+    """ Filters a uint16 distance map (raw device values, 0 and 0xFFFF = invalid) in the stages
+
+      1. inpainting: invalid pixels in holes smaller than holeSize x holeSize are filled from their valid
+         neighbors (cv2.inpaint); larger invalid regions stay invalid. cv2.inpaint uses every pixel outside
+         the hole mask as source, so hole pixels within inpaintRadius of a large invalid region are not filled.
+      2. median:     cv2.medianBlur with kernel 3 or 5 (the sizes OpenCV supports for 16 bit). To ignore
+         the invalid pixels, the median is computed with the invalid pixels set to 0 and set to 65535;
+         the mean of both brackets the median of the valid neighbors. Pixels whose kernel is not mostly
+         valid keep their value.
+      3. bilateral:  edge preserving cv2.bilateralFilter (on a float32 copy, OpenCV has no 16 bit version),
+         invalid pixels get no weight as their depth difference is far beyond the range sigma
+
+    Every stage is optional. Pixels which are invalid after the inpainting keep their input value, so the
+    smoothing never creates depth values in regions without data.
+    All intermediate images are allocated once per image size and reused, apply() returns the output buffer,
+    which is overwritten by the next call. The cost of each stage of the last call is kept in timings (ms).
+    """
+
+    def __init__(self, medianSize=3, bilateralDiameter=0, bilateralSigmaColor=30.0, bilateralSigmaSpace=3.0,
+                 inpaintRadius=0, holeSize=5, inpaintMethod='ns'):
+        """
+        medianSize:          3 or 5, 0 disables the median filter
+        bilateralDiameter:   pixel neighborhood of the bilateral filter, 0 disables it
+        bilateralSigmaColor: range sigma of the bilateral filter in distance units of the input
+        bilateralSigmaSpace: spatial sigma of the bilateral filter in pixels
+        inpaintRadius:       radius of the inpainting, 0 disables the hole filling
+        holeSize:            invalid regions which disappear in a morphological closing with a
+                             holeSize x holeSize kernel are filled
+        inpaintMethod:       'ns' (Navier-Stokes) or 'telea'
+        """
+        if medianSize not in (0, 3, 5):
+            raise ValueError("OpenCV supports median kernels of size 3 and 5 for 16 bit images")
+        if inpaintMethod not in INPAINT_METHODS:
+            raise ValueError("Unknown inpainting method {}, expected one of {}".format(
+                inpaintMethod, list(INPAINT_METHODS)))
+        self.medianSize = medianSize
+        self.bilateralDiameter = bilateralDiameter
+        self.bilateralSigmaColor = bilateralSigmaColor
+        self.bilateralSigmaSpace = bilateralSigmaSpace
+        self.inpaintRadius = inpaintRadius
+        self.holeSize = holeSize
+        self.inpaintMethod = inpaintMethod
+        self.timings = collections.OrderedDict()
+        self.filledPixels = 0  # pixels filled by the inpainting of the last call
+        self._shape = None
+
+    def _allocate(self, shape):
+        self._shape = shape
+        self._output = np.empty(shape, dtype=np.uint16)
+        self._work = np.empty(shape, dtype=np.uint16)
+        self._valid = np.empty(shape, dtype=np.uint8)
+        self._closed = np.empty(shape, dtype=np.uint8)
+        self._holes = np.empty(shape, dtype=np.uint8)
+        self._nearInvalid = np.empty(shape, dtype=np.uint8)
+        self._high = np.empty(shape, dtype=np.uint16)
+        self._highFiltered = np.empty(shape, dtype=np.uint16)
+        self._validCount = np.empty(shape, dtype=np.uint8)
+        self._medianValid = np.empty(shape, dtype=bool)
+        self._sum = np.empty(shape, dtype=np.uint32)
+        self._float = np.empty(shape, dtype=np.float32)
+        self._floatFiltered = np.empty(shape, dtype=np.float32)
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (self.holeSize, self.holeSize))
+        sourceSize = 2 * self.inpaintRadius + 1
+        self._sourceKernel = cv2.getStructuringElement(cv2.MORPH_RECT, (sourceSize, sourceSize))
+
+    def apply(self, distance, valid=None):
+        """ Filters the (height, width) uint16 distance map and returns the filtered map (output buffer).
+
+        valid: optional bool mask of additionally valid pixels (e.g. StateMap.valid); pixels outside the
+               mask are treated like pixels without distance
+        """
+        distance = np.asarray(distance)
+        if distance.dtype != np.uint16:
+            raise TypeError("The spatial filter works on uint16 distance maps, got {}".format(distance.dtype))
+        if distance.shape != self._shape:
+            self._allocate(distance.shape)
+        self.timings.clear()
+        output = self._output
+
+        start = time.perf_counter()
+        np.not_equal(distance, 0, out=self._valid, casting='unsafe')
+        self._valid[distance == NO_DISTANCE] = 0
+        if valid is not None:
+            self._valid &= np.asarray(valid, dtype=np.uint8).reshape(distance.shape)
+        np.multiply(distance, self._valid, out=output, casting='unsafe')
+        self.timings['mask'] = (time.perf_counter() - start) * 1000
+
+        self.filledPixels = 0
+        if self.inpaintRadius > 0:
+            start = time.perf_counter()
+            # small holes are the invalid pixels which are valid after a closing of the valid mask
+            cv2.morphologyEx(self._valid, cv2.MORPH_CLOSE, self._kernel, dst=self._closed)
+            np.subtract(self._closed, self._valid, out=self._holes)
+            # only holes whose inpainting neighborhood contains valid pixels and holes only; removed hole
+            # pixels are invalid sources for their neighbors, so repeat until no hole pixel is removed
+            while True:
+                np.subtract(1, self._valid, out=self._nearInvalid)
+                self._nearInvalid -= self._holes
+                cv2.dilate(self._nearInvalid, self._sourceKernel, dst=self._nearInvalid)
+                self._nearInvalid &= self._holes
+                if not cv2.countNonZero(self._nearInvalid):
+                    break
+                self._holes -= self._nearInvalid
+            self.filledPixels = int(cv2.countNonZero(self._holes))
+            if self.filledPixels:
+                cv2.inpaint(output, self._holes, self.inpaintRadius, INPAINT_METHODS[self.inpaintMethod],
+                            dst=self._work)
+                np.copyto(output, self._work)
+                self._valid |= self._holes
+            self.timings['inpaint'] = (time.perf_counter() - start) * 1000
+
+        if self.medianSize:
+            start = time.perf_counter()
+            # lower bracket: invalid pixels are 0 (output), upper bracket: invalid pixels are 65535
+            cv2.medianBlur(output, self.medianSize, dst=self._work)
+            np.copyto(self._high, output)
+            self._high[self._valid == 0] = 0xFFFF
+            cv2.medianBlur(self._high, self.medianSize, dst=self._highFiltered)
+            np.add(self._work, self._highFiltered, out=self._sum, dtype=np.uint32)
+            self._sum += 1
+            self._sum >>= 1
+            # both brackets are valid values if more than half of the kernel is valid; invalid pixels keep 0,
+            # otherwise the median would fill holes and the bilateral filter would smooth with these values
+            cv2.boxFilter(self._valid, -1, (self.medianSize, self.medianSize), dst=self._validCount,
+                          normalize=False, borderType=cv2.BORDER_CONSTANT)
+            np.greater(self._validCount, self.medianSize * self.medianSize // 2, out=self._medianValid)
+            np.logical_and(self._medianValid, self._valid, out=self._medianValid)
+            np.copyto(output, self._sum, where=self._medianValid, casting='unsafe')
+            self.timings['median'] = (time.perf_counter() - start) * 1000
+
+        if self.bilateralDiameter > 0:
+            start = time.perf_counter()
+            np.copyto(self._float, output, casting='unsafe')
+            cv2.bilateralFilter(self._float, self.bilateralDiameter, self.bilateralSigmaColor,
+                                self.bilateralSigmaSpace, dst=self._floatFiltered)
+            np.rint(self._floatFiltered, out=self._floatFiltered)
+            np.copyto(output, self._floatFiltered, casting='unsafe')
+            self.timings['bilateral'] = (time.perf_counter() - start) * 1000
+
+        # the smoothing must not create values where there is no data
+        start = time.perf_counter()
+        np.copyto(output, distance, where=self._valid == 0)
+        self.timings['restoreMask'] = (time.perf_counter() - start) * 1000
+        return output
+
+    @property
+    def totalTime(self):
+        """ Cost of the last apply() in ms """
+        return sum(self.timings.values())
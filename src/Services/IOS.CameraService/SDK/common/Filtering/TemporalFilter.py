@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Temporal depth filter over a ring buffer of the last N depth maps: per pixel median, exponential
+                 moving average or confidence weighted mean, with a per pixel reset on large depth jumps.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import numpy as np
+
+MODE_MEDIAN = 'median'
+MODE_EMA = 'ema'
+MODE_CONFIDENCE = 'confidence'
+MODES = (MODE_MEDIAN, MODE_EMA, MODE_CONFIDENCE)
+
+
+class TemporalDepthFilter:
+    """ Filters consecutive depth maps of one camera pixel by pixel.
+
+    The last `frames` depth maps are kept in a preallocated (frames, height, width) float32 ring buffer,
+    invalid samples (distance 0 or weight 0) are stored as NaN. update() adds a depth map and returns the
+    filtered depth map (0 where no valid sample is left):
+      median:     median of the valid samples in the ring
+      ema:        exponential moving average, state = alpha * d + (1 - alpha) * state
+      confidence: mean of the samples in the ring weighted with the given weights (e.g. confidence values),
+                  kept as running sums which are updated with the incoming and the overwritten sample
+
+    If a new valid sample differs by more than jumpThreshold from the current filter output of its pixel
+    (e.g. a box arrived on the conveyor), the history of that pixel is dropped and the filter restarts
+    with the new sample, so the new object is not blurred with the old background.
+
+    With a sequence number of every depth map, a frame which was already added (e.g. the latest frame of the
+    acquisition thread fetched by several calls) is not added again and does not outweigh the other samples.
+    Negative numbers (the old depth map format has no frame number, the parser reports -1) are always added.
+    """
+
+    def __init__(self, frames=5, mode=MODE_MEDIAN, alpha=0.3, jumpThreshold=50.0):
+        """
+        frames:        number of depth maps in the ring buffer
+        mode:          'median', 'ema' or 'confidence'
+        alpha:         weight of a new sample for 'ema'
+        jumpThreshold: per pixel reset threshold in distance units (mm), None to disable the reset
+        """
+        if mode not in MODES:
+            raise ValueError("Unknown temporal filter mode {}, expected one of {}".format(mode, MODES))
+        if frames < 1:
+            raise ValueError("The ring buffer needs at least one frame")
+        self.frames = frames
+        self.mode = mode
+        self.alpha = alpha
+        self.jumpThreshold = jumpThreshold
+        self.shape = None
+        self.resetPixels = 0  # pixels reset by the last update()
+        self.repeatedFrames = 0  # update() calls with the frame number of the previous frame, not added
+        self._lastFrameNumber = None
+        self._ring = None
+        self._weights = None
+        self._position = 0
+        self._filtered = None
+
+    def reset(self):
+        """ Drops the history; the next update() starts with an empty ring """
+        self.shape = None
+        self._ring = None
+        self._weights = None
+        self._filtered = None
+        self._lastFrameNumber = None
+
+    def _allocate(self, shape):
+        self.shape = shape
+        self._position = 0
+        self._ring = np.full((self.frames,) + shape, np.nan, dtype=np.float32)
+        self._filtered = np.zeros(shape, dtype=np.float32)
+        self._state = np.full(shape, np.nan, dtype=np.float32)  # current estimate, NaN without valid sample
+        if self.mode == MODE_MEDIAN:
+            self._sorted = np.empty_like(self._ring)
+            self._low = np.empty(shape, dtype=np.float32)
+        if self.mode == MODE_CONFIDENCE:
+            self._weights = np.zeros((self.frames,) + shape, dtype=np.float32)
+            self._sumWeights = np.zeros(shape, dtype=np.float64)
+            self._sumWeightedDistance = np.zeros(shape, dtype=np.float64)
+
+    @property
+    def filtered(self):
+        """ The filtered depth map of the last update() (float32, 0 without valid sample) """
+        return self._filtered
+
+    def update(self, distance, weights=None, frameNumber=None):
+        """ Adds a depth map and returns the filtered depth map.
+
+        distance:    (height, width) depth map, 0 marks invalid pixels
+        weights:     optional (height, width) per pixel weights (e.g. confidence, or a bool valid mask);
+                     a weight of 0 marks the pixel as invalid. Used as weights in 'confidence' mode.
+        frameNumber: optional sequence number (or device frame number) of the depth map; a depth map with the
+                     same number as the previous one is not added again, the current filter output is returned.
+                     None or a negative number (no frame number) never counts as a repeat.
+        """
+        distance = np.asarray(distance)
+        if frameNumber is not None and frameNumber >= 0 and frameNumber == self._lastFrameNumber and \
+                distance.shape == self.shape:
+            self.repeatedFrames += 1
+            return self._filtered
+        self._lastFrameNumber = frameNumber
+        if distance.shape != self.shape:
+            self._allocate(distance.shape)
+        sample = distance.astype(np.float32, copy=True)
+        valid = distance > 0
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float32).reshape(distance.shape)
+            valid &= weights > 0
+        sample[~valid] = np.nan
+
+        if self.jumpThreshold is not None:
+            jumped = valid & (np.abs(sample - self._state) > self.jumpThreshold)
+            self.resetPixels = int(np.count_nonzero(jumped))
+            if self.resetPixels:
+                self._resetPixels(jumped)
+        else:
+            self.resetPixels = 0
+
+        slot = self._position
+        self._position = (self._position + 1) % self.frames
+        if self.mode == MODE_CONFIDENCE:
+            self._updateWeightedSums(slot, sample, valid, weights)
+        self._ring[slot] = sample
+
+        if self.mode == MODE_MEDIAN:
+            self._state = self._median()
+        elif self.mode == MODE_EMA:
+            # pixels without state start with the sample, invalid samples keep the state
+            state = self._state
+            np.copyto(state, sample, where=valid & np.isnan(state))
+            np.copyto(state, self.alpha * sample + (1 - self.alpha) * state, where=valid)
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._state = (self._sumWeightedDistance / self._sumWeights).astype(np.float32)
+        np.copyto(self._filtered, self._state)
+        self._filtered[np.isnan(self._state)] = 0.0
+        return self._filtered
+
+    def _resetPixels(self, pixels):
+        self._ring[:, pixels] = np.nan
+        self._state[pixels] = np.nan
+        if self.mode == MODE_CONFIDENCE:
+            self._weights[:, pixels] = 0.0
+            self._sumWeights[pixels] = 0.0
+            self._sumWeightedDistance[pixels] = 0.0
+
+    def _updateWeightedSums(self, slot, sample, valid, weights):
+        # remove the overwritten sample, add the new one
+        oldWeights = self._weights[slot]
+        oldSample = np.nan_to_num(self._ring[slot], nan=0.0)
+        self._sumWeights -= oldWeights
+        self._sumWeightedDistance -= oldWeights * oldSample
+        newWeights = np.where(valid, weights if weights is not None else np.float32(1.0), np.float32(0.0))
+        self._weights[slot] = newWeights
+        self._sumWeights += newWeights
+        self._sumWeightedDistance += newWeights * np.nan_to_num(sample, nan=0.0)
+        # rounding leftovers of removed samples
+        empty = self._sumWeights <= 1e-6
+        self._sumWeights[empty] = 0.0
+        self._sumWeightedDistance[empty] = 0.0
+
+    def _median(self):
+        """ Per pixel median of the valid samples.
+
+        The ring is sorted along the frame axis with an odd-even transposition network of element-wise
+        minimum/maximum operations on whole images, which is much faster than np.sort along the short axis.
+        Invalid samples are sorted to the end as +inf.
+        """
+        ordered = self._sorted
+        np.copyto(ordered, self._ring)
+        ordered[np.isnan(ordered)] = np.inf
+        low = self._low
+        for step in range(self.frames):
+            for i in range(step % 2, self.frames - 1, 2):
+                np.minimum(ordered[i], ordered[i + 1], out=low)
+                np.maximum(ordered[i], ordered[i + 1], out=ordered[i + 1])
+                ordered[i] = low
+        counts = np.count_nonzero(np.isfinite(ordered), axis=0)
+        lower = np.maximum(counts - 1, 0) // 2
+        upper = np.minimum(counts // 2, self.frames - 1)
+        low = np.take_along_axis(ordered, lower[np.newaxis], axis=0)[0]
+        high = np.take_along_axis(ordered, upper[np.newaxis], axis=0)[0]
+        median = np.where(counts % 2 == 1, low, (low + high) * np.float32(0.5))
+        median[counts == 0] = np.nan
+        return median
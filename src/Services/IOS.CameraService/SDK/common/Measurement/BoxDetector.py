@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Multi-box detection and dimensioning on a top-down height map: the objects are segmented from the
+                 support plane with connected components, each footprint is fitted with cv2.minAreaRect in world
+                 coordinates, giving length, width, height, yaw and centroid per box.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+
+def estimateSupportHeight(heightMap, binSize=10.0, minFraction=0.05):
+    """ Returns the height of the support plane (conveyor, floor) of a HeightMap or None if it has no valid cells.
+
+    The valid heights are histogrammed with binSize; the support is the lowest bin holding at least
+    minFraction of the cells (lower bins are noise), its height the mean of the cells of that bin and its
+    two neighbors (the window already excludes the outliers).
+    """
+    heights = heightMap.height[heightMap.valid]
+    if heights.size == 0:
+        return None
+    low = heights.min()
+    bins = ((heights - low) * np.float32(1.0 / binSize)).astype(np.int32)
+    counts = np.bincount(bins)
+    significant = np.flatnonzero(counts >= max(minFraction * heights.size, 1))
+    support = int(significant[0])
+    inWindow = (bins >= support - 1) & (bins <= support + 1)
+    return float(heights[inWindow].mean(dtype=np.float64))
+
+
+class BoxDimensions:
+    """ Dimensions of one detected object, lengths in mm and angles in degrees (world coordinates) """
+
+    def __init__(self, label, length, width, height, yaw, center, centroid, corners, area, cellCount):
+        self.label = label  # label of the object in BoxDetector.labels
+        self.length = length  # longer side of the footprint
+        self.width = width  # shorter side of the footprint
+        self.height = height  # top height above the support
+        self.yaw = yaw  # angle of the longer side to the world x axis, [0, 180)
+        self.center = center  # (x, y) center of the fitted rectangle
+        self.centroid = centroid  # (x, y, z) mean of the top surface cells
+        self.corners = corners  # (4, 2) corners of the fitted rectangle
+        self.area = area  # footprint area covered by cells (mm^2)
+        self.cellCount = cellCount
+
+    @property
+    def volume(self):
+        """ Volume of the bounding box L x W x H (mm^3) """
+        return self.length * self.width * self.height
+
+    @property
+    def fillRatio(self):
+        """ Covered footprint area / area of the fitted rectangle (1 for a box, smaller for other shapes) """
+        rectangle = self.length * self.width
+        return self.area / rectangle if rectangle > 0 else 0.0
+
+    def toDict(self):
+        return {
+            'length': round(self.length, 1),
+            'width': round(self.width, 1),
+            'height': round(self.height, 1),
+            'yaw': round(self.yaw, 2),
+            'center': [round(value, 1) for value in self.center],
+            'centroid': [round(value, 1) for value in self.centroid],
+            'area': round(self.area, 1),
+        }
+
+    def __repr__(self):
+        return "BoxDimensions({:.1f} x {:.1f} x {:.1f} mm, yaw {:.1f} deg, center ({:.1f}, {:.1f}))".format(
+            self.length, self.width, self.height, self.yaw, *self.center)
+
+
+class BoxDetector:
+    """ Detects the objects standing on the support plane in a HeightMap.
+
+      1. foreground: cells higher than minHeight above the support; a morphological closing with a
+         closingSize x closingSize kernel fills single empty cells in the box tops
+      2. steps: a foreground cell with a 4-neighbor more than stepHeight higher is removed, so boxes of
+         different height which touch each other become separate components (the lower box loses one
+         cell row at the step)
+      3. connected components (cv2.connectedComponentsWithStats), components below minArea are dropped
+      4. per component cv2.minAreaRect of the outer contour in grid coordinates, converted to world
+         coordinates; the rectangle through the outer cell centers is extended by one cell
+      5. height: heightPercentile of the cell heights above the support (robust against edge noise)
+
+    The per component work is restricted to its bounding box, so dozens of boxes cost little more than one.
+    The labels of the last detect() are kept in labels (0 = background).
+    """
+
+    def __init__(self, minHeight=20.0, minArea=2500.0, stepHeight=50.0, closingSize=3, heightPercentile=50.0):
+        """
+        minHeight:        smallest object height above the support (mm)
+        minArea:          smallest footprint of an object (mm^2)
+        stepHeight:       height difference which separates touching objects (mm), None to disable
+        closingSize:      kernel size of the closing of the foreground mask in cells, 0 to disable
+        heightPercentile: percentile of the cell heights which gives the object height
+        """
+        self.minHeight = minHeight
+        self.minArea = minArea
+        self.stepHeight = stepHeight
+        self.closingSize = closingSize
+        self.heightPercentile = heightPercentile
+        self.labels = None
+        self.supportHeight = None
+
+    def _foreground(self, above):
+        """ Returns the uint8 foreground mask of the heights above the support (NaN for empty cells) """
+        with np.errstate(invalid='ignore'):
+            foreground = (above > self.minHeight).astype(np.uint8)
+        if self.closingSize and self.closingSize > 1:
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (self.closingSize, self.closingSize))
+            cv2.morphologyEx(foreground, cv2.MORPH_CLOSE, kernel, dst=foreground)
+        if self.stepHeight is not None:
+            # cells with a much higher 4-neighbor lie at the border of a higher object; empty cells (filled
+            # by the closing) have no height and are kept
+            empty = np.isnan(above)
+            heights = above.copy()
+            heights[empty] = -np.inf
+            neighbors = cv2.dilate(heights, cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3)))
+            with np.errstate(invalid='ignore'):
+                higher = neighbors - heights > self.stepHeight
+            higher &= ~empty
+            foreground[higher] = 0
+        return foreground
+
+    def detect(self, heightMap, support=None):
+        """ Returns the list of BoxDimensions of the objects in the HeightMap, largest footprint first.
+
+        support: height of the support plane, a number or a (rows, cols) array of support heights per cell
+                 (e.g. of a tilted plane); None estimates a horizontal support (estimateSupportHeight)
+        """
+        if support is None:
+            support = estimateSupportHeight(heightMap, binSize=max(self.minHeight / 2.0, 1.0))
+            if support is None:
+                self.labels = np.zeros(heightMap.shape, dtype=np.int32)
+                return []
+        self.supportHeight = support
+        above = heightMap.height - np.asarray(support, dtype=np.float32)
+        foreground = self._foreground(above)
+        count, labels, stats, _ = cv2.connectedComponentsWithStats(foreground, connectivity=8, ltype=cv2.CV_32S)
+        self.labels = labels
+
+        grid = heightMap.grid
+        cellSize = grid.cellSize
+        minCells = self.minArea / (cellSize * cellSize)
+        boxes = []
+        for label in range(1, count):
+            left, top, cols, rows, cellCount = (int(value) for value in stats[label])
+            if cellCount < minCells:
+                continue
+            window = (slice(top, top + rows), slice(left, left + cols))
+            mask = labels[window] == label
+            contours, _ = cv2.findContours(mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            outline = np.concatenate(contours).reshape(-1, 2).astype(np.float32)
+            rectangle = cv2.minAreaRect(outline)
+            (centerCol, centerRow), _, _ = rectangle
+            corners = cv2.boxPoints(rectangle)
+            # grid (col, row) -> world (x, y), offsets of the window and of the cell centers
+            corners = np.column_stack((grid.xMin + (corners[:, 0] + left + 0.5) * cellSize,
+                                       grid.yMin + (corners[:, 1] + top + 0.5) * cellSize))
+            length, width, yaw = self._sides(corners)
+            # the rectangle runs through the centers of the outer cells
+            length += cellSize
+            width += cellSize
+
+            cellHeights = above[window][mask]
+            cellHeights = cellHeights[np.isfinite(cellHeights)]
+            if cellHeights.size == 0:
+                continue
+            height = float(np.percentile(cellHeights, self.heightPercentile))
+            rowIndices, colIndices = np.nonzero(mask)
+            centroid = (grid.xMin + (float(colIndices.mean()) + left + 0.5) * cellSize,
+                        grid.yMin + (float(rowIndices.mean()) + top + 0.5) * cellSize,
+                        float(np.nanmean(heightMap.height[window][mask])))
+            center = (grid.xMin + (centerCol + left + 0.5) * cellSize,
+                      grid.yMin + (centerRow + top + 0.5) * cellSize)
+            boxes.append(BoxDimensions(label, length, width, height, yaw, center, centroid, corners,
+                                       cellCount * cellSize * cellSize, cellCount))
+        boxes.sort(key=lambda box: box.area, reverse=True)
+        return boxes
+
+    @staticmethod
+    def _sides(corners):
+        """ Returns (length, width, yaw) of the rectangle with the 4 corners in order """
+        first = corners[1] - corners[0]
+        second = corners[2] - corners[1]
+        firstLength = float(np.hypot(*first))
+        secondLength = float(np.hypot(*second))
+        longer = first if firstLength >= secondLength else second
+        yaw = math.degrees(math.atan2(float(longer[1]), float(longer[0]))) % 180.0
+        return max(firstLength, secondLength), min(firstLength, secondLength), yaw
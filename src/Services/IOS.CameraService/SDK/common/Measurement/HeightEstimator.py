@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Block-trimmed height estimation: the z-map is split into a grid of blocks, each block is reduced
+                 to the mean of its valid values without the lowest and highest trimRatio, all blocks at once.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import numpy as np
+
+
+class BlockHeightStatistics:
+    """ Per block results of blockTrimmedMeans(), arrays of shape gridSize """
+
+    def __init__(self, means, counts, minimums, maximums, blockShape):
+        self.means = means  # trimmed mean, NaN for blocks without valid values
+        self.counts = counts  # number of valid values
+        self.minimums = minimums  # smallest valid value, NaN for empty blocks
+        self.maximums = maximums  # largest valid value, NaN for empty blocks
+        self.blockShape = blockShape  # (rows, cols) of a block in pixels
+
+    @property
+    def validBlocks(self):
+        return self.counts > 0
+
+    def minimum(self):
+        """ Returns (smallest trimmed block mean, (gridRow, gridCol)) or (None, None) if no block is valid """
+        if not self.validBlocks.any():
+            return None, None
+        index = np.unravel_index(np.nanargmin(self.means), self.means.shape)
+        return float(self.means[index]), (int(index[0]), int(index[1]))
+
+    def maximum(self):
+        """ Returns (largest trimmed block mean, (gridRow, gridCol)) or (None, None) if no block is valid """
+        if not self.validBlocks.any():
+            return None, None
+        index = np.unravel_index(np.nanargmax(self.means), self.means.shape)
+        return float(self.means[index]), (int(index[0]), int(index[1]))
+
+
+def blockTrimmedMeans(zMap, gridSize=(16, 16), trimRatio=0.1, valid=None):
+    """ Returns the BlockHeightStatistics of a (height, width) z-map.
+
+    gridSize:  (rows, cols) of the block grid, or one number for a square grid. The block size is
+               height // rows x width // cols, remaining rows and columns at the end are not used.
+    trimRatio: ceil(n * trimRatio) values are removed at both ends of a block with n valid values
+               before averaging (if at least one value remains)
+    valid:     (height, width) bool mask, default: zMap > 0
+    """
+    zMap = np.asarray(zMap)
+    if np.isscalar(gridSize):
+        gridSize = (gridSize, gridSize)
+    gridRows, gridCols = gridSize
+    blockRows = zMap.shape[0] // gridRows
+    blockCols = zMap.shape[1] // gridCols
+    if blockRows == 0 or blockCols == 0:
+        raise ValueError("Grid {}x{} is larger than the z-map {}x{}".format(gridRows, gridCols, *zMap.shape))
+    if valid is None:
+        valid = zMap > 0
+
+    def toBlocks(image):
+        image = image[:gridRows * blockRows, :gridCols * blockCols]
+        return image.reshape(gridRows, blockRows, gridCols, blockCols).swapaxes(1, 2) \
+            .reshape(gridRows, gridCols, blockRows * blockCols)
+
+    counts = np.count_nonzero(toBlocks(valid), axis=2)
+    trim = np.ceil(counts * trimRatio).astype(np.intp)
+    # as in the original implementation: no trimming if nothing would remain
+    trim[counts <= 2 * trim] = 0
+
+    # only the trimmed ends have to be ordered: a partition around the largest trim moves the smallest values of
+    # every block to its front, a second one the largest values to its back, only these few values are sorted
+    ends = max(int(trim.max()), 1)
+    # invalid values are placed behind the valid ones of their block
+    values = toBlocks(np.where(valid, zMap, np.inf))
+    values.partition(ends - 1, axis=2)
+    smallest = np.sort(values[..., :ends], axis=2)
+    finite = np.isfinite(values)
+    totals = np.where(finite, values, 0.0).sum(axis=2, dtype=np.float64)
+    # and in front of them for the largest values
+    values = np.where(finite, values, -np.inf)
+    values.partition(values.shape[2] - ends, axis=2)
+    largest = np.sort(values[..., -ends:], axis=2)[..., ::-1]
+
+    def trimmedSum(ordered):
+        """ Sum of the first trim values of every block (prefix sums) """
+        ordered = np.where(np.isfinite(ordered), ordered, 0.0)
+        prefix = np.zeros(ordered.shape[:2] + (ends + 1,), dtype=np.float64)
+        np.cumsum(ordered, axis=2, dtype=np.float64, out=prefix[..., 1:])
+        return np.take_along_axis(prefix, trim[..., np.newaxis], axis=2)[..., 0]
+
+    sums = totals - trimmedSum(smallest) - trimmedSum(largest)
+
+    nonEmpty = counts > 0
+    means = np.full(counts.shape, np.nan)
+    means[nonEmpty] = sums[nonEmpty] / (counts - 2 * trim)[nonEmpty]
+    minimums = np.full(counts.shape, np.nan)
+    minimums[nonEmpty] = smallest[..., 0][nonEmpty]
+    maximums = np.full(counts.shape, np.nan)
+    maximums[nonEmpty] = largest[..., 0][nonEmpty]
+    return BlockHeightStatistics(means, counts, minimums, maximums, (blockRows, blockCols))
+
+
+def minBlockHeight(zMap, gridSize=(16, 16), trimRatio=0.1, valid=None):
+    """ Returns the smallest trimmed block mean of the z-map or None """
+    return blockTrimmedMeans(zMap, gridSize, trimRatio, valid).minimum()[0]
+
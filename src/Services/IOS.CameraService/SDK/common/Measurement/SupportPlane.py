@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Support plane estimation: a vectorized RANSAC plane fit (batches of random hypotheses scored with
+                 one matrix product, least-squares refinement) and the reference plane of the empty conveyor,
+                 learned once, cached on disk and re-estimated only when a cheap drift check fails.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import json
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+from common.PointCloud.OrganizedCloud import OrganizedCloud
+
+logger = logging.getLogger(__name__)
+
+# increase when the content of the plane files changes, old files are then ignored
+PLANE_FILE_VERSION = 1
+
+DEFAULT_PLANE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'sick_visionary', 'reference_plane.json')
+
+
+def _validPoints(points, valid=None):
+    """ Returns the (N, 3) float32 points of an OrganizedCloud or a (..., 3) array and the mask of the valid ones
+        in the shape of the input (image layout for a cloud)
+    """
+    if isinstance(points, OrganizedCloud):
+        if valid is None:
+            valid = points.valid
+        points = points.points
+    points = np.asarray(points, dtype=np.float32)
+    if valid is None:
+        valid = np.any(points != 0, axis=-1)
+    valid = np.asarray(valid, dtype=bool)
+    return points.reshape(-1, 3), valid
+
+
+class Plane:
+    """ The plane normal . p + offset = 0 with a unit normal.
+
+    signedDistance() is positive on the side the normal points to; the fits orient the normal towards the
+    origin, so in camera coordinates the distance is the height above the plane towards the camera.
+    """
+
+    def __init__(self, normal, offset):
+        normal = np.asarray(normal, dtype=np.float64).reshape(3)
+        length = float(np.linalg.norm(normal))
+        if length == 0.0:
+            raise ValueError("The normal of a plane must not be zero")
+        self.normal = normal / length
+        self.offset = float(offset) / length
+
+    @classmethod
+    def fromPoints(cls, points):
+        """ Least-squares plane of (N, 3) points (smallest eigenvector of the covariance), None for less than 3 """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        if points.shape[0] < 3:
+            return None
+        centroid = points.mean(axis=0)
+        centered = points - centroid
+        _, vectors = np.linalg.eigh(centered.T @ centered)
+        normal = vectors[:, 0]
+        return cls(normal, -float(normal @ centroid)).orientedTowards((0.0, 0.0, 0.0))
+
+    def orientedTowards(self, point):
+        """ Returns the plane with the normal pointing to the side of point """
+        if self.signedDistance(np.asarray(point, dtype=np.float64)) < 0:
+            return Plane(-self.normal, -self.offset)
+        return self
+
+    def signedDistance(self, points):
+        """ Returns the signed distance of (..., 3) points as (...) array """
+        points = np.asarray(points)
+        dtype = np.float64 if points.dtype == np.float64 else np.float32
+        distance = points @ self.normal.astype(dtype)
+        distance += dtype(self.offset)
+        return distance
+
+    def heights(self, cloud, valid=None):
+        """ Returns the signed distances of the points of an OrganizedCloud in image layout, NaN for invalid
+            points (valid default: cloud.valid)
+        """
+        if valid is None:
+            valid = cloud.valid
+        heights = self.signedDistance(cloud.points)
+        heights[~valid] = np.nan
+        return heights
+
+    def zAt(self, x, y):
+        """ Returns the z coordinate of the plane at (x, y), e.g. the support height of height map cells """
+        a, b, c = self.normal
+        if abs(c) < 1e-9:
+            raise ValueError("The plane is parallel to the z axis")
+        return -(a * np.asarray(x, dtype=np.float64) + b * np.asarray(y, dtype=np.float64) + self.offset) / c
+
+    def transform(self, matrix):
+        """ Returns the plane in the target coordinates of a 4x4 (row-major, e.g. cam2worldMatrix) transformation """
+        matrix = np.asarray(matrix, dtype=np.float64).reshape(4, 4)
+        # rigid transformation: the normal is rotated, the offset changes by the translation along the normal
+        normal = matrix[:3, :3] @ self.normal
+        return Plane(normal, self.offset - float(normal @ matrix[:3, 3]))
+
+    def angleTo(self, other):
+        """ Returns the angle between the normals in degrees, [0, 90] """
+        cosine = min(abs(float(self.normal @ other.normal)), 1.0)
+        return math.degrees(math.acos(cosine))
+
+    def toDict(self):
+        return {'normal': [float(value) for value in self.normal], 'offset': self.offset}
+
+    @classmethod
+    def fromDict(cls, values):
+        return cls(values['normal'], values['offset'])
+
+    def __repr__(self):
+        return "Plane(normal ({:.5f}, {:.5f}, {:.5f}), offset {:.2f})".format(*self.normal, self.offset)
+
+
+def _sampleHypotheses(triples):
+    """ Returns the (count, 4) float32 planes (normal, offset) through (count, 3, 3) point triples and the mask of
+        the non-degenerate ones (collinear or repeated points)
+    """
+    triples = triples.astype(np.float64)
+    count = triples.shape[0]
+    normals = np.cross(triples[:, 1] - triples[:, 0], triples[:, 2] - triples[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    usable = lengths > 1e-6
+    normals[usable] /= lengths[usable, np.newaxis]
+    planes = np.empty((count, 4), dtype=np.float32)
+    planes[:, :3] = normals
+    planes[:, 3] = -np.einsum('ij,ij->i', normals, triples[:, 0])
+    return planes, usable
+
+
+def fitPlaneRansac(points, valid=None, threshold=10.0, maxIterations=1000, batchSize=100, confidence=0.999,
+                   scoreSamples=4096, refineSamples=20000, refineSteps=2, seed=None):
+    """ Fits the dominant plane of a point cloud with RANSAC.
+
+    points:        OrganizedCloud or (..., 3) array, invalid points are (0, 0, 0) or False in valid
+    valid:         optional mask of the points to use, default: OrganizedCloud.valid or points != (0, 0, 0)
+    threshold:     largest distance of an inlier from the plane (mm)
+    maxIterations: largest number of hypotheses
+    batchSize:     hypotheses drawn and scored together
+    confidence:    probability to draw at least one all-inlier sample, ends the search early
+    scoreSamples:  number of random points the hypotheses are scored on (all points if there are fewer)
+    refineSamples: number of random points of the least-squares refinement
+    refineSteps:   least-squares fits on the inliers after the search
+    seed:          seed of the random generator, for reproducible fits
+
+    The hypotheses of a batch are planes through random point triples (cross products), all of them are scored
+    with one (scoreSamples, 4) x (4, batchSize) product of the homogeneous points and the planes. The best
+    plane is refined by least squares on its inliers. Returns the Plane (normal towards the origin) and the
+    inlier mask of all points in the shape of valid, or (None, None) if there are less than 3 valid points.
+    """
+    flat, valid = _validPoints(points, valid)
+    indices = np.flatnonzero(valid)
+    if indices.size < 3:
+        return None, None
+    rng = np.random.default_rng(seed)
+
+    def sample(count):
+        if indices.size <= count:
+            return flat[indices]
+        return flat[indices[rng.integers(0, indices.size, count)]]
+
+    scored = sample(scoreSamples)
+    homogeneous = np.empty((scored.shape[0], 4), dtype=np.float32)
+    homogeneous[:, :3] = scored
+    homogeneous[:, 3] = 1.0
+
+    bestPlane, bestCount = None, 0
+    required, iterations = maxIterations, 0
+    while iterations < required:
+        planes, usable = _sampleHypotheses(flat[indices[rng.integers(0, indices.size, (batchSize, 3))]])
+        distances = np.abs(homogeneous @ planes.T)
+        counts = np.count_nonzero(distances < threshold, axis=0)
+        counts[~usable] = 0
+        best = int(np.argmax(counts))
+        if counts[best] > bestCount:
+            bestCount = int(counts[best])
+            bestPlane = planes[best]
+            # number of samples needed for the confidence with the current inlier ratio
+            ratio = bestCount / scored.shape[0]
+            if ratio >= 1.0:
+                required = 0
+            else:
+                required = min(maxIterations, math.log(1.0 - confidence) / math.log(1.0 - ratio ** 3))
+        iterations += batchSize
+    if bestPlane is None:
+        return None, None
+
+    plane = Plane(bestPlane[:3], bestPlane[3])
+    refined = sample(refineSamples)
+    for _ in range(refineSteps):
+        inliers = np.abs(plane.signedDistance(refined)) < threshold
+        fitted = Plane.fromPoints(refined[inliers])
+        if fitted is None:
+            break
+        plane = fitted
+    plane = plane.orientedTowards((0.0, 0.0, 0.0))
+    mask = np.abs(plane.signedDistance(flat)) < threshold
+    return plane, mask.reshape(valid.shape) & valid
+
+
+class DriftCheck:
+    """ Result of ReferencePlane.check() """
+
+    def __init__(self, empty, supportRatio, offset, angle, drifted):
+        self.empty = empty  # the support fills the view: the frame can be used to check and re-estimate the plane
+        self.supportRatio = supportRatio  # fraction of the checked points within searchDistance of the plane
+        self.offset = offset  # median signed distance of those points from the reference plane (mm)
+        self.angle = angle  # angle between the reference and the plane fitted to those points (degrees)
+        self.drifted = drifted  # empty frame whose support differs from the reference plane
+        self.reestimated = False  # set by ReferencePlane.update()
+
+    def __repr__(self):
+        return "DriftCheck(empty {}, support {:.1%}, offset {:.2f} mm, angle {:.3f} deg, drifted {})".format(
+            self.empty, self.supportRatio, self.offset, self.angle, self.drifted)
+
+
+class ReferencePlane:
+    """ The plane of the empty support (conveyor belt, floor) in camera coordinates.
+
+    The plane is learned once with fitPlaneRansac from a frame of the empty support and kept in a JSON file,
+    so a restarted service measures against the same reference. Heights are signed distances from the plane
+    towards the camera, independent of the camera pose.
+
+    check() is cheap enough for every frame: a subsample (every checkStride-th pixel) is compared with the
+    plane; if at least emptyRatio of it lies within searchDistance, the frame shows the empty support and the
+    least-squares plane of these points is compared with the reference. update() re-estimates the reference
+    only if the offset exceeds driftDistance or the tilt driftAngle. A displacement larger than searchDistance
+    is not recognized as an empty frame, learn() must then be called again.
+    """
+
+    def __init__(self, filename=DEFAULT_PLANE_FILE, threshold=10.0, searchDistance=50.0, emptyRatio=0.95,
+                 driftDistance=5.0, driftAngle=0.5, checkStride=4):
+        """
+        filename:       JSON file of the learned plane, None keeps the plane in memory only
+        threshold:      inlier distance of the RANSAC fit (mm)
+        searchDistance: points closer to the plane belong to the support in the drift check (mm)
+        emptyRatio:     fraction of support points which makes a frame empty
+        driftDistance:  offset of the support which triggers a re-estimation (mm)
+        driftAngle:     tilt of the support which triggers a re-estimation (degrees)
+        checkStride:    pixel stride of the subsample of the drift check
+        """
+        self.filename = filename
+        self.threshold = threshold
+        self.searchDistance = searchDistance
+        self.emptyRatio = emptyRatio
+        self.driftDistance = driftDistance
+        self.driftAngle = driftAngle
+        self.checkStride = checkStride
+        self.plane = None
+        self.learnedAt = None  # time.time() of the estimation
+        if filename is not None and os.path.exists(filename):
+            try:
+                self.load(filename)
+                logger.info("Loaded reference plane %s: %s" % (filename, self.plane))
+            except (OSError, ValueError, KeyError) as err:
+                logger.warning("Ignoring unreadable reference plane %s: %s" % (filename, err))
+
+    @property
+    def isLearned(self):
+        return self.plane is not None
+
+    def learn(self, cloud, valid=None, seed=None):
+        """ Estimates the plane from an OrganizedCloud (camera coordinates) of the empty support and saves it;
+            returns the Plane or None if the cloud has too few points
+        """
+        plane, _ = fitPlaneRansac(cloud, valid, self.threshold, seed=seed)
+        if plane is None:
+            return None
+        self.plane = plane
+        self.learnedAt = time.time()
+        if self.filename is not None:
+            try:
+                os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+                self.save(self.filename)
+            except OSError as err:
+                logger.warning("Saving reference plane %s failed: %s" % (self.filename, err))
+        return plane
+
+    def heights(self, cloud, valid=None):
+        """ Returns the heights above the plane of an OrganizedCloud (camera coordinates), NaN for invalid points """
+        if self.plane is None:
+            raise ValueError("The reference plane has not been learned")
+        return self.plane.heights(cloud, valid)
+
+    def check(self, cloud, valid=None):
+        """ Compares a subsample of an OrganizedCloud (camera coordinates) with the plane, returns a DriftCheck """
+        if self.plane is None:
+            raise ValueError("The reference plane has not been learned")
+        if valid is None:
+            valid = cloud.valid
+        sample = cloud.downsample(self.checkStride)
+        points = sample.points[valid[::self.checkStride, ::self.checkStride]]
+        if points.shape[0] < 3:
+            return DriftCheck(False, 0.0, 0.0, 0.0, False)
+        distances = self.plane.signedDistance(points)
+        near = np.abs(distances) < self.searchDistance
+        supportRatio = float(np.count_nonzero(near)) / points.shape[0]
+        if supportRatio < self.emptyRatio:
+            return DriftCheck(False, supportRatio, 0.0, 0.0, False)
+        offset = float(np.median(distances[near]))
+        local = Plane.fromPoints(points[near])
+        angle = self.plane.angleTo(local) if local is not None else 0.0
+        drifted = abs(offset) > self.driftDistance or angle > self.driftAngle
+        return DriftCheck(True, supportRatio, offset, angle, drifted)
+
+    def update(self, cloud, valid=None):
+        """ Runs check() and re-estimates the plane from the frame if it is empty and the support has drifted """
+        result = self.check(cloud, valid)
+        if result.drifted:
+            logger.info("Reference plane drifted (%s), re-estimating" % result)
+            result.reestimated = self.learn(cloud, valid) is not None
+        return result
+
+    def save(self, filename):
+        """ Writes the plane as JSON; the file is replaced atomically """
+        values = {'version': PLANE_FILE_VERSION, 'learnedAt': self.learnedAt}
+        values.update(self.plane.toDict())
+        tmpName = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(tmpName, 'w') as f:
+            json.dump(values, f, indent=2)
+        os.replace(tmpName, filename)
+
+    def load(self, filename):
+        """ Reads a plane written by save(), raises ValueError for files of another version """
+        with open(filename) as f:
+            values = json.load(f)
+        if values.get('version') != PLANE_FILE_VERSION:
+            raise ValueError("version {} instead of {}".format(values.get('version'), PLANE_FILE_VERSION))
+        self.plane = Plane.fromDict(values)
+        self.learnedAt = values.get('learnedAt')
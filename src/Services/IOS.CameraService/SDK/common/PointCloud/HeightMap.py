@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Top-down orthographic height map: the world-coordinate point cloud rasterized onto a fixed world
+                 XY grid, keeping the highest point per cell (np.maximum.at) and optionally its intensity.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import math
+
+import numpy as np
+
+from common.PointCloud.OrganizedCloud import OrganizedCloud
+
+
+def _flatPoints(points, valid=None):
+    """ Returns the (N, 3) float32 points and the (N,) valid mask of an OrganizedCloud, an array of shape
+        (..., 3) or a list of (x, y, z) tuples (format of get_3d_coordinates, (0, 0, 0) is invalid)
+    """
+    if isinstance(points, OrganizedCloud):
+        if valid is None:
+            valid = points.valid
+        points = points.points
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+    if valid is None:
+        valid = np.any(points != 0, axis=1)
+    else:
+        valid = np.asarray(valid, dtype=bool).ravel()
+    return points, valid
+
+
+class HeightMapGrid:
+    """ A fixed grid of square cells in the world XY plane.
+
+    Cell (row, col) covers x in [xMin + col * cellSize, xMin + (col + 1) * cellSize) and y in
+    [yMin + row * cellSize, yMin + (row + 1) * cellSize), i.e. rows grow with y and columns with x.
+    """
+
+    def __init__(self, xRange, yRange, cellSize):
+        """
+        xRange:   (xMin, xMax) of the grid in world coordinates (mm)
+        yRange:   (yMin, yMax) of the grid in world coordinates (mm)
+        cellSize: edge length of a cell (mm)
+        """
+        if cellSize <= 0:
+            raise ValueError("The cell size must be positive, got {}".format(cellSize))
+        self.xMin, xMax = float(xRange[0]), float(xRange[1])
+        self.yMin, yMax = float(yRange[0]), float(yRange[1])
+        self.cellSize = float(cellSize)
+        self.cols = max(int(math.ceil((xMax - self.xMin) / self.cellSize)), 1)
+        self.rows = max(int(math.ceil((yMax - self.yMin) / self.cellSize)), 1)
+
+    @classmethod
+    def around(cls, points, cellSize, valid=None, margin=0.0):
+        """ Returns the grid which covers the valid points (plus margin), with its borders at multiples of
+            cellSize so the cells of different frames are aligned
+        """
+        points, valid = _flatPoints(points, valid)
+        if not valid.any():
+            raise ValueError("No valid points to place the grid around")
+        minimum = points[valid, :2].min(axis=0) - margin
+        maximum = points[valid, :2].max(axis=0) + margin
+        start = np.floor(minimum / cellSize) * cellSize
+        stop = (np.floor(maximum / cellSize) + 1) * cellSize
+        return cls((start[0], stop[0]), (start[1], stop[1]), cellSize)
+
+    @property
+    def shape(self):
+        return self.rows, self.cols
+
+    @property
+    def xMax(self):
+        return self.xMin + self.cols * self.cellSize
+
+    @property
+    def yMax(self):
+        return self.yMin + self.rows * self.cellSize
+
+    def cellCenters(self):
+        """ Returns the x coordinates of the column centers and the y coordinates of the row centers """
+        xs = self.xMin + (np.arange(self.cols) + 0.5) * self.cellSize
+        ys = self.yMin + (np.arange(self.rows) + 0.5) * self.cellSize
+        return xs, ys
+
+    def cellIndices(self, x, y):
+        """ Returns the flat cell index of each (x, y) and the mask of the coordinates inside the grid """
+        scale = np.float32(1.0 / self.cellSize)
+        col = np.subtract(x, np.float32(self.xMin), dtype=np.float32)
+        col *= scale
+        row = np.subtract(y, np.float32(self.yMin), dtype=np.float32)
+        row *= scale
+        inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        # truncation is the floor for the coordinates inside the grid, the others are not used
+        with np.errstate(invalid='ignore'):
+            cells = row.astype(np.int32)
+            cells *= self.cols
+            cells += col.astype(np.int32)
+        return cells, inside
+
+    def rasterize(self, points, valid=None, intensity=None):
+        """ Returns the HeightMap of the points.
+
+        points:    OrganizedCloud, (..., 3) array or list of (x, y, z) tuples in world coordinates
+        valid:     optional mask of the valid points, default: OrganizedCloud.valid or points != (0, 0, 0)
+        intensity: optional intensity value per point (e.g. depthmap.intensity), gives the orthophoto
+        """
+        points, valid = _flatPoints(points, valid)
+        cells, inside = self.cellIndices(points[:, 0], points[:, 1])
+        inside &= valid
+        z = points[:, 2]
+        # invalid points and points outside the grid go to an additional cell, which avoids compacting the
+        # arrays with the mask
+        size = self.rows * self.cols
+        cells[~inside] = size
+
+        height = np.full(size + 1, -np.inf, dtype=np.float32)
+        np.maximum.at(height, cells, z)
+        counts = np.bincount(cells, minlength=size + 1)[:size]
+        orthophoto = None
+        if intensity is not None:
+            # intensity of the highest point of each cell
+            top = np.equal(z, height[cells])
+            cells[~top] = size
+            orthophoto = np.full(size + 1, np.nan, dtype=np.float32)
+            orthophoto[cells] = np.asarray(intensity).ravel()
+            orthophoto = orthophoto[:size].reshape(self.shape)
+        height = height[:size]
+        height[counts == 0] = np.nan
+        return HeightMap(self, height.reshape(self.shape), counts.reshape(self.shape), orthophoto)
+
+
+class HeightMap:
+    """ Rasterized top view of a point cloud: per cell of the grid the highest z value (NaN for empty cells),
+        the number of points and optionally the intensity of the highest point (orthophoto)
+    """
+
+    def __init__(self, grid, height, counts, intensity=None):
+        self.grid = grid
+        self.height = height  # (rows, cols) float32, NaN for empty cells
+        self.counts = counts  # (rows, cols) number of points per cell
+        self.intensity = intensity  # (rows, cols) float32 orthophoto or None
+
+    @property
+    def shape(self):
+        return self.height.shape
+
+    @property
+    def valid(self):
+        """ Cells with at least one point """
+        return self.counts > 0
+
+    @property
+    def coverage(self):
+        """ Fraction of the cells with at least one point """
+        return float(np.count_nonzero(self.counts)) / self.counts.size
+
+    def filled(self, value=0.0):
+        """ Returns the height map with value in the empty cells """
+        return np.where(self.valid, self.height, np.float32(value))
+
+    def toImage(self, heightRange=None):
+        """ Returns the height map as uint8 image (0 for empty cells), heightRange (low, high) default: the
+            range of the valid cells
+        """
+        valid = self.valid
+        image = np.zeros(self.shape, dtype=np.uint8)
+        if not valid.any():
+            return image
+        low, high = heightRange if heightRange is not None else \
+            (float(self.height[valid].min()), float(self.height[valid].max()))
+        scale = 254.0 / (high - low) if high > low else 0.0
+        image[valid] = 1 + np.clip((self.height[valid] - low) * scale, 0, 254).astype(np.uint8)
+        return image
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Organized point cloud: the 3D points of a depth map as one (height, width, 3) float32 array in
+                 image layout plus a validity mask, instead of a list with one tuple per pixel.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import numpy as np
+
+from common.Streaming.ParserHelper import _composeSlices
+
+
+class OrganizedCloud:
+    """ 3D points in image layout.
+
+    points[row, col] is the point of pixel (col, row), invalid points (no distance) are (0, 0, 0) and False
+    in valid. roi() and downsample() return views on the same arrays, window gives the covered pixels in
+    image coordinates of the full depth map.
+    """
+
+    def __init__(self, points, valid=None, window=None, frameNumber=None, timestamp=None):
+        """
+        points:      (height, width, 3) float32 array
+        valid:       (height, width) bool array, default: points with z != 0
+        window:      (rows, cols) slices of these points in the full image, default: the full image
+        frameNumber: frame number of the depth map
+        timestamp:   device timestamp of the depth map
+        """
+        self.points = points
+        self.valid = valid if valid is not None else points[..., 2] != 0
+        if window is None:
+            window = (slice(0, points.shape[0], 1), slice(0, points.shape[1], 1))
+        self.window = window
+        self.frameNumber = frameNumber
+        self.timestamp = timestamp
+
+    @classmethod
+    def fromDepth(cls, distance, rayTable, world=True, out=None, frameNumber=None, timestamp=None):
+        """ Converts a radial distance map with a ray table (see RayTable.getRayTable).
+
+        world: world coordinates if the ray table has a cam2world matrix, else camera coordinates
+        out:   optional preallocated (height, width, 3) float32 array which receives the points
+        """
+        distance = np.asarray(distance).reshape(rayTable.height, rayTable.width)
+        if out is None:
+            out = np.empty((rayTable.height, rayTable.width, 3), dtype=np.float32)
+        if world and rayTable.worldRay is not None:
+            for i in range(3):
+                np.multiply(distance, rayTable.worldRay[i], out=out[..., i], casting='unsafe')
+                out[..., i] += rayTable.worldOrigin[i]
+        else:
+            np.multiply(distance, rayTable.rayX, out=out[..., 0], casting='unsafe')
+            np.multiply(distance, rayTable.rayY, out=out[..., 1], casting='unsafe')
+            np.multiply(distance, rayTable.rayZ, out=out[..., 2], casting='unsafe')
+            out[..., 2] -= rayTable.f2rc
+        valid = distance > 0
+        out[~valid] = 0.0
+        return cls(out, valid, frameNumber=frameNumber, timestamp=timestamp)
+
+    @property
+    def height(self):
+        return self.points.shape[0]
+
+    @property
+    def width(self):
+        return self.points.shape[1]
+
+    @property
+    def x(self):
+        return self.points[..., 0]
+
+    @property
+    def y(self):
+        return self.points[..., 1]
+
+    @property
+    def z(self):
+        return self.points[..., 2]
+
+    def __len__(self):
+        """ Number of valid points """
+        return int(np.count_nonzero(self.valid))
+
+    def roi(self, rows=slice(None), cols=slice(None)):
+        """ Returns the cloud restricted to rows x cols (slices relative to this cloud) without copying """
+        parentRows, parentCols = self.window
+        return OrganizedCloud(self.points[rows, cols], self.valid[rows, cols],
+                              (_composeSlices(parentRows, rows), _composeSlices(parentCols, cols)),
+                              self.frameNumber, self.timestamp)
+
+    def downsample(self, stride):
+        """ Returns every stride-th point in both directions without copying """
+        return self.roi(slice(None, None, stride), slice(None, None, stride))
+
+    def transform(self, matrix):
+        """ Returns a new cloud with the 4x4 (row-major, e.g. cam2worldMatrix) transformation applied """
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(4, 4)
+        points = self.points @ matrix[:3, :3].T
+        points += matrix[:3, 3]
+        points[~self.valid] = 0.0
+        return OrganizedCloud(points, self.valid.copy(), self.window, self.frameNumber, self.timestamp)
+
+    def toNumpy(self, validOnly=False):
+        """ Returns the (height, width, 3) points, or the (N, 3) valid points if validOnly """
+        if validOnly:
+            return self.points[self.valid]
+        return self.points
+
+    def toList(self):
+        """ Returns a list with one (x, y, z) tuple per pixel, row by row (format of get_3d_coordinates) """
+        return list(map(tuple, self.points.reshape(-1, 3).tolist()))
+
+    def zList(self):
+        """ Returns a list with the z value of each pixel, row by row (format of get_z_coordinates) """
+        return self.z.ravel().tolist()
@@ -15,9 +15,10 @@ CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTH
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import math
 import numpy as np
 
+from common.Streaming.StateMap import StateMap
+
 plyHeader = """ply
 format ascii 1.0
 comment Exported by visionary python samples
@@ -32,101 +33,239 @@ property float32 i
 end_header
 """
 
-def convertToPointCloud(distData, intsData, cnfiData, myCamParams, isStereo):
+# one point of a binary point cloud file, same properties as the ASCII PLY header
+POINT_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                        ('r', 'u1'), ('g', 'u1'), ('b', 'u1'),
+                        ('i', '<f4')])
+
+# the number of points is written with a fixed width and filled in when the file is closed
+POINT_COUNT_WIDTH = 12
+
+plyBinaryHeader = """ply
+format binary_little_endian 1.0
+comment Exported by visionary python samples
+element vertex {}
+property float32 x
+property float32 y
+property float32 z
+property uint8 r
+property uint8 g
+property uint8 b
+property float32 i
+end_header
+"""
+
+# PCL convention: the color is packed into one 32 bit field rgb (0x00RRGGBB), declared as float
+pcdBinaryHeader = """# .PCD v0.7 - Point Cloud Data file format
+VERSION 0.7
+FIELDS x y z rgb intensity
+SIZE 4 4 4 4 4
+TYPE F F F F F
+COUNT 1 1 1 1 1
+WIDTH {0}
+HEIGHT 1
+VIEWPOINT 0 0 0 1 0 0 0
+POINTS {0}
+DATA binary
+"""
+
+PCD_POINT_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('rgb', '<u4'), ('i', '<f4')])
+
+def convertToPointCloud(distData, intsData, cnfiData, myCamParams, isStereo, stateMap=None):
     """
+    stateMap: optional StateMap of cnfiData (e.g. Data.stateMap of the frame) whose cached masks are reused
+
     Return values:
-    wCoordinates: Nested List with the linewise data for a pointcloud file. Each list item is a list with the following entries 
+    wCoordinates: (N, 7) float32 array with the data for a pointcloud file. Each row contains
                   X Y Z R G B I   i.e. point coordinates (XYZ), color (RGB) and intensity (I)
+                  For stereo devices only the valid pixels (statemap 0) are contained, for ToF devices all pixels.
     distData: input distData reshaped to array with camera resolution
     """
-    wCoordinates = []
+    height, width = myCamParams.height, myCamParams.width
 
-    m_c2w = np.array(myCamParams.cam2worldMatrix)
+    m_c2w = np.array(myCamParams.cam2worldMatrix, dtype=np.float64)
     shape = (4, 4)
     m_c2w.shape = shape
 
+    cnfiData = np.asarray(cnfiData).reshape(height, width)
+    intsData = np.asarray(intsData).reshape(height, width)
+    distData = np.asarray(distData).reshape(height, width)
 
-    cnfiData = np.asarray(cnfiData).reshape(myCamParams.height,myCamParams.width)
-    intsData = np.asarray(intsData).reshape(myCamParams.height,myCamParams.width)
-    distData = np.asarray(list(distData)).reshape(myCamParams.height,myCamParams.width)
+    # pixel coordinates, broadcast to the image shape
+    col = np.arange(width, dtype=np.float64)[np.newaxis, :]
+    row = np.arange(height, dtype=np.float64)[:, np.newaxis]
+    xp = (myCamParams.cx - col) / myCamParams.fx
+    yp = (myCamParams.cy - row) / myCamParams.fy
 
     if isStereo:
+        # use all "good" points (statemap 0) to export to PLY
+        if stateMap is None:
+            stateMap = StateMap(cnfiData, isStatemap=True)
+        valid = stateMap.valid
+        rows, cols = np.nonzero(valid)
 
-        #RGBA intensities
-        intsData = np.asarray(intsData).astype('uint32').view('uint8').reshape(myCamParams.height,myCamParams.width, 4)
-        intsData = np.frombuffer(intsData, np.uint8).reshape(myCamParams.height,myCamParams.width,4)
-        color_map = intsData
+        # coordinate system local to the imager
+        zc = distData[valid].astype(np.float64)
+        xc = xp[0, cols] * zc
+        yc = yp[rows, 0] * zc
 
-        # Apply the Statemap to the Z-map
-        zmapData_with_statemap = np.array(distData).reshape(myCamParams.height,myCamParams.width)
+        #RGBA intensities, viewed as bytes without copying
+        color_map = np.ascontiguousarray(intsData, dtype='<u4').view(np.uint8).reshape(height, width, 4)
+        wCoordinates = np.zeros((len(zc), 7), dtype=np.float32)
+        wCoordinates[:, 3:6] = color_map[valid][:, :3]
+    else:
+        #calculate radial distortion
+        r2 = (xp * xp + yp * yp)
+        r4 = r2 * r2
 
-        for row in range(myCamParams.height):
-            for col in range(myCamParams.width):
-                if (cnfiData[row][col] != 0):
-                    zmapData_with_statemap[row][col] = 0 # Set invalid pixels to lowest value
-                else:
-                    # use all "good" points to export to PLY
+        k = 1 + myCamParams.k1 * r2 + myCamParams.k2 * r4
 
-                    # transform into camera coordinates (zc, xc, yc)
-                    xp = (myCamParams.cx - col) / myCamParams.fx
-                    yp = (myCamParams.cy - row) / myCamParams.fy
+        xd = xp * k
+        yd = yp * k
 
-                    # coordinate system local to the imager
-                    zc = distData[row][col]
-                    xc = xp * zc
-                    yc = yp * zc
+        d = distData.astype(np.float64)
+        s0 = np.sqrt(xd*xd + yd*yd + 1)
 
-                    # convert to world coordinate system
-                    xw = (m_c2w[0, 3] + zc * m_c2w[0, 2]  + yc * m_c2w[0, 1] + xc * m_c2w[0, 0])
-                    yw = (m_c2w[1, 3] + zc * m_c2w[1, 2]  + yc * m_c2w[1, 1] + xc * m_c2w[1, 0])
-                    zw = (m_c2w[2, 3] + zc * m_c2w[2, 2]  + yc * m_c2w[2, 1] + xc * m_c2w[2, 0])
+        xc = (xd * d / s0).ravel()
+        yc = (yd * d / s0).ravel()
+        zc = (d / s0 - myCamParams.f2rc).ravel()
 
-                    # merge 3D coordinates and color
-                    wCoordinates.append([xw, yw, zw, color_map[row][col][0], color_map[row][col][1], color_map[row][col][2], 0])
+        wCoordinates = np.zeros((height * width, 7), dtype=np.float32)
+        # convert to full decibel values * 0.01, which is the same format that Sopas uses for point cloud export
+        ints = intsData.ravel().astype(np.float64)
+        positive = ints > 0
+        wCoordinates[positive, 6] = np.round(0.2 * np.log10(ints[positive]), 2)
 
-        return wCoordinates,distData
+    # convert to world coordinate system
+    wCoordinates[:, 0] = (m_c2w[0, 3] + zc * m_c2w[0, 2]  + yc * m_c2w[0, 1] + xc * m_c2w[0, 0])
+    wCoordinates[:, 1] = (m_c2w[1, 3] + zc * m_c2w[1, 2]  + yc * m_c2w[1, 1] + xc * m_c2w[1, 0])
+    wCoordinates[:, 2] = (m_c2w[2, 3] + zc * m_c2w[2, 2]  + yc * m_c2w[2, 1] + xc * m_c2w[2, 0])
 
-    else:
+    return wCoordinates, distData
+
+def writePointCloudToFile(filename, wCoordinates):
+    with open(filename, 'w') as f:
+        f.write(plyHeader.format(len(wCoordinates)))
+        for item in wCoordinates:
+            for l in item:
+                f.write(("{} ").format(l))
+            f.write("\n")
 
-        for row in range(0, myCamParams.height):
-            for col in range(0, myCamParams.width):
 
-                #calculate radial distortion
-                xp = (myCamParams.cx - col) / myCamParams.fx
-                yp = (myCamParams.cy - row) / myCamParams.fy
+def toStructuredPoints(wCoordinates):
+    """
+    Converts the (N, 7) array of convertToPointCloud (X Y Z R G B I) into an array of POINT_DTYPE
+    which can be written to a binary file as it is.
+    """
+    wCoordinates = np.asarray(wCoordinates)
+    if wCoordinates.dtype == POINT_DTYPE:
+        return wCoordinates
+    wCoordinates = wCoordinates.reshape(-1, 7)
+    points = np.empty(len(wCoordinates), dtype=POINT_DTYPE)
+    for column, name in enumerate(POINT_DTYPE.names):
+        points[name] = wCoordinates[:, column]
+    return points
 
-                r2 = (xp * xp + yp * yp)
-                r4 = r2 * r2
 
-                k = 1 + myCamParams.k1 * r2 + myCamParams.k2 * r4
+def _toPcdPoints(points):
+    pcdPoints = np.empty(len(points), dtype=PCD_POINT_DTYPE)
+    for name in ('x', 'y', 'z', 'i'):
+        pcdPoints[name] = points[name]
+    pcdPoints['rgb'] = (points['r'].astype(np.uint32) << 16) | (points['g'].astype(np.uint32) << 8) | points['b']
+    return pcdPoints
 
-                xd = xp * k
-                yd = yp * k
 
-                d = distData[row][col]
-                s0 = np.sqrt(xd*xd + yd*yd + 1)
+class BinaryPointCloudWriter:
+    """
+    Writes a binary little endian PLY or PCD file chunk by chunk, e.g. the points of many frames into one file.
+    Each chunk is converted into one structured buffer and written with a single call, so the memory needed
+    does not depend on the number of chunks. If the number of points is not known in advance, the count in the
+    header is written with a fixed width and filled in by close().
+    """
 
-                xc = xd * d / s0
-                yc = yd * d / s0
-                zc = d / s0 - myCamParams.f2rc
+    def __init__(self, filename, fileFormat='ply', pointCount=None):
+        """
+        filename:   output file
+        fileFormat: 'ply' or 'pcd'
+        pointCount: number of points which will be written, if known
+        """
+        if fileFormat not in ('ply', 'pcd'):
+            raise ValueError("Unsupported point cloud format: {}".format(fileFormat))
+        self.fileFormat = fileFormat
+        self.pointCount = 0
+        self._announcedCount = pointCount
+        self._file = open(filename, 'wb')
+        self._file.write(self._header())
 
-                # convert to world coordinate system
-                xw = (m_c2w[0, 3] + zc * m_c2w[0, 2]  + yc * m_c2w[0, 1] + xc * m_c2w[0, 0])
-                yw = (m_c2w[1, 3] + zc * m_c2w[1, 2]  + yc * m_c2w[1, 1] + xc * m_c2w[1, 0])
-                zw = (m_c2w[2, 3] + zc * m_c2w[2, 2]  + yc * m_c2w[2, 1] + xc * m_c2w[2, 0])
+    def _header(self):
+        if self._announcedCount is not None:
+            count = str(self._announcedCount)
+        else:
+            count = str(self.pointCount).ljust(POINT_COUNT_WIDTH)
+        header = plyBinaryHeader if self.fileFormat == 'ply' else pcdBinaryHeader
+        return header.format(count).encode('ascii')
 
-                # convert to full decibel values * 0.01, which is the same format that Sopas uses for point cloud export
-                intsSopasFormat = round(0.2 * math.log10(intsData[row][col]), 2) if intsData[row][col] > 0 else 0
+    def write(self, wCoordinates):
+        """ Appends the points, an (N, 7) array of convertToPointCloud or an array of POINT_DTYPE """
+        points = toStructuredPoints(wCoordinates)
+        if self.fileFormat == 'pcd':
+            points = _toPcdPoints(points)
+        self._file.write(points.tobytes())
+        self.pointCount += len(points)
 
-                # merge 3D coordinates and intensity
-                wCoordinates.append([xw, yw, zw, 0, 0, 0, intsSopasFormat])
+    def writeChunks(self, chunks):
+        """ Writes all point arrays of an iterable, e.g. (points for _, points in pointCloudChunks(...)) """
+        for chunk in chunks:
+            self.write(chunk)
 
-        return wCoordinates, distData
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            if self._announcedCount is None:
+                self._file.seek(0)
+                self._file.write(self._header())
+            elif self._announcedCount != self.pointCount:
+                raise ValueError("{} points announced, but {} written".format(self._announcedCount, self.pointCount))
+        finally:
+            self._file.close()
+            self._file = None
 
-def writePointCloudToFile(filename, wCoordinates):
-    with open(filename, 'w') as f:
-        f.write(plyHeader.format(len(wCoordinates)))
-        for item in wCoordinates:
-            for l in item:
-                f.write(("{} ").format(l))
-            f.write("\n")
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def writePointCloudToPly(filename, wCoordinates):
+    """ Writes the points as binary little endian PLY """
+    points = toStructuredPoints(wCoordinates)
+    with BinaryPointCloudWriter(filename, 'ply', len(points)) as writer:
+        writer.write(points)
+
+
+def writePointCloudToPcd(filename, wCoordinates):
+    """ Writes the points as binary PCD """
+    points = toStructuredPoints(wCoordinates)
+    with BinaryPointCloudWriter(filename, 'pcd', len(points)) as writer:
+        writer.write(points)
+
+
+def pointCloudChunks(frames, chunkSize=None):
+    """
+    Generator which converts frames one by one, e.g. pointCloudChunks(iterSsrData(filename)).
+
+    frames:    iterable of (distData, intsData, cnfiData, myCamParams, isStereo) tuples
+    chunkSize: if set, the points of a frame are yielded in slices of at most chunkSize points
+    Yields (frame index, (N, 7) float32 array) per frame or slice.
+    """
+    for frameIndex, (distData, intsData, cnfiData, myCamParams, isStereo) in enumerate(frames):
+        if cnfiData is None:
+            cnfiData = np.zeros((myCamParams.height, myCamParams.width), dtype=np.uint16)
+        wCoordinates, _ = convertToPointCloud(distData, intsData, cnfiData, myCamParams, isStereo)
+        if chunkSize is None:
+            yield frameIndex, wCoordinates
+        else:
+            for start in range(0, len(wCoordinates), chunkSize):
+                yield frameIndex, wCoordinates[start:start + chunkSize]
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Per-intrinsics lookup tables of the undistorted unit rays (xd/s0, yd/s0, 1/s0) of every pixel,
+                 optionally with the camera to world transformation folded in. The tables are cached in memory
+                 and on disk, so converting a depth map to 3D is reduced to a few multiply-adds per pixel.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import hashlib
+import logging
+import os
+import struct
+import threading
+import zipfile
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# increase when the layout or the computation of the tables changes, old cache files are then ignored
+RAY_TABLE_VERSION = 1
+
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'sick_visionary', 'raytables')
+
+
+def cameraKey(cameraParams):
+    """ Returns the tuple of parameters the ray table depends on """
+    return (int(cameraParams.width), int(cameraParams.height),
+            float(cameraParams.fx), float(cameraParams.fy), float(cameraParams.cx), float(cameraParams.cy),
+            float(cameraParams.k1), float(cameraParams.k2), float(cameraParams.f2rc))
+
+
+def cam2worldOf(cameraParams):
+    """ Returns the camera to world matrix as 4x4 float64 array, or None if the parameters have no valid one """
+    matrix = getattr(cameraParams, 'cam2worldMatrix', None)
+    if not hasattr(matrix, '__len__') or len(matrix) != 16:
+        return None
+    return np.array(matrix, dtype=np.float64).reshape(4, 4)
+
+
+class RayTable:
+    """ Precomputed rays of all pixels of a camera.
+
+    With the radial distortion model of the Visionary cameras a radial distance d of pixel (u, v) is in
+    camera coordinates
+        x = d * xd/s0,  y = d * yd/s0,  z = d * 1/s0 - f2rc
+    The three factors are stored as float32 images (rayX, rayY, rayZ). If a cam2world matrix is given, the
+    rotation is applied to the rays as well (worldRay) and the translation together with the f2rc offset
+    forms worldOrigin, so world coordinates are worldOrigin + d * worldRay.
+    """
+
+    def __init__(self, key, cam2world=None, rays=None, worldRay=None):
+        self.key = key
+        self.width, self.height = key[0], key[1]
+        self.f2rc = key[8]
+        self.cam2world = cam2world
+        if rays is None:
+            rays = self._computeRays(key)
+        self.rayX, self.rayY, self.rayZ = rays
+        self.worldOrigin = None
+        self.worldRay = None
+        if cam2world is not None:
+            # p = R * (d * ray - (0, 0, f2rc)) + t
+            self.worldOrigin = (cam2world[:3, 3] - self.f2rc * cam2world[:3, 2]).astype(np.float32)
+            if worldRay is None:
+                rays64 = np.stack([ray.astype(np.float64) for ray in rays])
+                worldRay = np.einsum('ij,jhw->ihw', cam2world[:3, :3], rays64).astype(np.float32)
+            self.worldRay = worldRay
+
+    @staticmethod
+    def _computeRays(key):
+        width, height, fx, fy, cx, cy, k1, k2, _ = key
+        xp = ((cx - np.arange(width, dtype=np.float64)) / fx)[np.newaxis, :]
+        yp = ((cy - np.arange(height, dtype=np.float64)) / fy)[:, np.newaxis]
+        r2 = xp * xp + yp * yp
+        k = 1 + k1 * r2 + k2 * r2 * r2
+        xd = xp * k
+        yd = yp * k
+        invS0 = 1.0 / np.sqrt(xd * xd + yd * yd + 1)
+        return (np.ascontiguousarray(xd * invS0, dtype=np.float32),
+                np.ascontiguousarray(yd * invS0, dtype=np.float32),
+                np.ascontiguousarray(invS0, dtype=np.float32))
+
+    def _distance(self, distance):
+        return np.asarray(distance).reshape(self.height, self.width)
+
+    def toCamera(self, distance):
+        """ Returns the camera coordinates (x, y, z) as (height, width) images of a radial distance map """
+        distance = self._distance(distance)
+        return distance * self.rayX, distance * self.rayY, distance * self.rayZ - self.f2rc
+
+    def zCamera(self, distance):
+        """ Returns only the z image of the camera coordinates """
+        return self._distance(distance) * self.rayZ - self.f2rc
+
+    def toWorld(self, distance):
+        """ Returns the world coordinates (x, y, z) as (height, width) images; camera coordinates if the table
+            was built without cam2world matrix
+        """
+        if self.worldRay is None:
+            return self.toCamera(distance)
+        distance = self._distance(distance)
+        return tuple(self.worldOrigin[i] + distance * self.worldRay[i] for i in range(3))
+
+    def save(self, filename):
+        """ Writes the table as .npz; the file is replaced atomically """
+        arrays = {'version': np.array(RAY_TABLE_VERSION),
+                  'key': np.array(self.key[2:], dtype=np.float64),
+                  'size': np.array(self.key[:2], dtype=np.int64),
+                  'rayX': self.rayX, 'rayY': self.rayY, 'rayZ': self.rayZ}
+        if self.cam2world is not None:
+            arrays['cam2world'] = self.cam2world
+            arrays['worldRay'] = self.worldRay
+        tmpName = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(tmpName, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmpName, filename)
+
+    @classmethod
+    def load(cls, filename, key, cam2world=None):
+        """ Reads a table written by save(); returns None if the file does not match key and cam2world """
+        with np.load(filename) as arrays:
+            if int(arrays['version']) != RAY_TABLE_VERSION or \
+                    tuple(arrays['size']) != key[:2] or tuple(arrays['key']) != key[2:]:
+                return None
+            storedCam2world = arrays['cam2world'] if 'cam2world' in arrays.files else None
+            if (storedCam2world is None) != (cam2world is None) or \
+                    cam2world is not None and not np.array_equal(storedCam2world, cam2world):
+                return None
+            rays = (arrays['rayX'], arrays['rayY'], arrays['rayZ'])
+            worldRay = arrays['worldRay'] if cam2world is not None else None
+        return cls(key, cam2world, rays, worldRay)
+
+
+def cacheFileName(key, cam2world=None):
+    """ Returns the file name of the cached table: a hash of the intrinsics and the cam2world matrix """
+    digest = hashlib.sha1(struct.pack('<2q7d', *key))
+    if cam2world is not None:
+        digest.update(cam2world.tobytes())
+    return 'raytable_{}x{}_{}.npz'.format(key[0], key[1], digest.hexdigest()[:16])
+
+
+class RayTableCache:
+    """ Returns the ray table of a set of camera parameters, computed once per process and per cache directory.
+
+    cacheDirectory=None keeps the tables in memory only.
+    """
+
+    def __init__(self, cacheDirectory=DEFAULT_CACHE_DIRECTORY, maxTables=8):
+        self.cacheDirectory = cacheDirectory
+        self.maxTables = maxTables
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get(self, cameraParams, withCam2world=True):
+        key = cameraKey(cameraParams)
+        cam2world = cam2worldOf(cameraParams) if withCam2world else None
+        cacheKey = (key, cam2world.tobytes() if cam2world is not None else None)
+        with self._lock:
+            table = self._tables.get(cacheKey)
+            if table is None:
+                table = self._loadOrCompute(key, cam2world)
+                if len(self._tables) >= self.maxTables:
+                    # the intrinsics of a camera rarely change, simply start over
+                    self._tables.clear()
+                self._tables[cacheKey] = table
+            return table
+
+    def _loadOrCompute(self, key, cam2world):
+        filename = None
+        if self.cacheDirectory is not None:
+            filename = os.path.join(self.cacheDirectory, cacheFileName(key, cam2world))
+            if os.path.exists(filename):
+                try:
+                    table = RayTable.load(filename, key, cam2world)
+                    if table is not None:
+                        logger.debug("Loaded ray table %s" % filename)
+                        return table
+                except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as err:
+                    # e.g. truncated by a failed write or a disk error: recomputed and overwritten below
+                    logger.warning("Ignoring unreadable ray table %s: %s" % (filename, err))
+        table = RayTable(key, cam2world)
+        if filename is not None:
+            try:
+                os.makedirs(self.cacheDirectory, exist_ok=True)
+                table.save(filename)
+                logger.info("Saved ray table %s" % filename)
+            except OSError as err:
+                logger.warning("Saving ray table %s failed: %s" % (filename, err))
+        return table
+
+
+_defaultCache = RayTableCache()
+
+
+def getRayTable(cameraParams, withCam2world=True):
+    """ Returns the ray table of the camera parameters from the default cache (DEFAULT_CACHE_DIRECTORY) """
+    return _defaultCache.get(cameraParams, withCam2world)
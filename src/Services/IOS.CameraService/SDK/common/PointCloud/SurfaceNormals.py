@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Per-pixel surface normals of an organized point cloud: central differences of shifted arrays,
+                 box-filtered (cv2.boxFilter) and crossed, or the smallest eigenvector of the box-filtered
+                 covariance of the neighborhood, with validity masking; the depth gradient magnitude comes from
+                 the same differences.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import math
+import time
+
+import cv2
+import numpy as np
+
+NORMAL_METHODS = ('gradient', 'covariance')
+
+# central differences p[+1] - p[-1] along the columns (u) and along the rows (v)
+DIFFERENCE_KERNELS = (np.array([[-1.0, 0.0, 1.0]], dtype=np.float32),
+                      np.array([[-1.0], [0.0], [1.0]], dtype=np.float32))
+
+
+def _boxSum(image, windowSize, dst=None):
+    """ Sum over the windowSize x windowSize neighborhood (zero outside the image) """
+    return cv2.boxFilter(image, -1, (windowSize, windowSize), dst=dst, normalize=False,
+                         borderType=cv2.BORDER_CONSTANT)
+
+
+def _multiplySubtract(a, b, c, d, out, tmp):
+    """ out = a * b - c * d on float32 planes without temporaries """
+    np.multiply(a, b, out=out)
+    np.multiply(c, d, out=tmp)
+    out -= tmp
+
+
+def _squaredLength(vector, out, tmp):
+    """ out = squared length of the vector given by three float32 planes """
+    np.multiply(vector[0], vector[0], out=out)
+    out += np.multiply(vector[1], vector[1], out=tmp)
+    out += np.multiply(vector[2], vector[2], out=tmp)
+
+
+class SurfaceNormals:
+    """ Result of NormalEstimator.estimate(), in image layout of the cloud """
+
+    def __init__(self, normals, valid, gradient, curvature=None):
+        self.normals = normals  # (height, width, 3) float32 unit normals towards the viewpoint, 0 if invalid
+        self.valid = valid  # (height, width) bool, pixels with a normal
+        self.gradient = gradient  # (height, width) float32 z gradient magnitude (mm per pixel), NaN if invalid
+        self.curvature = curvature  # (height, width) float32 surface variation (covariance method), NaN if invalid
+
+    @property
+    def shape(self):
+        return self.valid.shape
+
+    def angleTo(self, direction=(0.0, 0.0, 1.0)):
+        """ Returns the angle between the normals and direction in degrees, NaN for invalid pixels; with the
+            world z axis it is the tilt of the surface (0 for a horizontal box top)
+        """
+        direction = np.asarray(direction, dtype=np.float32)
+        cosine = self.normals @ (direction / np.linalg.norm(direction))
+        np.clip(cosine, -1.0, 1.0, out=cosine)
+        angle = np.degrees(np.arccos(cosine))
+        angle[~self.valid] = np.nan
+        return angle
+
+    def flatMask(self, maxAngle=5.0, direction=(0.0, 0.0, 1.0)):
+        """ Returns the mask of the pixels whose normal is within maxAngle degrees of direction """
+        direction = np.asarray(direction, dtype=np.float32)
+        cosine = self.normals @ (direction / np.linalg.norm(direction))
+        return self.valid & (cosine >= np.float32(math.cos(math.radians(maxAngle))))
+
+
+class NormalEstimator:
+    """ Estimates the surface normals of organized point clouds (OrganizedCloud, camera or world coordinates).
+
+      'gradient':   the central differences along the rows and the columns (shifted arrays, cv2.filter2D) are
+                    summed over the window with cv2.boxFilter, the normal is their cross product (fast, smooth)
+      'covariance': the first and second moments of the points are box-filtered, the normal is the smallest
+                    eigenvector of the covariance of the window (closed form) and curvature its surface
+                    variation (smallest eigenvalue / sum of the eigenvalues, 0 for a plane; flags edges and
+                    crushed items). About three times the cost of 'gradient' (the box filters of nine moment
+                    planes and the per-pixel eigen solution), use it when the curvature is needed
+
+    The depth gradient magnitude (central differences of z, mm per pixel) comes from the same differences.
+    All steps work on contiguous x, y, z planes, which is several times faster than on the interleaved points.
+    The buffers are allocated once per image size, the arrays of the returned SurfaceNormals are overwritten
+    by the next call.
+    """
+
+    def __init__(self, windowSize=5, method='gradient', maxStep=50.0, minFraction=0.5):
+        """
+        windowSize:  edge length of the (odd) neighborhood in pixels
+        method:      'gradient' or 'covariance'
+        maxStep:     differences with a z change of more than maxStep (mm) cross a depth discontinuity and are
+                     not used for the gradient normals and the gradient, None to use all
+        minFraction: smallest fraction of valid differences (gradient) or points (covariance) in the window
+        """
+        if method not in NORMAL_METHODS:
+            raise ValueError("Unknown normal method {}, expected one of {}".format(method, NORMAL_METHODS))
+        if windowSize < 1 or windowSize % 2 == 0:
+            raise ValueError("The window size must be odd and positive, got {}".format(windowSize))
+        self.windowSize = windowSize
+        self.method = method
+        self.maxStep = maxStep
+        self.minFraction = minFraction
+        self.time = 0.0  # cost of the last estimate() in ms
+        self._shape = None
+
+    def _allocate(self, shape):
+        self._shape = shape
+        self._channels = np.empty((3,) + shape, dtype=np.float32)
+        self._deltas = np.empty((2, 3) + shape, dtype=np.float32)
+        self._sums = np.empty((2, 3) + shape, dtype=np.float32)
+        self._normal = np.empty((3,) + shape, dtype=np.float32)
+        self._ok = np.empty((2,) + shape, dtype=np.uint8)
+        self._weights = np.empty((2,) + shape, dtype=np.float32)
+        self._scratch = np.empty((2,) + shape, dtype=np.float32)
+        self._flag = np.empty(shape, dtype=bool)
+        self._normalValid = np.empty(shape, dtype=bool)
+        self._gradient = np.empty(shape, dtype=np.float32)
+        self._normals = np.empty(shape + (3,), dtype=np.float32)
+        self._moments = None  # buffers of the covariance method, see _allocateCovariance()
+
+    def _allocateCovariance(self):
+        shape = self._shape
+        self._moments = np.empty((6,) + shape, dtype=np.float32)  # xx, xy, xz, yy, yz, zz
+        self._centered = np.empty((3,) + shape, dtype=np.float32)
+        self._means = np.empty((3,) + shape, dtype=np.float32)
+        self._pointWeight = np.empty(shape, dtype=np.float32)
+        self._count = np.empty(shape, dtype=np.float32)
+        self._eigen = np.empty((11,) + shape, dtype=np.float32)
+        self._curvature = np.empty(shape, dtype=np.float32)
+
+    def _differences(self, mask):
+        """ Central differences of the x, y, z planes per image axis into _deltas, 0 where a neighbor is invalid
+            or the z step exceeds maxStep; their validity goes to _ok and _weights
+        """
+        for axis, kernel in enumerate(DIFFERENCE_KERNELS):
+            # minimum of the mask over the two neighbors (not the pixel itself)
+            cv2.erode(mask, np.abs(kernel).astype(np.uint8), dst=self._ok[axis], borderType=cv2.BORDER_CONSTANT,
+                      borderValue=0)
+            for channel, delta in zip(self._channels, self._deltas[axis]):
+                cv2.filter2D(channel, -1, kernel, dst=delta, borderType=cv2.BORDER_CONSTANT)
+            if self.maxStep is not None:
+                np.abs(self._deltas[axis, 2], out=self._scratch[0])
+                np.less_equal(self._scratch[0], np.float32(self.maxStep), out=self._flag)
+                self._ok[axis] &= self._flag.view(np.uint8)
+            np.copyto(self._weights[axis], self._ok[axis])
+            self._deltas[axis] *= self._weights[axis]
+
+    def _gradientNormals(self, minCount):
+        """ Cross product of the box-filtered differences into _normal, enough support into _normalValid """
+        for deltas, sums in zip(self._deltas, self._sums):
+            for delta, total in zip(deltas, sums):
+                _boxSum(delta, self.windowSize, dst=total)
+        sumsU, sumsV = self._sums
+        product = self._scratch[0]
+        for component, (a, b) in zip(self._normal, ((1, 2), (2, 0), (0, 1))):
+            np.multiply(sumsU[a], sumsV[b], out=component)
+            np.multiply(sumsU[b], sumsV[a], out=product)
+            component -= product
+        # pixels with both differences in the window
+        np.multiply(self._weights[0], self._weights[1], out=self._scratch[0])
+        _boxSum(self._scratch[0], self.windowSize, dst=self._scratch[1])
+        np.greater_equal(self._scratch[1], minCount, out=self._normalValid)
+
+    def _covarianceNormals(self, mask, minCount, viewpoint):
+        """ Smallest eigenvector of the box-filtered covariance, oriented towards viewpoint, into _normal, enough
+            support into _normalValid; returns the curvature
+        """
+        if self._moments is None:
+            self._allocateCovariance()
+        windowSize = self.windowSize
+        weight, count = self._pointWeight, self._count
+        np.copyto(weight, mask)
+        _boxSum(weight, windowSize, dst=count)
+        np.greater_equal(count, minCount, out=self._normalValid)
+        inverse = count
+        np.maximum(count, np.float32(1.0), out=inverse)
+        np.divide(np.float32(1.0), inverse, out=inverse)
+        # coordinates relative to the mean point of the cloud keep the float32 moments small; the box sums of
+        # float32 images are accumulated in double precision by OpenCV
+        for channel, centered, mean in zip(self._channels, self._centered, self._means):
+            np.subtract(channel, np.float32(cv2.mean(channel, mask)[0]), out=centered)
+            centered *= weight
+            _boxSum(centered, windowSize, dst=mean)
+            mean *= inverse
+        product = self._eigen[0]
+        for moment, (first, second) in zip(self._moments, ((0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2))):
+            np.multiply(self._centered[first], self._centered[second], out=product)
+            _boxSum(product, windowSize, dst=moment)
+            moment *= inverse
+            np.multiply(self._means[first], self._means[second], out=product)
+            moment -= product
+        smallest, trace = self._smallestEigenvectors()
+        curvature = self._curvature
+        np.maximum(smallest, np.float32(0.0), out=curvature)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            curvature /= trace
+
+        # the sign of an eigenvector is arbitrary: orient every normal towards the viewpoint
+        towards, difference = self._eigen[:2]
+        towards.fill(0.0)
+        for axis, component in enumerate(self._normal):
+            np.subtract(np.float32(viewpoint[axis]), self._channels[axis], out=difference)
+            difference *= component
+            towards += difference
+        np.copysign(np.float32(1.0), towards, out=towards)
+        self._normal *= towards
+        return curvature
+
+    def _smallestEigenvectors(self):
+        """ Smallest eigenvalue of the symmetric 3x3 matrices of _moments (closed form) and its eigenvector (not
+            normalized) into _normal, in place on float32 planes; returns the planes of the smallest eigenvalue
+            and of the trace
+        """
+        cxx, cxy, cxz, cyy, cyz, czz = self._moments
+        trace, smallest, a, b, c, q, p, r, tmp, _, _ = self._eigen
+        np.add(cxx, cyy, out=trace)
+        trace += czz
+        np.multiply(trace, np.float32(1.0 / 3.0), out=q)
+        np.subtract(cxx, q, out=a)
+        np.subtract(cyy, q, out=b)
+        np.subtract(czz, q, out=c)
+        # p^2 = (tr((C - q I)^2)) / 6
+        np.multiply(cxy, cxy, out=p)
+        p += np.multiply(cxz, cxz, out=tmp)
+        p += np.multiply(cyz, cyz, out=tmp)
+        p *= np.float32(2.0)
+        p += np.multiply(a, a, out=tmp)
+        p += np.multiply(b, b, out=tmp)
+        p += np.multiply(c, c, out=tmp)
+        p *= np.float32(1.0 / 6.0)
+        np.sqrt(p, out=p)
+        # det(C - q I) / p^3 / 2 = cos(3 phi)
+        _multiplySubtract(b, c, cyz, cyz, r, tmp)
+        r *= a
+        _multiplySubtract(cxy, c, cyz, cxz, smallest, tmp)
+        smallest *= cxy
+        r -= smallest
+        _multiplySubtract(cxy, cyz, b, cxz, smallest, tmp)
+        smallest *= cxz
+        r += smallest
+        np.multiply(p, p, out=tmp)
+        tmp *= p
+        tmp *= np.float32(2.0)
+        # |det| <= 2 p^3, the lower bound only avoids 0 / 0
+        np.maximum(tmp, np.float32(1e-30), out=tmp)
+        r /= tmp
+        np.clip(r, -1.0, 1.0, out=r)
+        np.arccos(r, out=r)
+        r *= np.float32(1.0 / 3.0)
+        r += np.float32(2.0 * math.pi / 3.0)
+        np.cos(r, out=r)
+        r *= p
+        r *= np.float32(2.0)
+        np.add(q, r, out=smallest)
+
+        # the eigenvector is orthogonal to the rows of C - smallest * I: the longest of the cross products of
+        # two rows (r0 x r1, r0 x r2, r1 x r2)
+        np.subtract(cxx, smallest, out=a)
+        np.subtract(cyy, smallest, out=b)
+        np.subtract(czz, smallest, out=c)
+        best, bestLength = self._normal, q
+        candidate, length = (p, r, self._eigen[9]), self._eigen[10]
+        _multiplySubtract(cxy, cyz, cxz, b, best[0], tmp)
+        _multiplySubtract(cxz, cxy, a, cyz, best[1], tmp)
+        _multiplySubtract(a, b, cxy, cxy, best[2], tmp)
+        _squaredLength(best, bestLength, tmp)
+        for rows in (((cxy, c, cxz, cyz), (cxz, cxz, a, c), (a, cyz, cxy, cxz)),
+                     ((b, c, cyz, cyz), (cyz, cxz, cxy, c), (cxy, cyz, b, cxz))):
+            for component, factors in zip(candidate, rows):
+                _multiplySubtract(*factors, component, tmp)
+            _squaredLength(candidate, length, tmp)
+            longer = np.greater(length, bestLength, out=self._flag)
+            for component, values in zip(best, candidate):
+                np.copyto(component, values, where=longer)
+            np.maximum(bestLength, length, out=bestLength)
+        return smallest, trace
+
+    def _viewpointSign(self, viewpoint, samples=1000):
+        """ Returns 1 or -1, the sign which orients most of (a subsample of) the valid normals towards viewpoint """
+        indices = np.flatnonzero(self._normalValid)
+        if not indices.size:
+            return 1.0
+        indices = indices[::max(indices.size // samples, 1)]
+        towards = sum(np.take(component, indices) * (viewpoint[axis] - np.take(self._channels[axis], indices))
+                      for axis, component in enumerate(self._normal))
+        return 1.0 if np.count_nonzero(towards >= 0) * 2 >= towards.size else -1.0
+
+    def estimate(self, cloud, valid=None, viewpoint=(0.0, 0.0, 0.0)):
+        """ Returns the SurfaceNormals of an OrganizedCloud.
+
+        valid:     optional (height, width) mask of the points to use, default: cloud.valid
+        viewpoint: the normals point to the side of viewpoint: the origin for camera coordinates, the camera
+                   position (RayTable.worldOrigin) for world coordinates
+        """
+        start = time.perf_counter()
+        points = np.asarray(cloud.points, dtype=np.float32)
+        if points.shape[:2] != self._shape:
+            self._allocate(points.shape[:2])
+        valid = np.asarray(cloud.valid if valid is None else valid, dtype=bool)
+        mask = valid.view(np.uint8)
+        minCount = np.float32(max(self.minFraction * self.windowSize * self.windowSize, 1.0))
+        np.copyto(self._channels, points.transpose(2, 0, 1))
+        self._differences(mask)
+
+        gradient = self._gradient
+        cv2.magnitude(self._deltas[0, 2], self._deltas[1, 2], magnitude=gradient)
+        gradient *= np.float32(0.5)
+        np.logical_and(self._ok[0], self._ok[1], out=self._flag)
+        np.logical_not(self._flag, out=self._flag)
+        np.copyto(gradient, np.float32(np.nan), where=self._flag)
+
+        curvature = None
+        if self.method == 'gradient':
+            self._gradientNormals(minCount)
+        else:
+            curvature = self._covarianceNormals(mask, minCount, viewpoint)
+        normalValid = self._normalValid
+        normalValid &= valid
+        length = self._scratch[1]
+        cv2.magnitude(self._normal[0], self._normal[1], magnitude=self._scratch[0])
+        cv2.magnitude(self._scratch[0], self._normal[2], magnitude=length)
+        np.greater(length, 0, out=self._flag)
+        normalValid &= self._flag
+
+        # gradient: every visible surface has the same orientation of the image axes, one sign for all pixels;
+        # the covariance normals are already oriented per pixel
+        sign = np.float32(self._viewpointSign(viewpoint) if self.method == 'gradient' else 1.0)
+        # orientation and normalization in one factor per pixel, 0 for the invalid pixels
+        factor = self._scratch[0]
+        factor.fill(0.0)
+        np.divide(sign, length, out=factor, where=normalValid)
+        self._normal *= factor
+        cv2.merge(list(self._normal), dst=self._normals)
+        if curvature is not None:
+            np.logical_not(normalValid, out=self._flag)
+            np.copyto(curvature, np.float32(np.nan), where=self._flag)
+        self.time = (time.perf_counter() - start) * 1000
+        return SurfaceNormals(self._normals, normalValid, gradient, curvature)
+
+
+def estimateNormals(cloud, valid=None, windowSize=5, method='gradient', maxStep=50.0, viewpoint=(0.0, 0.0, 0.0),
+                    minFraction=0.5):
+    """ Returns the SurfaceNormals of a single OrganizedCloud (see NormalEstimator); streams of frames should
+        reuse one NormalEstimator, which keeps its buffers
+    """
+    return NormalEstimator(windowSize, method, maxStep, minFraction).estimate(cloud, valid, viewpoint)
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Voxel grid of a point cloud: the points are quantized to integer voxel keys and sorted by key, so
+                 every occupied voxel owns a contiguous range of points. The sorted keys are the spatial hash
+                 index (vectorized lookup with np.searchsorted), which makes box, neighborhood and "highest point"
+                 queries cost the points of the touched voxels only, and gives centroid, max-z and count
+                 downsampling with bincount and np.maximum.at.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import numpy as np
+
+from common.PointCloud.HeightMap import _flatPoints
+
+
+def _bounds(lower, upper):
+    """ Returns (lower, upper) as float32 (3,) arrays, None or a None coordinate is unbounded """
+    lower = [-np.inf if value is None else value for value in (lower if lower is not None else (None,) * 3)]
+    upper = [np.inf if value is None else value for value in (upper if upper is not None else (None,) * 3)]
+    return np.array(lower, dtype=np.float32), np.array(upper, dtype=np.float32)
+
+
+def _inBox(values, lower, upper):
+    """ Returns the mask of the rows of (N, 3) values within [lower, upper]; column by column, which is much
+        faster than np.all(..., axis=1), unbounded coordinates are skipped
+    """
+    inside = np.ones(values.shape[0], dtype=bool)
+    for axis in range(3):
+        column = values[:, axis]
+        if lower[axis] > -np.inf:
+            inside &= column >= lower[axis]
+        if upper[axis] < np.inf:
+            inside &= column <= upper[axis]
+    return inside
+
+
+class VoxelGrid:
+    """ Spatial index of a point cloud with cubic voxels of edge voxelSize.
+
+    Voxel (i, j, k) covers origin + (i, j, k) * voxelSize up to origin + (i + 1, j + 1, k + 1) * voxelSize,
+    the origin is the minimum of the valid points. Per occupied voxel (sorted by key) the grid keeps
+
+      keys:   int64 key (i * dims[1] + j) * dims[2] + k
+      coords: (i, j, k)
+      starts, counts: range of its points in order (flat indices of the input points)
+      maxZ, top: largest z and flat index of the highest point
+
+    All queries return flat indices into the input points, i.e. the pixel index for an OrganizedCloud or for
+    the list of get_3d_coordinates.
+    """
+
+    def __init__(self, points, voxelSize, valid=None):
+        """
+        points:    OrganizedCloud, (..., 3) array or list of (x, y, z) tuples (format of get_3d_coordinates)
+        voxelSize: edge length of a voxel (mm)
+        valid:     optional mask of the points to index, default: OrganizedCloud.valid or points != (0, 0, 0)
+        """
+        if voxelSize <= 0:
+            raise ValueError("The voxel size must be positive, got {}".format(voxelSize))
+        self.points, valid = _flatPoints(points, valid)
+        self.voxelSize = float(voxelSize)
+        indices = np.flatnonzero(valid)
+        # np.take and reductions of single columns are several times faster than fancy indexing and axis=0
+        selected = np.take(self.points, indices, axis=0)
+        self.origin = np.zeros(3, dtype=np.float32)
+        self.dims = np.ones(3, dtype=np.int64)
+        if indices.size:
+            self.origin = np.array([selected[:, axis].min() for axis in range(3)], dtype=np.float32)
+        coords = self._voxelCoords(selected)
+        if indices.size:
+            self.dims = np.array([coords[:, axis].max() for axis in range(3)], dtype=np.int64) + 1
+
+        keys = self._keys(coords)
+        if int(np.prod(self.dims)) < 2 ** 31:
+            # sorting 32 bit keys is faster
+            keys = keys.astype(np.int32)
+        order = np.argsort(keys)
+        sortedKeys = keys[order]
+        self.order = indices[order]
+        # start of every run of equal keys
+        boundary = np.empty(sortedKeys.size, dtype=bool)
+        boundary[:1] = True
+        np.not_equal(sortedKeys[1:], sortedKeys[:-1], out=boundary[1:])
+        self.starts = np.flatnonzero(boundary)
+        self.counts = np.diff(np.append(self.starts, sortedKeys.size))
+        self.keys = sortedKeys[self.starts].astype(np.int64)
+        self.coords = np.take(coords, order[self.starts], axis=0)
+        # voxel of every point in order, for the reductions with bincount and maximum.at
+        self._voxel = np.cumsum(boundary, dtype=np.intp)
+        self._voxel -= 1
+
+        if self.starts.size:
+            z = np.take(self.points[:, 2], self.order)
+            voxel = self._voxel
+            self.maxZ = np.full(self.starts.size, -np.inf, dtype=np.float32)
+            np.maximum.at(self.maxZ, voxel, z)
+            # first point of each voxel which reaches the maximum
+            positions = np.flatnonzero(z == self.maxZ[voxel])
+            first = np.ones(positions.size, dtype=bool)
+            np.not_equal(voxel[positions[1:]], voxel[positions[:-1]], out=first[1:])
+            self.top = self.order[positions[first]]
+        else:
+            self.maxZ = np.empty(0, dtype=np.float32)
+            self.top = np.empty(0, dtype=np.intp)
+
+    def __len__(self):
+        """ Number of occupied voxels """
+        return int(self.keys.size)
+
+    def _voxelCoords(self, points):
+        """ Returns the (N, 3) int32 voxel coordinates of (N, 3) points >= origin, computed the same way for
+            points and query bounds so both agree at voxel borders
+        """
+        scaled = np.subtract(points, self.origin, dtype=np.float32)
+        scaled *= np.float32(1.0 / self.voxelSize)
+        # truncation is the floor for the coordinates >= origin, the others are not used
+        with np.errstate(invalid='ignore'):
+            return scaled.astype(np.int32)
+
+    def _keys(self, coords):
+        coords = coords.astype(np.int64)
+        return (coords[..., 0] * self.dims[1] + coords[..., 1]) * self.dims[2] + coords[..., 2]
+
+    def centroids(self):
+        """ Returns the (V, 3) float32 mean of the points of each voxel """
+        if not self.starts.size:
+            return np.empty((0, 3), dtype=np.float32)
+        centroids = np.empty((self.starts.size, 3), dtype=np.float32)
+        for axis in range(3):
+            sums = np.bincount(self._voxel, np.take(self.points[:, axis], self.order), self.starts.size)
+            centroids[:, axis] = sums / self.counts
+        return centroids
+
+    def centers(self):
+        """ Returns the (V, 3) float32 centers of the occupied voxels """
+        return (self.origin + (self.coords + np.float32(0.5)) * np.float32(self.voxelSize)).astype(np.float32)
+
+    def downsample(self, mode='centroid'):
+        """ Returns one point per occupied voxel: 'centroid' (mean of its points), 'max-z' (its highest point)
+            or 'center' (center of the voxel), together with the number of points per voxel
+        """
+        if mode == 'centroid':
+            return self.centroids(), self.counts
+        if mode == 'max-z':
+            return np.take(self.points, self.top, axis=0), self.counts
+        if mode == 'center':
+            return self.centers(), self.counts
+        raise ValueError("Unknown downsampling mode {}, expected 'centroid', 'max-z' or 'center'".format(mode))
+
+    def _voxelsIn(self, lower, upper):
+        """ Returns the indices of the occupied voxels which overlap the box [lower, upper] (float32 (3,)) """
+        if not self.keys.size or np.any(lower > upper):
+            return np.empty(0, dtype=np.intp)
+        # the bounds are clipped to the grid, unbounded coordinates have no voxel coordinate
+        extent = self.origin + self.dims * np.float32(self.voxelSize)
+        first = np.maximum(self._voxelCoords(np.clip(lower, self.origin, extent)), 0)
+        last = np.minimum(self._voxelCoords(np.clip(upper, self.origin, extent)), self.dims - 1)
+        if np.any(first > last):
+            return np.empty(0, dtype=np.intp)
+        if int(np.prod(last - first + 1)) <= self.keys.size:
+            # hash lookup of every voxel of the box
+            i, j, k = np.meshgrid(*(np.arange(f, l + 1) for f, l in zip(first, last)), indexing='ij', sparse=True)
+            candidates = ((i * self.dims[1] + j) * self.dims[2] + k).ravel()
+            positions = np.searchsorted(self.keys, candidates)
+            np.minimum(positions, self.keys.size - 1, out=positions)
+            return positions[self.keys[positions] == candidates]
+        # large boxes: a scan of the occupied voxels is cheaper than the lookup of every voxel
+        return np.flatnonzero(_inBox(self.coords, first, last))
+
+    def pointsOf(self, voxels):
+        """ Returns the flat indices of the points of the voxels (indices into keys) """
+        voxels = np.asarray(voxels, dtype=np.intp)
+        counts = self.counts[voxels]
+        if not counts.size:
+            return np.empty(0, dtype=np.intp)
+        # positions start, start + 1, ... of every voxel in order, without a Python loop
+        offsets = np.repeat(self.starts[voxels] - (np.cumsum(counts) - counts), counts)
+        offsets += np.arange(offsets.size)
+        return np.take(self.order, offsets)
+
+    def voxelOf(self, point):
+        """ Returns the index of the occupied voxel of point (index into keys) or None """
+        point = np.asarray(point, dtype=np.float32).reshape(1, 3)
+        if np.any(point < self.origin):
+            return None
+        coords = self._voxelCoords(point)[0]
+        if np.any(coords >= self.dims):
+            return None
+        position = int(np.searchsorted(self.keys, self._keys(coords)))
+        if position < self.keys.size and self.keys[position] == self._keys(coords):
+            return position
+        return None
+
+    def queryBox(self, lower=None, upper=None):
+        """ Returns the flat indices of the points in the axis-aligned box [lower, upper]; lower and upper are
+            (x, y, z) in mm, None or a None coordinate is unbounded
+        """
+        lower, upper = _bounds(lower, upper)
+        candidates = self.pointsOf(self._voxelsIn(lower, upper))
+        return candidates[_inBox(np.take(self.points, candidates, axis=0), lower, upper)]
+
+    def highestPoint(self, lower=None, upper=None):
+        """ Returns the flat index of the highest point in the box [lower, upper] (see queryBox) or None.
+
+        Voxels completely inside the box answer with their precomputed maxZ, only the points of the border
+        voxels which could be higher are tested.
+        """
+        lower, upper = _bounds(lower, upper)
+        voxels = self._voxelsIn(lower, upper)
+        if not voxels.size:
+            return None
+        # voxels completely inside: the voxel coordinates strictly between the ones of the bounds
+        first = self._voxelCoords(np.maximum(lower, self.origin))
+        last = self._voxelCoords(np.minimum(upper, self.origin + self.dims * np.float32(self.voxelSize)))
+        inner = _inBox(self.coords[voxels], np.where(lower > -np.inf, first + 1, first),
+                       np.where(upper < np.inf, last - 1, last))
+        best, bestZ = None, -np.inf
+        if inner.any():
+            innerVoxels = voxels[inner]
+            highest = int(np.argmax(self.maxZ[innerVoxels]))
+            best, bestZ = int(self.top[innerVoxels[highest]]), float(self.maxZ[innerVoxels[highest]])
+        border = voxels[~inner]
+        border = border[self.maxZ[border] > bestZ]
+        if border.size:
+            candidates = self.pointsOf(border)
+            candidates = candidates[_inBox(np.take(self.points, candidates, axis=0), lower, upper)]
+            if candidates.size:
+                highest = int(np.argmax(self.points[candidates, 2]))
+                if self.points[candidates[highest], 2] > bestZ:
+                    best = int(candidates[highest])
+        return best
+
+    def neighbors(self, point, radius):
+        """ Returns the flat indices of the points within radius of point """
+        point = np.asarray(point, dtype=np.float32).reshape(3)
+        candidates = self.queryBox(point - radius, point + radius)
+        distances = np.sum(np.square(self.points[candidates] - point), axis=1)
+        return candidates[distances <= np.float32(radius * radius)]
+
+    def nearest(self, point, maxDistance=None):
+        """ Returns the flat index of the point nearest to point and its distance, or (None, None) if there is
+            no point within maxDistance (default: one voxel); the search grows by one voxel at a time
+        """
+        point = np.asarray(point, dtype=np.float32).reshape(3)
+        maxDistance = self.voxelSize if maxDistance is None else maxDistance
+        radius = min(self.voxelSize, maxDistance)
+        while True:
+            candidates = self.queryBox(point - radius, point + radius)
+            if candidates.size:
+                distances = np.sum(np.square(self.points[candidates] - point), axis=1)
+                closest = int(np.argmin(distances))
+                distance = float(np.sqrt(distances[closest]))
+                # a point in the box may be farther than a point just outside of it, unless within radius
+                if distance <= radius:
+                    return int(candidates[closest]), distance
+            if radius >= maxDistance:
+                return None, None
+            radius = min(radius + self.voxelSize, maxDistance)
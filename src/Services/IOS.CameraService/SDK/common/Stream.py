@@ -20,6 +20,7 @@ import select
 import socket
 import struct
 import sys
+import threading
 import time
 
 logger = logging.getLogger(__name__)
@@ -47,31 +48,223 @@ def to_hex(bStr):
     return fStr
 
 
+class FramePool:
+    """ Pool of reusable frame buffers.
+
+    All frames of a device configuration have the same length, so the buffers are allocated once
+    (sized from the pkgLength of the first frame) and reused instead of allocating a new bytearray
+    for every frame. If the frame length changes, the buffers of the old length are discarded.
+    """
+
+    def __init__(self, maxFrames=4):
+        self.maxFrames = maxFrames
+        self.frameLength = None
+        self.allocatedFrames = 0
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self, frameLength):
+        """ Returns a bytearray of frameLength bytes (its content is undefined). """
+        with self._lock:
+            if frameLength != self.frameLength:
+                logger.debug("Frame length changed to %d, resizing frame pool" % frameLength)
+                self.frameLength = frameLength
+                self._free = []
+            if self._free:
+                return self._free.pop()
+            self.allocatedFrames += 1
+        return bytearray(frameLength)
+
+    def release(self, frame):
+        """ Returns a frame to the pool. The frame and all views on it must not be used afterwards. """
+        if not isinstance(frame, bytearray):
+            return
+        with self._lock:
+            if len(frame) == self.frameLength and len(self._free) < self.maxFrames and \
+                    not any(free is frame for free in self._free):
+                self._free.append(frame)
+
+
 class Streaming:
 
     """ All methods that use the streaming channel. """
-    def __init__(self, ipAddress='192.168.1.10', tcpPort=2114):
+
+    # number of bytes requested per recv call while looking for the next frame header
+    STREAM_CHUNK_SIZE = 65536
+    BLOB_HEAD_LEN = 11
+
+    def __init__(self, ipAddress='192.168.1.10', tcpPort=2114, framePool=None):
         self.ipAddress = ipAddress
         self.tcpPort = tcpPort
         self.sock_stream = None
-
-    def _read(self, nBytes):
-        """ Read exactly nBytes from the streaming socket and return the number of bytes read.
-            If the peer hung-up (recv returned an empty string), we return everything read so far (thus less than nBytes).
+        self.framePool = framePool if framePool is not None else FramePool()
+        # stream buffer: bytes received beyond the previous frame, valid in [_rxStart, _rxEnd)
+        self._rxBuffer = bytearray(self.STREAM_CHUNK_SIZE)
+        self._rxStart = 0
+        self._rxEnd = 0
+        # frame started by receiveAvailable(): buffer, number of missing bytes and receive time of the header
+        self._partialFrame = None
+        self._partialMissing = 0
+        self._partialTime = None
+        self.recorder = None
+        # acquisition thread, see startAcquisition()
+        self._acquisitionThread = None
+        self._acquisitionRunning = False
+        self._acquisitionError = None
+        self._frameCondition = threading.Condition()
+        self._latestFrame = None
+        self._latestFrameTime = None
+        self._sequence = 0
+        self._consumedSequence = 0
+        self.acquiredFrames = 0
+        self.droppedFrames = 0
+
+    def _fill(self, nBytes):
+        """ Receives into the stream buffer until it holds at least nBytes and returns the number of buffered bytes.
+            Every recv call requests a whole chunk, so the header and the beginning of the frame usually arrive
+            with a single call. If the peer hung-up (recv returned 0), less than nBytes are buffered.
         """
-        buffer = bytes()
-        lenBuffer = 0
-        while lenBuffer < nBytes:
-            data = self.sock_stream.recv(
-                nBytes - lenBuffer)  # recv(x) receives maximum (!!) x bytes! No guarante that we receive all required bytes!
-            lenReceived = len(data)
+        if self._rxEnd - self._rxStart >= nBytes:
+            return self._rxEnd - self._rxStart
+        self._compact()
+        view = memoryview(self._rxBuffer)
+        while self._rxEnd < nBytes:
+            lenReceived = self.sock_stream.recv_into(view[self._rxEnd:])
             if lenReceived == 0:
                 break
+            self._rxEnd += lenReceived
+        return self._rxEnd - self._rxStart
+
+    def _compact(self):
+        """ Moves the bytes remaining in the stream buffer to its front """
+        if self._rxStart:
+            buffered = self._rxEnd - self._rxStart
+            self._rxBuffer[:buffered] = self._rxBuffer[self._rxStart:self._rxEnd]
+            self._rxStart = 0
+            self._rxEnd = buffered
+
+    def _receiveChunk(self):
+        """ One recv call into the free part of the stream buffer without waiting (non-blocking socket),
+            returns False if no data was available
+        """
+        self._compact()
+        try:
+            lenReceived = self.sock_stream.recv_into(memoryview(self._rxBuffer)[self._rxEnd:])
+        except (BlockingIOError, socket.timeout):
+            return False
+        if lenReceived == 0:
+            raise socket.error("Network connection closed by peer")
+        self._rxEnd += lenReceived
+        return True
+
+    def _parseHeader(self):
+        """ Checks the BLOB header at the start of the stream buffer and returns pkgLength """
+        (magicword, pkgLength, protocolVersion, packetType) = \
+            struct.unpack_from('>IIHB', self._rxBuffer, self._rxStart)
+        keepRunning = True
+        if magicword != 0x02020202:
+            logger.error("Unknown magic word: %0x" % (magicword))
+            keepRunning = False
+        if protocolVersion != 0x0001:
+            logger.error("Unknown protocol version: %0x" % (protocolVersion))
+            keepRunning = False
+        if packetType != 0x62:
+            logger.error("Unknown packet type: %0x" % (packetType))
+            keepRunning = False
+
+        if not keepRunning:
+            # the stream is out of sync, drop what is buffered
+            self._rxStart = self._rxEnd = 0
+            raise RuntimeError('something is wrong with the buffer')
+        return pkgLength
+
+    def _startFrame(self, pkgLength):
+        """ Takes a buffer of the frame pool for the frame whose header is at the start of the stream buffer and
+            moves the already buffered bytes of the frame into it; returns the buffer and the number of bytes
+            still to be received
+        """
+        # -3 for protocolVersion and packetType already received
+        # +1 for checksum
+        toread = pkgLength - 3 + 1
+        logger.debug("pkgLength: %d" % (pkgLength))
+        logger.debug("toread: %d" % (toread))
 
-            # buffer has to be concatinated (appended) with the bytes object (data)
-            buffer += data
-            lenBuffer += lenReceived
-        return buffer
+        frameLength = self.BLOB_HEAD_LEN + toread
+        data = self.framePool.acquire(frameLength)
+
+        # the header and the beginning of the frame are already in the stream buffer
+        nBuffered = min(self._rxEnd - self._rxStart, frameLength)
+        memoryview(data)[:nBuffered] = memoryview(self._rxBuffer)[self._rxStart:self._rxStart + nBuffered]
+        self._rxStart += nBuffered
+        if self._rxStart == self._rxEnd:
+            self._rxStart = self._rxEnd = 0
+        return data, frameLength - nBuffered
+
+    def _completeFrame(self, data):
+        """ Publishes a completely received frame in self.frame (frame_acq_time_s is set) """
+        self.frame = data
+        if self.recorder is not None:
+            self.recorder.record(data, self.frame_acq_time_s)
+
+        frame_acq_stop = time.time()
+        self.frame_revc_time_s = (frame_acq_stop - self.frame_acq_time_s)
+        logger.debug("Receiving took %0.1f ms" % ((self.frame_revc_time_s) * 1000))
+
+    def receiveAvailable(self):
+        """ Receives the data available on the socket without waiting for more.
+
+        Returns a frame (a buffer of the frame pool, also in self.frame) as soon as one is complete, else None;
+        call it again until it returns None, further frames may be buffered already. A partially received
+        frame is continued by the next call, so one slow sender never blocks the caller, e.g. the selector loop
+        of CameraHub serving several cameras. The socket has to be non-blocking (sock_stream.setblocking(False)).
+        Raises socket.error if the peer hung up.
+        """
+        self.frame = None
+        while True:
+            if self._partialFrame is None:
+                if self._rxEnd - self._rxStart < self.BLOB_HEAD_LEN:
+                    if not self._receiveChunk():
+                        return None
+                    continue
+                self._partialTime = time.time()
+                self._partialFrame, self._partialMissing = self._startFrame(self._parseHeader())
+            if self._partialMissing:
+                frame = self._partialFrame
+                try:
+                    nBytes = self.sock_stream.recv_into(memoryview(frame)[len(frame) - self._partialMissing:])
+                except (BlockingIOError, socket.timeout):
+                    return None
+                if nBytes == 0:
+                    raise socket.error("Network connection closed by peer")
+                self._partialMissing -= nBytes
+                continue
+            data = self._partialFrame
+            self._partialFrame = None
+            self.frame_acq_time_s = self._partialTime
+            self._completeFrame(data)
+            return data
+
+    def setRecorder(self, recorder):
+        """ Every frame received by getFrame() is passed to recorder.record(frame, receiveTime),
+            e.g. a common.data_io.FrameRecorder. None stops recording.
+        """
+        self.recorder = recorder
+
+    def bufferedBytes(self):
+        """ Number of bytes which were already received from the socket but not returned as frame yet.
+            If this holds a complete header, select() does not report the socket as readable although a
+            frame can be read.
+        """
+        return self._rxEnd - self._rxStart
+
+    def releaseFrame(self, frame):
+        """ Hands a frame obtained from getFrame() back to the frame pool to be reused.
+
+        Release a frame only when neither the frame nor anything decoded from it without a copy
+        (e.g. the numpy channels of Data.read(asNumpy=True)) is used anymore. Frames handed out by
+        get_latest() may be shared between callers and should not be released.
+        """
+        self.framePool.release(frame)
 
     ''' Opens the streaming channel. '''
 
@@ -91,9 +284,131 @@ class Streaming:
         """ Closes the streaming channel. """
         if self.sock_stream is not None:
             logging.info("Closing streaming connection..."),
+            self._rxStart = self._rxEnd = 0
+            if self._partialFrame is not None:
+                self.framePool.release(self._partialFrame)
+                self._partialFrame = None
+            if self._acquisitionRunning:
+                # wake up the acquisition thread blocked in recv
+                self._acquisitionRunning = False
+                try:
+                    self.sock_stream.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
             self.sock_stream.close()
+            self.stopAcquisition()
             logging.info("...done.")
 
+    def startAcquisition(self):
+        """ Starts a thread which receives the frames continuously (continuous mode only).
+
+        Only the newest completely received frame is kept, older frames which were not fetched
+        are dropped (see droppedFrames). So the age of a fetched frame is bounded by one frame period
+        instead of the frames piling up in the socket buffer.
+        While the thread is running use get_latest() or wait_next() instead of getFrame() and poll().
+        """
+        if self._acquisitionThread is not None and self._acquisitionThread.is_alive():
+            return
+        with self._frameCondition:
+            self._acquisitionError = None
+            self._latestFrame = None
+            self._latestFrameTime = None
+            self._sequence = 0
+            self._consumedSequence = 0
+            self.acquiredFrames = 0
+            self.droppedFrames = 0
+        self._acquisitionRunning = True
+        self._acquisitionThread = threading.Thread(target=self._acquisitionLoop, name="StreamingAcquisition",
+                                                   daemon=True)
+        self._acquisitionThread.start()
+
+    def stopAcquisition(self, timeout=None):
+        """ Stops the acquisition thread. It finishes after the current receive call returned. """
+        self._acquisitionRunning = False
+        thread = self._acquisitionThread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+            if not thread.is_alive():
+                self._acquisitionThread = None
+        with self._frameCondition:
+            self._frameCondition.notify_all()
+
+    def isAcquiring(self):
+        """ True if the acquisition thread is running """
+        return self._acquisitionThread is not None and self._acquisitionThread.is_alive()
+
+    def _acquisitionLoop(self):
+        while self._acquisitionRunning:
+            try:
+                self.getFrame(peek=True)
+            except Exception as err:
+                if self._acquisitionRunning:
+                    logger.error("Acquisition thread stopped: %s" % err)
+                    with self._frameCondition:
+                        self._acquisitionError = err
+                break
+            if self.frame is None:
+                # receive timeout, e.g. the device is not streaming at the moment
+                continue
+            with self._frameCondition:
+                if self._latestFrame is not None and self._consumedSequence != self._sequence:
+                    # nobody has seen this frame, so its buffer can be reused right away
+                    self.droppedFrames += 1
+                    self.framePool.release(self._latestFrame)
+                self._latestFrame = self.frame
+                self._latestFrameTime = self.frame_acq_time_s
+                self._sequence += 1
+                self.acquiredFrames += 1
+                self._frameCondition.notify_all()
+        self._acquisitionRunning = False
+        with self._frameCondition:
+            self._frameCondition.notify_all()
+
+    def _checkAcquisition(self):
+        if self._acquisitionError is not None:
+            raise RuntimeError("Acquisition thread failed: %s" % self._acquisitionError)
+
+    @property
+    def consumedSequence(self):
+        """ Sequence number of the frame returned last by get_latest() or wait_next(), counted by the acquisition
+            thread from 1 on after startAcquisition(); equal numbers mean the same frame
+        """
+        return self._consumedSequence
+
+    def get_latest(self, max_age_ms=None):
+        """ Returns the newest frame of the acquisition thread.
+
+        max_age_ms: if given, a frame which was received longer ago than this is not returned
+        Returns None if there is no (recent enough) frame. The same frame is returned again until a newer one
+        was received.
+        """
+        with self._frameCondition:
+            self._checkAcquisition()
+            if self._latestFrame is None:
+                return None
+            if max_age_ms is not None and (time.time() - self._latestFrameTime) * 1000.0 > max_age_ms:
+                return None
+            self._consumedSequence = self._sequence
+            return self._latestFrame
+
+    def wait_next(self, timeout=None):
+        """ Waits for a frame that was not returned by get_latest() or wait_next() yet and returns it.
+
+        timeout: in seconds, None waits forever
+        Raises socket.timeout if no frame was received in time.
+        """
+        with self._frameCondition:
+            hasFrame = self._frameCondition.wait_for(
+                lambda: self._sequence != self._consumedSequence or self._acquisitionError is not None or
+                not self._acquisitionRunning, timeout)
+            self._checkAcquisition()
+            if not hasFrame or self._sequence == self._consumedSequence:
+                if not self._acquisitionRunning:
+                    raise RuntimeError("Acquisition thread is not running")
+                raise socket.timeout("No new frame within %s s" % timeout)
+            self._consumedSequence = self._sequence
+            return self._latestFrame
+
     def sendBlobRequest(self):
         """ Sending a blob request. """
         MSG_BLREQ_TX = b'BlbReq'
@@ -129,72 +444,298 @@ class Streaming:
         """ Receives the raw data frame from the device via the streaming channel.
 
          peek(bool): if True it returns True if no data were found.
+
+         The frame (self.frame) is a buffer of the frame pool. Hand it back with releaseFrame()
+         when it is not needed anymore, otherwise a new buffer is allocated for the next frame.
         """
         logger.debug('Reading image from stream...')
         self.frame = None  # reset old frame
         self.frame_acq_time_s = None
 
-        keepRunning = True
-
-        BLOB_HEAD_LEN = 11
-        try:
-            header = self._read(BLOB_HEAD_LEN)  # read exactly the header length!
-            receiveLenth = len(header)
-            if receiveLenth < BLOB_HEAD_LEN:
-                raise socket.error(
-                    "Network connection closed by peer. Receive length is {} and should be {}".format(receiveLenth,
-                                                                                                      BLOB_HEAD_LEN))
-        except socket.timeout:
-            header = None
-
-        if not header:
-            if peek:
-                return
-            raise socket.timeout("BLOB header received a timeout")
-
-        self.frame_acq_time_s = time.time()
-
-        logger.debug("len(header) = %d dump: %s" % (len(header), to_hex(header)))
-        assert len(header) == BLOB_HEAD_LEN, "Uh, not enough bytes for BLOB_HEAD_LEN, only %s" % (len(header))
-
-        # check if the header content is as expected
-        (magicword, pkgLength, protocolVersion, packetType) = \
-            struct.unpack('>IIHB', header)
-        if magicword != 0x02020202:
-            logger.error("Unknown magic word: %0x" % (magicword))
-            keepRunning = False
-        if protocolVersion != 0x0001:
-            logger.error("Unknown protocol version: %0x" % (protocolVersion))
-            keepRunning = False
-        if packetType != 0x62:
-            logger.error("Unknown packet type: %0x" % (packetType))
-            keepRunning = False
-
-        if not keepRunning:
-            raise RuntimeError('something is wrong with the buffer')
-
-        # -3 for protocolVersion and packetType already received
-        # +1 for checksum
-        toread = pkgLength - 3 + 1
-        logger.debug("pkgLength: %d" % (pkgLength))
-        logger.debug("toread: %d" % (toread))
-
-        data = bytearray(len(header) + toread)
-        view = memoryview(data)
-        view[:len(header)] = header
-        view = view[len(header):]
+        if self._partialFrame is not None:
+            # finish the frame started by receiveAvailable()
+            data, toread = self._partialFrame, self._partialMissing
+            self._partialFrame = None
+            self.frame_acq_time_s = self._partialTime
+        else:
+            BLOB_HEAD_LEN = self.BLOB_HEAD_LEN
+            try:
+                receiveLength = self._fill(BLOB_HEAD_LEN)  # buffer at least the header length
+                if receiveLength < BLOB_HEAD_LEN:
+                    raise socket.error(
+                        "Network connection closed by peer. Receive length is {} and should be {}".format(
+                            receiveLength, BLOB_HEAD_LEN))
+            except socket.timeout:
+                # a partially received header stays in the stream buffer
+                receiveLength = 0
+
+            if receiveLength < BLOB_HEAD_LEN:
+                if peek:
+                    return
+                raise socket.timeout("BLOB header received a timeout")
+
+            self.frame_acq_time_s = time.time()
+
+            if logger.isEnabledFor(logging.DEBUG):
+                header = bytes(self._rxBuffer[self._rxStart:self._rxStart + BLOB_HEAD_LEN])
+                logger.debug("len(header) = %d dump: %s" % (len(header), to_hex(header)))
+
+            # check if the header content is as expected
+            data, toread = self._startFrame(self._parseHeader())
+
+        # the rest is received directly into the frame buffer
+        frameLength = len(data)
+        view = memoryview(data)[frameLength - toread:]
         while toread:
             nBytes = self.sock_stream.recv_into(view, toread)
             if nBytes == 0:
                 # premature end of connection
-                raise RuntimeError("received {} but requested {} bytes".format(len(data) - len(view), pkgLength))
+                raise RuntimeError("received {} but requested {} bytes".format(frameLength - toread, frameLength))
             view = view[nBytes:]
             toread -= nBytes
 
-        self.frame = data
-
-        frame_acq_stop = time.time()
-        self.frame_revc_time_s = (frame_acq_stop - self.frame_acq_time_s)
-        logger.debug("Receiving took %0.1f ms" % ((self.frame_revc_time_s) * 1000))
+        self._completeFrame(data)
         # full frame should be received now
-        logger.debug("...done.")
\ No newline at end of file
+        logger.debug("...done.")
+
+class _BlobAssembly:
+    """ Fragments of one BLOB received so far """
+
+    def __init__(self, blobNumber, buffer):
+        self.blobNumber = blobNumber
+        self.buffer = buffer
+        self.fragments = set()
+        self.lastFragment = None  # fragment number of the fragment with the last-fragment flag
+        self.length = None  # length of the BLOB, known when the last fragment was placed
+        self.deferred = []  # fragments which could not be placed yet (fragment size unknown)
+        self.firstFragmentTime = time.time()
+
+    def isComplete(self):
+        return self.length is not None and not self.deferred and len(self.fragments) == self.lastFragment + 1
+
+
+class UdpStreaming(Streaming):
+    """ Streaming channel for the UDP transport (see BlobClientConfig.setTransportProtocol()).
+
+    The device sends every BLOB in fragments of at most BlobUdpMaxPacketSize bytes, each with a header of
+    UDP_HEADER_LEN bytes (BlobUdpHeaderEnabled must be set). The fragments are reassembled by blob number and
+    fragment number into a frame buffer of the frame pool, so getFrame()/frame behave like with TCP and the
+    frames can be passed to Data.read() unchanged. Fragments may arrive out of order; a BLOB with lost
+    fragments is dropped when it is overtaken by newer BLOBs (see incompleteBlobs).
+    """
+
+    UDP_HEADER_LEN = 14
+    FLAG_LAST_FRAGMENT = 0x80
+
+    def __init__(self, receiverIpAddress='', udpPort=2114, deviceIpAddress=None, receiveBufferSize=4 * 1024 * 1024,
+                 maxPendingBlobs=2, framePool=None):
+        """
+        receiverIpAddress: local address to bind to, '' listens on all adapters
+        udpPort:           BlobUdpReceiverPort configured on the device
+        deviceIpAddress:   if given, datagrams from other senders are ignored
+        receiveBufferSize: SO_RCVBUF of the socket, has to hold the fragments of a few frames
+        maxPendingBlobs:   number of BLOBs reassembled at the same time, older incomplete BLOBs are dropped
+        """
+        super().__init__(deviceIpAddress, udpPort, framePool)
+        self.receiverIpAddress = receiverIpAddress
+        self.udpPort = udpPort
+        self.deviceIpAddress = deviceIpAddress
+        self.receiveBufferSize = receiveBufferSize
+        self.maxPendingBlobs = maxPendingBlobs
+        self.fragmentSize = None  # payload length of all but the last fragment, learned from the stream
+        self._pending = {}
+        self._lastCompleted = None
+        # statistics
+        self.completeBlobs = 0
+        self.incompleteBlobs = 0
+        self.invalidBlobs = 0
+        self.lateFragments = 0
+        self.duplicateFragments = 0
+
+    def openStream(self):
+        """ Opens the datagram socket. """
+        logger.info("Opening UDP streaming socket..."),
+        self.sock_stream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock_stream.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receiveBufferSize)
+        self.sock_stream.settimeout(1)
+        try:
+            self.sock_stream.bind((self.receiverIpAddress, self.udpPort))
+        except socket.error as err:
+            logger.error("Error on binding to %s:%d: %s" % (self.receiverIpAddress, self.udpPort, err))
+            raise
+        self._pending = {}
+        self._lastCompleted = None
+        logger.info("...done.")
+
+    def sendBlobRequest(self):
+        """ Not used with UDP, the device transmits automatically (BlobUdpAutoTransmit). """
+        pass
+
+    def getStatistics(self):
+        """ Returns the counters of the reassembly """
+        return {'completeBlobs': self.completeBlobs,
+                'incompleteBlobs': self.incompleteBlobs,
+                'invalidBlobs': self.invalidBlobs,
+                'lateFragments': self.lateFragments,
+                'duplicateFragments': self.duplicateFragments}
+
+    def getFrame(self, peek=False):
+        """ Receives fragments until a BLOB is complete and stores it in self.frame.
+
+         peek(bool): if True it returns if no datagram was received within the socket timeout.
+        """
+        self.frame = None
+        self.frame_acq_time_s = None
+        datagram = memoryview(self._rxBuffer)
+        while True:
+            try:
+                nBytes, sender = self.sock_stream.recvfrom_into(self._rxBuffer)
+            except socket.timeout:
+                if peek:
+                    return
+                raise socket.timeout("No BLOB fragment received")
+            if self.deviceIpAddress and sender[0] != self.deviceIpAddress:
+                continue
+            if nBytes < self.UDP_HEADER_LEN:
+                logger.warning("Ignoring datagram of %d bytes" % nBytes)
+                continue
+            assembly = self._addFragment(datagram[:nBytes])
+            if assembly is not None:
+                break
+
+        self.frame_acq_time_s = assembly.firstFragmentTime
+        self._completeFrame(assembly.buffer)
+
+    def receiveAvailable(self):
+        """ Reads the datagrams available on the socket without waiting and returns the frame of a BLOB as soon
+            as it is complete (see Streaming.receiveAvailable()), else None; the socket has to be non-blocking.
+        """
+        self.frame = None
+        datagram = memoryview(self._rxBuffer)
+        while True:
+            try:
+                nBytes, sender = self.sock_stream.recvfrom_into(self._rxBuffer)
+            except (BlockingIOError, socket.timeout):
+                return None
+            if self.deviceIpAddress and sender[0] != self.deviceIpAddress:
+                continue
+            if nBytes < self.UDP_HEADER_LEN:
+                logger.warning("Ignoring datagram of %d bytes" % nBytes)
+                continue
+            assembly = self._addFragment(datagram[:nBytes])
+            if assembly is not None:
+                self.frame_acq_time_s = assembly.firstFragmentTime
+                self._completeFrame(assembly.buffer)
+                return self.frame
+
+    def _addFragment(self, datagram):
+        """ Places one fragment, returns the assembly if its BLOB is complete now """
+        blobNumber = datagram[0] | (datagram[1] << 8)
+        fragmentNumber = (datagram[2] << 8) | datagram[3]
+        isLast = bool(datagram[6] & self.FLAG_LAST_FRAGMENT)
+        payload = datagram[self.UDP_HEADER_LEN:]
+
+        assembly = self._pending.get(blobNumber)
+        if assembly is None:
+            if self._lastCompleted is not None and \
+                    (blobNumber == self._lastCompleted or self._isOlder(blobNumber, self._lastCompleted)):
+                # fragment of a BLOB which is already completed or dropped
+                self.lateFragments += 1
+                return None
+            assembly = _BlobAssembly(blobNumber, self._acquireBuffer())
+            self._pending[blobNumber] = assembly
+            while len(self._pending) > self.maxPendingBlobs:
+                oldest = next(iter(self._pending))
+                logger.debug("Dropping incomplete BLOB %d" % oldest)
+                self._dropAssembly(oldest)
+                self.incompleteBlobs += 1
+
+        if fragmentNumber in assembly.fragments or \
+                any(deferred[0] == fragmentNumber for deferred in assembly.deferred):
+            self.duplicateFragments += 1
+            return None
+
+        if not isLast and self.fragmentSize != len(payload):
+            if self.fragmentSize is not None:
+                logger.warning("Fragment size changed from %d to %d" % (self.fragmentSize, len(payload)))
+                if assembly.fragments:
+                    # the fragments placed so far are at wrong offsets
+                    self._dropAssembly(blobNumber)
+                    self.invalidBlobs += 1
+                    return None
+            self.fragmentSize = len(payload)
+
+        if self.fragmentSize is None and fragmentNumber != 0:
+            # offset still unknown, keep a copy until a full-size fragment has been received
+            assembly.deferred.append((fragmentNumber, isLast, bytes(payload)))
+            return None
+
+        self._placeFragment(assembly, fragmentNumber, isLast, payload)
+        while assembly.deferred and self.fragmentSize is not None:
+            self._placeFragment(assembly, *assembly.deferred.pop())
+
+        if not assembly.isComplete():
+            return None
+
+        del self._pending[blobNumber]
+        self._lastCompleted = blobNumber
+        # fragments of older BLOBs will not arrive anymore
+        for olderNumber in [number for number in self._pending if self._isOlder(number, blobNumber)]:
+            self._dropAssembly(olderNumber)
+            self.incompleteBlobs += 1
+
+        if not self._finishAssembly(assembly):
+            self.invalidBlobs += 1
+            return None
+        self.completeBlobs += 1
+        return assembly
+
+    @staticmethod
+    def _isOlder(blobNumber, referenceNumber):
+        """ Compares blob numbers with wrap around at 16 bit """
+        return blobNumber != referenceNumber and ((referenceNumber - blobNumber) & 0xFFFF) < 0x8000
+
+    def _acquireBuffer(self):
+        """ Frame buffer for a new BLOB; with a known frame length directly from the pool """
+        if self.framePool.frameLength is not None:
+            return self.framePool.acquire(self.framePool.frameLength)
+        return bytearray(self.STREAM_CHUNK_SIZE)
+
+    def _dropAssembly(self, blobNumber):
+        assembly = self._pending.pop(blobNumber)
+        self.framePool.release(assembly.buffer)
+
+    def _placeFragment(self, assembly, fragmentNumber, isLast, payload):
+        offset = fragmentNumber * self.fragmentSize if fragmentNumber else 0
+        end = offset + len(payload)
+        if end > len(assembly.buffer):
+            # first frame or the frame length has changed
+            grown = bytearray(max(end, 2 * len(assembly.buffer)))
+            grown[:len(assembly.buffer)] = assembly.buffer
+            self.framePool.release(assembly.buffer)
+            assembly.buffer = grown
+        assembly.buffer[offset:end] = payload
+        assembly.fragments.add(fragmentNumber)
+        if isLast:
+            assembly.lastFragment = fragmentNumber
+            assembly.length = end
+
+    def _finishAssembly(self, assembly):
+        """ Checks the BLOB header and trims the buffer to the frame length """
+        buffer = assembly.buffer
+        if assembly.length < 11:
+            self.framePool.release(buffer)
+            return False
+        magicword, pkgLength = struct.unpack_from('>II', buffer, 0)
+        frameLength = pkgLength + 9  # 8 bytes magic word and length, 1 byte checksum
+        if magicword != 0x02020202 or frameLength != assembly.length:
+            logger.error("Invalid BLOB %d: magic word %0x, length %d, received %d bytes" %
+                         (assembly.blobNumber, magicword, frameLength, assembly.length))
+            self.framePool.release(buffer)
+            return False
+        if len(buffer) != frameLength:
+            frame = self.framePool.acquire(frameLength)
+            frame[:] = memoryview(buffer)[:frameLength]
+            self.framePool.release(buffer)
+            assembly.buffer = frame
+        return True
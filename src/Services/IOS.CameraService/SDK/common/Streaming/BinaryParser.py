@@ -15,10 +15,60 @@ CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTH
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import calendar
 import logging
 import struct
 
-from common.Streaming.ParserHelper import DepthMap, Polar2DData, CartesianData, MAX_CONFIDENCE
+import numpy as np
+
+from common.Streaming.ParserHelper import DepthMap, LazyDepthMap, Polar2DData, CartesianData, MAX_CONFIDENCE
+
+# numpy dtypes of the depth map channels, indexed by the number of bytes per value
+CHANNEL_DTYPES = {1: np.dtype('u1'), 2: np.dtype('<u2'), 4: np.dtype('<u4')}
+
+
+def compileDepthMapDtype(numBytesFrameNumber,
+                         numBytesQuality,
+                         numBytesStatus,
+                         numBytesDistance,
+                         numBytesIntensity,
+                         numBytesPerIntensityValue,
+                         numBytesConfidence,
+                         imageWidth,
+                         imageHeight):
+    """ Compiles the numpy structured dtype of one depth map record of the binary segment.
+
+    The record covers the whole depth map part from the length at start to the length at end, so a
+    frame is decoded with a single np.frombuffer(). SSR files store the same records back to back.
+    Returns None if the layout is not supported (the caller falls back to getDepthMap then).
+    """
+    pixels = imageWidth * imageHeight
+    if not pixels or numBytesDistance != 2 * pixels:
+        return None
+
+    fields = [('length', '<u4'), ('timestamp', '<u8'), ('version', '<u2')]
+    if numBytesFrameNumber or numBytesQuality or numBytesStatus:
+        if (numBytesFrameNumber, numBytesQuality, numBytesStatus) != (4, 1, 1):
+            return None
+        fields += [('frameNumber', '<u4'), ('quality', 'u1'), ('status', 'u1')]
+
+    fields.append(('distance', '<u2', (imageHeight, imageWidth)))
+
+    if numBytesPerIntensityValue in (2, 4):
+        fields.append(('intensity', CHANNEL_DTYPES[numBytesPerIntensityValue], (imageHeight, imageWidth)))
+    elif numBytesIntensity % pixels == 0:
+        # legacy mode, also used for RGBA -> byte-wise
+        fields.append(('intensity', 'u1', (imageHeight, imageWidth, numBytesIntensity // pixels)))
+    else:
+        return None
+
+    if numBytesConfidence:
+        if numBytesConfidence != 2 * pixels:
+            return None
+        fields.append(('confidence', '<u2', (imageHeight, imageWidth)))
+
+    fields += [('crc', '<u4'), ('lengthAtEnd', '<u4')]
+    return np.dtype(fields)
 
 
 class BinaryParser:
@@ -34,7 +84,23 @@ class BinaryParser:
                     numBytesDistance,
                     numBytesIntensity,
                     numBytesPerIntensityValue,
-                    numBytesConfidence):
+                    numBytesConfidence,
+                    imageWidth=None,
+                    imageHeight=None,
+                    asNumpy=False):
+        """ Extracts the depth map from the binary segment.
+
+        asNumpy: If this is True, distance, intensity and confidence are returned as numpy arrays
+                 (np.frombuffer views on binarySegment, shaped (imageHeight, imageWidth) when the
+                 image size is given) instead of tuples. No intermediate python objects are created
+                 and binarySegment is not copied, so the caller must not modify it afterwards.
+        """
+        if asNumpy:
+            self._getDepthMapNumpy(binarySegment, numBytesFrameNumber, numBytesQuality, numBytesStatus,
+                                   numBytesDistance, numBytesIntensity, numBytesPerIntensityValue,
+                                   numBytesConfidence, imageWidth, imageHeight)
+            return
+
         position = 0
         # the binary part starts with entries for length, a timestamp
         # and a version identifier
@@ -107,6 +173,118 @@ class BinaryParser:
 
         self.depthmap = DepthMap(distanceData, intensityData, confidenceData, frameNumber, quality, status, timeStamp)
 
+    def _getDepthMapNumpy(self,
+                          binarySegment,
+                          numBytesFrameNumber,
+                          numBytesQuality,
+                          numBytesStatus,
+                          numBytesDistance,
+                          numBytesIntensity,
+                          numBytesPerIntensityValue,
+                          numBytesConfidence,
+                          imageWidth,
+                          imageHeight):
+        """ Same as getDepthMap, but every channel is a zero-copy numpy view on binarySegment. """
+        position = 0
+        (lengthAtStart, timeStamp, version) = struct.unpack_from('<IQH', binarySegment, position)
+        position += struct.calcsize('<IQH')
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Length at start: %s", lengthAtStart)
+            self.logTimeStamp(timeStamp)
+            logging.debug("Format version: %s", version)
+
+        if version == 2:
+            assert numBytesFrameNumber == 4
+            assert numBytesQuality == 1
+            assert numBytesStatus == 1
+            (frameNumber, quality, status) = struct.unpack_from('<IBB', binarySegment, position)
+            position += struct.calcsize('<IBB')
+        else:
+            logging.warning("Old format, no values for frameNumber, quality and status")
+            frameNumber = -1
+            quality = 0
+            status = 0
+
+        distanceData = self._channelView(binarySegment, position, numBytesDistance, 2,
+                                         imageWidth, imageHeight)
+        position += numBytesDistance
+
+        if numBytesPerIntensityValue in (2, 4):
+            intensityData = self._channelView(binarySegment, position, numBytesIntensity, numBytesPerIntensityValue,
+                                              imageWidth, imageHeight)
+        else:
+            # legacy mode, also used for RGBA -> byte-wise
+            intensityData = self._channelView(binarySegment, position, numBytesIntensity, 1,
+                                              imageWidth, imageHeight)
+        position += numBytesIntensity
+
+        confidenceData = self._channelView(binarySegment, position, numBytesConfidence, 2,
+                                           imageWidth, imageHeight)
+        position += numBytesConfidence
+
+        # checking if all data is read
+        if (position + 4 == lengthAtStart):
+            (crc, lengthAtEnd) = struct.unpack_from('<II', binarySegment, position)
+            position += struct.calcsize('<II')
+            if lengthAtStart != lengthAtEnd:
+                logging.error("lengthAtStart != lengthAtEnd")
+        self.remainingBuffer = memoryview(binarySegment)[position:]
+
+        self.depthmap = DepthMap(distanceData, intensityData, confidenceData, frameNumber, quality, status, timeStamp)
+
+    def getDepthMapRecord(self, binarySegment, depthMapDtype, distanceFactor=None):
+        """ Decodes the depth map with a dtype compiled by compileDepthMapDtype.
+
+        The result is a LazyDepthMap: only the header is read here, a channel is decoded when it is
+        accessed for the first time and all channels are views on binarySegment.
+        distanceFactor: factor applied to the distance on access (e.g. conversion to millimeters)
+
+        Returns False if the segment does not match the compiled layout, e.g. for the old format
+        without frame number. Use getDepthMap then.
+        """
+        if len(binarySegment) < depthMapDtype.itemsize:
+            return False
+        record = np.frombuffer(binarySegment, dtype=depthMapDtype, count=1)
+        hasFormat2 = 'frameNumber' in depthMapDtype.names
+        version = int(record['version'][0])
+        if (version == 2) != hasFormat2 or int(record['length'][0]) + 4 != depthMapDtype.itemsize:
+            return False
+
+        timeStamp = int(record['timestamp'][0])
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            self.logTimeStamp(timeStamp)
+            logging.debug("Format version: %s", version)
+        if int(record['lengthAtEnd'][0]) != int(record['length'][0]):
+            logging.error("lengthAtStart != lengthAtEnd")
+
+        if hasFormat2:
+            frameNumber = int(record['frameNumber'][0])
+            quality = int(record['quality'][0])
+            status = int(record['status'][0])
+        else:
+            frameNumber = -1
+            quality = 0
+            status = 0
+
+        self.remainingBuffer = memoryview(binarySegment)[depthMapDtype.itemsize:]
+        self.depthmap = LazyDepthMap(record, frameNumber, quality, status, timeStamp, distanceFactor)
+        return True
+
+    @staticmethod
+    def _channelView(binarySegment, offset, numBytes, numBytesPerValue, imageWidth, imageHeight):
+        """ Returns a little-endian numpy view of numBytes starting at offset, shaped like the image if possible. """
+        dtype = CHANNEL_DTYPES[numBytesPerValue]
+        count = numBytes // numBytesPerValue
+        data = np.frombuffer(binarySegment, dtype=dtype, count=count, offset=offset)
+        if imageWidth and imageHeight and count:
+            pixels = imageWidth * imageHeight
+            if count == pixels:
+                data = data.reshape(imageHeight, imageWidth)
+            elif count % pixels == 0:
+                # several values per pixel, e.g. RGBA byte-wise
+                data = data.reshape(imageHeight, imageWidth, count // pixels)
+        return data
+
     def getPolar2D(self,
                    binarySegment,
                    numPolarValues):
@@ -235,25 +413,44 @@ class BinaryParser:
     # ===============================================================================
 
     def logTimeStamp(self, timeStamp):
-        # 0x03 D9 08 40 02 C7 B0 00
-        # 0000 0011 1101 1001 0000 1000 0100 0000 0000 0010 1100 0111 1011 0000 0000 0000
-        # .... .YYY YYYY YYYY YMMM MDDD DDTT TTTT TTTT THHH HHMM MMMM SSSS SSmm mmmm mmmm
-        # Bits: 5 unused - 12 Year - 4 Month - 5 Day - 11 Timezone - 5 Hour - 6 Minute - 6 Seconds - 10 Milliseconds
-        # .....YYYYYYYYYYYYMMMMDDDDDTTTTTTTTTTTHHHHHMMMMMMSSSSSSmmmmmmmmmm
-        YearMask         = 0b0000011111111111100000000000000000000000000000000000000000000000
-        MonthMask        = 0b0000000000000000011110000000000000000000000000000000000000000000
-        DayMask          = 0b0000000000000000000001111100000000000000000000000000000000000000
-        TimezoneMask     = 0b0000000000000000000000000011111111111000000000000000000000000000
-        HourMask         = 0b0000000000000000000000000000000000000111110000000000000000000000
-        MinuteMask       = 0b0000000000000000000000000000000000000000001111110000000000000000
-        SecondsMask      = 0b0000000000000000000000000000000000000000000000001111110000000000
-        MillisecondsMask = 0b0000000000000000000000000000000000000000000000000000001111111111
-        Year = (timeStamp & YearMask) >> 47
-        Month = (timeStamp & MonthMask) >> 43
-        Day = (timeStamp & DayMask) >> 38
-        Timezone = (timeStamp & TimezoneMask) >> 27
-        Hour = (timeStamp & HourMask) >> 22
-        Minute = (timeStamp & MinuteMask) >> 16
-        Seconds = (timeStamp & SecondsMask) >> 10
-        Milliseconds = timeStamp & MillisecondsMask
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            # decoding the bit field is only needed for the log message
+            return
+        (Year, Month, Day, Timezone, Hour, Minute, Seconds, Milliseconds) = decodeTimeStamp(timeStamp)
         logging.debug("Data Timestamp [YYYY-MM-DD HH:MM:SS.mm] = %04u-%02u-%02u %02u:%02u:%02u.%03u" % (Year, Month, Day, Hour, Minute, Seconds, Milliseconds))
+
+
+def decodeTimeStamp(timeStamp):
+    """ Splits the bit field timestamp of a frame into its components.
+
+    Works on python integers as well as on numpy uint64 arrays (e.g. the timestamps of many records).
+    Returns (Year, Month, Day, Timezone, Hour, Minute, Seconds, Milliseconds).
+    """
+    # 0x03 D9 08 40 02 C7 B0 00
+    # 0000 0011 1101 1001 0000 1000 0100 0000 0000 0010 1100 0111 1011 0000 0000 0000
+    # .... .YYY YYYY YYYY YMMM MDDD DDTT TTTT TTTT THHH HHMM MMMM SSSS SSmm mmmm mmmm
+    # Bits: 5 unused - 12 Year - 4 Month - 5 Day - 11 Timezone - 5 Hour - 6 Minute - 6 Seconds - 10 Milliseconds
+    # .....YYYYYYYYYYYYMMMMDDDDDTTTTTTTTTTTHHHHHMMMMMMSSSSSSmmmmmmmmmm
+    if isinstance(timeStamp, np.ndarray):
+        timeStamp = timeStamp.astype(np.uint64)
+    Year = (timeStamp >> 47) & 0xFFF
+    Month = (timeStamp >> 43) & 0xF
+    Day = (timeStamp >> 38) & 0x1F
+    Timezone = (timeStamp >> 27) & 0x7FF
+    Hour = (timeStamp >> 22) & 0x1F
+    Minute = (timeStamp >> 16) & 0x3F
+    Seconds = (timeStamp >> 10) & 0x3F
+    Milliseconds = timeStamp & 0x3FF
+    return Year, Month, Day, Timezone, Hour, Minute, Seconds, Milliseconds
+
+
+def timeStampToMs(timeStamp):
+    """ Converts the bit field timestamp of a frame to milliseconds since 1970-01-01 (local device time).
+
+    The timezone field is ignored, so the values of different devices are comparable if their clocks use
+    the same timezone. Returns None for a timestamp which is not a valid date (e.g. device clock not set).
+    """
+    (Year, Month, Day, Timezone, Hour, Minute, Seconds, Milliseconds) = decodeTimeStamp(int(timeStamp))
+    if not (1 <= Month <= 12 and 1 <= Day <= 31):
+        return None
+    return calendar.timegm((Year, Month, Day, Hour, Minute, Seconds)) * 1000 + Milliseconds
@@ -20,7 +20,9 @@ import logging
 import time
 
 from common.Streaming.BinaryParser import BinaryParser
+from common.Streaming.ParserContext import ParserContext
 from common.Streaming.ParserHelper import CameraParameters
+from common.Streaming.StateMap import StateMap, isStatemapDevice
 from common.Streaming.XMLParser import XMLParser
 from common.UnitConversion import convertDistanceToMM
 
@@ -28,17 +30,23 @@ from common.UnitConversion import convertDistanceToMM
 class Data:
     """ Gathers methods to handle the raw data. """
 
-    def __init__(self, xmlParser=None, changedCounter=-1, depthmap=None, polarData=None, checksum='E'):
+    def __init__(self, xmlParser=None, changedCounter=-1, depthmap=None, polarData=None, checksum='E', parserContext=None):
+        """
+        parserContext: ParserContext which caches the parsed XML segment. Pass the same context for
+                       all frames of a device to skip XML parsing while the layout does not change.
+        """
         self.xmlParser = xmlParser
         self.changedCounter = changedCounter
+        self.parserContext = parserContext if parserContext is not None else ParserContext()
         self.depthmap = depthmap
         self.polarData2D = polarData
         self.checksum = checksum
         self.corrupted = False
+        self._stateMap = None
 
         self.parsing_time_s = 0
 
-    def read(self, dataBuffer, convertToMM = True):
+    def read(self, dataBuffer, convertToMM = True, asNumpy = False):
         """
         Extracts necessary data segments and triggers parsing of segments. 
         
@@ -48,6 +56,11 @@ class Data:
                        - Tenth millimeters for Visionary S
                        - Quarter millimeters for Visionary T Mini
                        - Millimeters for Visionary T
+        asNumpy:     If this is True, the depthmap channels are numpy arrays of shape (height, width) which share
+                     their memory with dataBuffer (no tuples, no copies of the binary segment).
+                     Together with convertToMM=False the distance is a view as well.
+                     If the layout is supported by the compiled decoder, the depthmap is a LazyDepthMap:
+                     a channel is only decoded when it is accessed, see also LazyDepthMap.roi().
         """
 
         parsing_start_time_s = time.time()
@@ -59,42 +72,42 @@ class Data:
         # TypeError: a bytes-like object is required, not 'str'
 
         # tempBuffer = dataBuffer[0:11]
-        tempBuffer = dataBuffer[0:11]
         (magicword, pkglength, protocolVersion, packetType) = \
-            struct.unpack('>IIHB', tempBuffer)
+            struct.unpack_from('>IIHB', dataBuffer, 0)
         assert (magicword == 0x02020202)
-        logging.debug("Package length: %s", pkglength)
-        logging.debug("Protocol version: %s", protocolVersion)  # expected to be == 1
-        logging.debug("Packet type: %s", packetType)  # expected to be  == 98
 
         # next four bytes an id (should equal 1) and
         # the number of segments (should be 3)
-        tempBuffer = dataBuffer[11:15]
-        (segid, numSegments) = struct.unpack('>HH', tempBuffer)
-        logging.debug("Blob ID: %s", segid)  # expected to be == 1
-        logging.debug("Number of segments: %s", numSegments)  # expected to be  == 3
+        (segid, numSegments) = struct.unpack_from('>HH', dataBuffer, 11)
 
         # offset and changedCounter, 4 bytes each per segment
-        offset = [None] * numSegments
-        changedCounter = [None] * numSegments
-        tempBuffer = dataBuffer[15:15 + numSegments * 2 * 4]
-        for i in range(numSegments):
-            index = i * 8
-            (offset[i], changedCounter[i]) = \
-                struct.unpack('>II', tempBuffer[index:index + 8])
-            offset[i] += 11
-        logging.debug("Offsets: %s", offset)  # offset in bytes for each segment
-        logging.debug("Changed counter: %s", changedCounter)  # counter for changes in the data
+        segmentTable = struct.unpack_from('>%uI' % (numSegments * 2), dataBuffer, 15)
+        offset = [segmentOffset + 11 for segmentOffset in segmentTable[0::2]]
+        changedCounter = list(segmentTable[1::2])
+
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Package length: %s", pkglength)
+            logging.debug("Protocol version: %s", protocolVersion)  # expected to be == 1
+            logging.debug("Packet type: %s", packetType)  # expected to be  == 98
+            logging.debug("Blob ID: %s", segid)  # expected to be == 1
+            logging.debug("Number of segments: %s", numSegments)  # expected to be  == 3
+            logging.debug("Offsets: %s", offset)  # offset in bytes for each segment
+            logging.debug("Changed counter: %s", changedCounter)  # counter for changes in the data
 
         # first segment describes the data format in XML
-        xmlSegment = dataBuffer[offset[0]:offset[1]]
+        # (a memoryview, the segment is only copied if it has to be parsed)
+        xmlSegment = memoryview(dataBuffer)[offset[0]:offset[1]]
         logging.debug("The whole XML segment:")
         logging.debug(xmlSegment)
         # second segment contains the binary data
-        binarySegment = dataBuffer[offset[1]:offset[2]]
+        if asNumpy:
+            # slicing a memoryview does not copy the frame
+            binarySegment = memoryview(dataBuffer)[offset[1]:offset[2]]
+        else:
+            binarySegment = dataBuffer[offset[1]:offset[2]]
 
         if (numSegments == 3):
-            overlaySegment = dataBuffer[offset[2]:pkglength+4+4] # numBytes(magicword) = 4, numBytes(pkglength) = 4
+            overlaySegment = memoryview(dataBuffer)[offset[2]:pkglength+4+4] # numBytes(magicword) = 4, numBytes(pkglength) = 4
             logging.debug("The whole overlay XML segment:")
             logging.debug(overlaySegment)
 
@@ -108,72 +121,43 @@ class Data:
 
         # parsing the XML in order to extract necessary image information
         # only parse if something has changed
-        if (self.changedCounter < changedCounter[0]):
-            logging.debug("XML did change, parsing started.")
-            myXMLParser = XMLParser()
-            myXMLParser.parse(xmlSegment)
-            self.xmlParser = myXMLParser
-            self.changedCounter = changedCounter[0]
-        else:
-            logging.debug("XML did not change, not parsing again.")
-            myXMLParser = self.xmlParser
+        layout = self.parserContext.getLayout(xmlSegment, changedCounter[0])
+        myXMLParser = layout.xmlParser
+        self.xmlParser = myXMLParser
+        self.changedCounter = changedCounter[0]
 
         myBinaryParser = BinaryParser()
 
         self.hasDepthMap = False
         self.hasPolar2D = False
         self.hasCartesian = False
+        self._stateMap = None
 
-        if myXMLParser.hasDepthMap:
+        if layout.hasDepthMap:
             logging.debug("Data contains depth map, reading camera params")
             self.hasDepthMap = True
-            self.cameraParams = \
-                CameraParameters(width=myXMLParser.imageWidth,
-                                 height=myXMLParser.imageHeight,
-                                 cam2worldMatrix=myXMLParser.cam2worldMatrix,
-                                 fx=myXMLParser.fx, fy=myXMLParser.fy,
-                                 cx=myXMLParser.cx, cy=myXMLParser.cy,
-                                 k1=myXMLParser.k1, k2=myXMLParser.k2,
-                                 f2rc=myXMLParser.f2rc)
-
-            # extracting data from the binary segment (distance, intensity
-            # and confidence).
-            if myXMLParser.stereo:
-                numBytesDistance = myXMLParser.imageHeight * \
-                                   myXMLParser.imageWidth * \
-                                   myXMLParser.numBytesPerZValue
-            else:
-                numBytesDistance = myXMLParser.imageHeight * \
-                                   myXMLParser.imageWidth * \
-                                   myXMLParser.numBytesPerDistanceValue
-            numBytesIntensity = myXMLParser.imageHeight * \
-                                myXMLParser.imageWidth * \
-                                myXMLParser.numBytesPerIntensityValue
-            numBytesConfidence = myXMLParser.imageHeight * \
-                                 myXMLParser.imageWidth * \
-                                 myXMLParser.numBytesPerConfidenceValue
-
-            try:
-                numBytesFrameNumber = myXMLParser.numBytesFrameNumber
-                numBytesQuality = myXMLParser.numBytesQuality
-                numBytesStatus = myXMLParser.numBytesStatus
-            except AttributeError:
-                numBytesFrameNumber = 0
-                numBytesQuality = 0
-                numBytesStatus = 0
+            self.cameraParams = layout.cameraParams
 
             logging.debug("Reading binary segment...")
-            myBinaryParser.getDepthMap(binarySegment,
-                                       numBytesFrameNumber,
-                                       numBytesQuality,
-                                       numBytesStatus,
-                                       numBytesDistance,
-                                       numBytesIntensity,
-                                       myXMLParser.numBytesPerIntensityValue,
-                                       numBytesConfidence)
+            # the compiled record layout decodes the depth map lazily, channel by channel on access
+            decodedLazily = asNumpy and layout.depthMapDtype is not None and \
+                myBinaryParser.getDepthMapRecord(binarySegment, layout.depthMapDtype,
+                                                 layout.distanceToMMFactor if convertToMM else None)
+            if not decodedLazily:
+                myBinaryParser.getDepthMap(binarySegment,
+                                           layout.numBytesFrameNumber,
+                                           layout.numBytesQuality,
+                                           layout.numBytesStatus,
+                                           layout.numBytesDistance,
+                                           layout.numBytesIntensity,
+                                           layout.numBytesPerIntensityValue,
+                                           layout.numBytesConfidence,
+                                           layout.imageWidth,
+                                           layout.imageHeight,
+                                           asNumpy)
             logging.debug("...done.")
 
-            if convertToMM:
+            if convertToMM and not decodedLazily:
                 myBinaryParser.depthmap.distance = convertDistanceToMM(myBinaryParser.depthmap.distance, myXMLParser)
             self.depthmap = myBinaryParser.depthmap
 
@@ -200,4 +184,12 @@ class Data:
 
         self.parsing_time_s = time.time() - parsing_start_time_s
 
-
+    @property
+    def stateMap(self):
+        """ StateMap (named validity masks) of the confidence channel of the depth map, None without depth map.
+            It is decoded on first access and cached with this frame, so all consumers share the masks.
+        """
+        if self._stateMap is None and getattr(self, 'hasDepthMap', False) and self.depthmap.confidence is not None:
+            self._stateMap = StateMap(self.depthmap.confidence, isStatemapDevice(self.xmlParser),
+                                      shape=(self.cameraParams.height, self.cameraParams.width))
+        return self._stateMap
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Long-lived parsing context of a streaming channel. The XML segment of a BLOB only
+                 changes when the device configuration changes, so the parsed XML, the camera
+                 parameters and the byte layout of the binary segment are cached across frames.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import logging
+import zlib
+
+import numpy as np
+
+from common.Streaming.BinaryParser import compileDepthMapDtype
+from common.Streaming.ParserHelper import CameraParameters
+from common.Streaming.XMLParser import XMLParser
+from common.UnitConversion import getDistanceToMMFactor
+
+
+class FrameLayout:
+    """ Everything that is derived from one XML segment. """
+
+    def __init__(self, xmlParser):
+        self.xmlParser = xmlParser
+        self.hasDepthMap = xmlParser.hasDepthMap
+        self.cameraParams = None
+        self.depthMapDtype = None
+
+        if not xmlParser.hasDepthMap:
+            return
+
+        self.imageWidth = xmlParser.imageWidth
+        self.imageHeight = xmlParser.imageHeight
+        self.cameraParams = \
+            CameraParameters(width=xmlParser.imageWidth,
+                             height=xmlParser.imageHeight,
+                             cam2worldMatrix=xmlParser.cam2worldMatrix,
+                             fx=xmlParser.fx, fy=xmlParser.fy,
+                             cx=xmlParser.cx, cy=xmlParser.cy,
+                             k1=xmlParser.k1, k2=xmlParser.k2,
+                             f2rc=xmlParser.f2rc)
+
+        numPixels = xmlParser.imageHeight * xmlParser.imageWidth
+        if xmlParser.stereo:
+            self.numBytesDistance = numPixels * xmlParser.numBytesPerZValue
+        else:
+            self.numBytesDistance = numPixels * xmlParser.numBytesPerDistanceValue
+        self.numBytesPerIntensityValue = xmlParser.numBytesPerIntensityValue
+        self.numBytesIntensity = numPixels * xmlParser.numBytesPerIntensityValue
+        self.numBytesConfidence = numPixels * xmlParser.numBytesPerConfidenceValue
+
+        self.numBytesFrameNumber = getattr(xmlParser, 'numBytesFrameNumber', 0)
+        self.numBytesQuality = getattr(xmlParser, 'numBytesQuality', 0)
+        self.numBytesStatus = getattr(xmlParser, 'numBytesStatus', 0)
+        self.distanceToMMFactor = getDistanceToMMFactor(xmlParser)
+
+        # structured dtype of one depth map record, compiled once per layout
+        self.depthMapDtype = compileDepthMapDtype(self.numBytesFrameNumber,
+                                                  self.numBytesQuality,
+                                                  self.numBytesStatus,
+                                                  self.numBytesDistance,
+                                                  self.numBytesIntensity,
+                                                  self.numBytesPerIntensityValue,
+                                                  self.numBytesConfidence,
+                                                  self.imageWidth,
+                                                  self.imageHeight)
+
+    def decodeRecords(self, buffer, count=-1, offset=0):
+        """ Decodes depth map records stored back to back in buffer with a single np.frombuffer().
+
+        buffer: e.g. the binary segment of a frame or the binary file of an SSR recording
+        count:  number of records to decode, -1 for all records in the buffer
+        Returns a structured array (no copy), e.g. records['distance'] has shape (count, height, width).
+        """
+        if self.depthMapDtype is None:
+            raise RuntimeError("The layout of this depth map is not supported by the compiled decoder.")
+        return np.frombuffer(buffer, dtype=self.depthMapDtype, count=count, offset=offset)
+
+
+class ParserContext:
+    """ Caches the FrameLayout of a streaming channel.
+
+    The layout is keyed on the changed counter of the XML segment. If the counter differs (e.g. after
+    a restart of the device) a hash of the XML bytes decides whether the XML has to be parsed again.
+    Use one context per device; a context must not be shared between devices.
+    """
+
+    def __init__(self):
+        self.layout = None
+        self.changedCounter = None
+        self.xmlHash = None
+        self.parseCount = 0
+
+    def getLayout(self, xmlSegment, changedCounter):
+        """ Returns the FrameLayout of the XML segment, parsing it only if it has changed. """
+        if self.layout is not None and changedCounter == self.changedCounter:
+            return self.layout
+
+        xmlHash = zlib.crc32(xmlSegment)
+        if self.layout is not None and xmlHash == self.xmlHash:
+            logging.debug("Changed counter is now %s, but the XML is unchanged.", changedCounter)
+            self.changedCounter = changedCounter
+            return self.layout
+
+        logging.debug("XML did change, parsing started.")
+        myXMLParser = XMLParser()
+        myXMLParser.parse(bytes(xmlSegment))
+        self.layout = FrameLayout(myXMLParser)
+        self.changedCounter = changedCounter
+        self.xmlHash = xmlHash
+        self.parseCount += 1
+        return self.layout
+
+    def reset(self):
+        """ Forgets the cached layout, the next frame is parsed again. """
+        self.layout = None
+        self.changedCounter = None
+        self.xmlHash = None
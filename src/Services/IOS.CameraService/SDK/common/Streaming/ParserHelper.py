@@ -15,6 +15,9 @@ CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTH
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import numpy as np
+
+
 class DepthMap:
     """ This class contains the depth map data """
 
@@ -28,6 +31,88 @@ class DepthMap:
         self.timestamp = timestamp
 
 
+def _channelProperty(name):
+    """ Property of a depth map channel which is decoded on first access """
+    return property(lambda self: self._channel(name),
+                    lambda self, value: self._setChannel(name, value))
+
+
+class LazyDepthMap(DepthMap):
+    """ Depth map which keeps the raw depth map record and decodes a channel on its first access.
+
+    The channels are numpy views on the record (see compileDepthMapDtype), so only the channels
+    that are actually read are converted. With roi() a window of the image can be requested;
+    only the (strided) bytes of the window are materialized when a channel is converted.
+    """
+
+    CHANNELS = ('distance', 'intensity', 'confidence')
+
+    def __init__(self, record, frameNumber, dataQuality, deviceStatus, timestamp,
+                 distanceFactor=None, rows=None, cols=None):
+        """
+        record:         structured array of one depth map record, see compileDepthMapDtype
+        distanceFactor: factor to convert the distance to millimeters, None to keep raw device values
+        rows, cols:     slices of the window in image coordinates, None for the full image
+        """
+        self._record = record
+        self._distanceFactor = distanceFactor
+        self._rows = rows if rows is not None else slice(None)
+        self._cols = cols if cols is not None else slice(None)
+        self._decoded = {}
+        self.frameNumber = frameNumber
+        self.dataQuality = dataQuality
+        self.deviceStatus = deviceStatus
+        self.timestamp = timestamp
+
+    def _channel(self, name):
+        if name not in self._decoded:
+            if name in self._record.dtype.names:
+                data = self._record[name][0][self._rows, self._cols]
+                if name == 'distance' and self._distanceFactor is not None:
+                    data = np.multiply(data, self._distanceFactor)
+            else:
+                data = np.empty(0, dtype='<u2')
+            self._decoded[name] = data
+        return self._decoded[name]
+
+    def _setChannel(self, name, value):
+        self._decoded[name] = value
+
+    distance = _channelProperty('distance')
+    intensity = _channelProperty('intensity')
+    confidence = _channelProperty('confidence')
+
+    @property
+    def window(self):
+        """ (rows, cols) slices of this depth map in image coordinates """
+        height, width = self._record[self.CHANNELS[0]].shape[1:3]
+        return (slice(*self._rows.indices(height)), slice(*self._cols.indices(width)))
+
+    def isDecoded(self, name):
+        """ True if the channel has already been accessed """
+        return name in self._decoded
+
+    def roi(self, rows=slice(None), cols=slice(None)):
+        """ Returns a depth map restricted to the window rows x cols (slices relative to this depth map).
+
+        Nothing is decoded here; the channels of the window are views on the same record.
+        """
+        parentRows, parentCols = self.window
+        return LazyDepthMap(self._record, self.frameNumber, self.dataQuality, self.deviceStatus, self.timestamp,
+                            self._distanceFactor,
+                            _composeSlices(parentRows, rows),
+                            _composeSlices(parentCols, cols))
+
+
+def _composeSlices(outer, inner):
+    """ Returns the slice in image coordinates of inner, which is relative to the (normalized) slice outer. """
+    start, end, step = inner.indices(len(range(outer.start, outer.stop, outer.step)))
+    if step < 0:
+        raise ValueError("Negative steps are not supported for a depth map window")
+    indices = range(outer.start, outer.stop, outer.step)[start:end:step]
+    return slice(indices.start, indices.stop, indices.step)
+
+
 class Polar2DData:
     """ This class contains the polar 2D data """
 
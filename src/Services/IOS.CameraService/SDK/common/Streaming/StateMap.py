@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Decodes the 16 bit statemap / confidence channel of a depth map into named boolean masks with
+                 vectorized bit operations. The masks are decoded on first use and cached, see Data.stateMap.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import collections
+
+import numpy as np
+
+# statemap bits (Visionary-T Mini, Visionary-S): a set bit marks the pixel as removed by the filter
+STATE_BITS = collections.OrderedDict([
+    ('isolatedPixel', 1 << 7),
+    ('remissionLow', 1 << 8),
+    ('remissionHigh', 1 << 9),
+    ('distanceLow', 1 << 10),
+    ('distanceHigh', 1 << 11),
+    ('ambiguityFiltered', 1 << 12),
+    ('intensityLow', 1 << 13),
+    ('intensityHigh', 1 << 14),
+    ('saturated', 1 << 15),
+])
+
+# masks combining several bits
+MASK_BITS = collections.OrderedDict(STATE_BITS)
+MASK_BITS['remissionFiltered'] = STATE_BITS['remissionLow'] | STATE_BITS['remissionHigh']
+MASK_BITS['distanceFiltered'] = STATE_BITS['distanceLow'] | STATE_BITS['distanceHigh']
+MASK_BITS['intensityFiltered'] = STATE_BITS['intensityLow'] | STATE_BITS['intensityHigh']
+# any state bit set: the pixel is not valid
+MASK_BITS['invalid'] = 0xFFFF
+
+
+class StateMap:
+    """ Named boolean masks of the statemap or confidence channel of one depth map.
+
+    For devices with a statemap (Visionary-T Mini, Visionary-S) a pixel is valid if no bit is set and the
+    masks of MASK_BITS are available. For devices with a confidence value (Visionary-T) only 'valid' and
+    'invalid' are available: a pixel is valid if its confidence is at least minConfidence.
+
+    Each mask is computed on its first access and cached, so all consumers of a frame share it.
+    Pixels found by later processing steps (e.g. flying pixels) are added with addInvalidMask() and are
+    invalid from then on.
+    """
+
+    def __init__(self, confidence, isStatemap=True, minConfidence=1, shape=None):
+        """
+        confidence:    the confidence channel of the depth map (array, tuple or list)
+        isStatemap:    True if the channel is a statemap, False if it is a confidence value
+        minConfidence: smallest valid confidence value if the channel is not a statemap
+        shape:         (height, width) of the masks if the channel is flat
+        """
+        confidence = np.asarray(confidence)
+        if shape is not None:
+            confidence = confidence.reshape(shape)
+        if confidence.dtype != np.uint16:
+            confidence = confidence.astype(np.uint16)
+        self.confidence = confidence
+        self.isStatemap = isStatemap
+        self.minConfidence = minConfidence
+        self._masks = {}
+        self._invalidMasks = collections.OrderedDict()  # masks added by addInvalidMask()
+
+    @property
+    def names(self):
+        """ Names of the available masks """
+        if self.isStatemap:
+            return list(MASK_BITS) + ['valid'] + list(self._invalidMasks)
+        return ['valid', 'invalid'] + list(self._invalidMasks)
+
+    def mask(self, name):
+        """ Returns the (cached) bool mask of the given name, KeyError for unknown masks """
+        mask = self._masks.get(name)
+        if mask is None:
+            mask = self._decode(name)
+            self._masks[name] = mask
+        return mask
+
+    __getitem__ = mask
+
+    def _decode(self, name):
+        if name == 'valid':
+            if self.isStatemap:
+                valid = self.confidence == 0
+            else:
+                valid = self.confidence >= self.minConfidence
+            for mask in self._invalidMasks.values():
+                valid &= ~mask
+            return valid
+        if name in self._invalidMasks:
+            return self._invalidMasks[name]
+        if name == 'invalid':
+            return ~self.mask('valid')
+        if not self.isStatemap:
+            raise KeyError("Mask {} is only available for a statemap".format(name))
+        return (self.confidence & MASK_BITS[name]) != 0
+
+    @property
+    def valid(self):
+        return self.mask('valid')
+
+    @property
+    def invalid(self):
+        return self.mask('invalid')
+
+    def anyOf(self, *names):
+        """ Returns the pixels which are set in at least one of the named masks (not cached) """
+        if self.isStatemap and all(name in MASK_BITS and name != 'invalid' for name in names):
+            bits = 0
+            for name in names:
+                bits |= MASK_BITS[name]
+            return (self.confidence & bits) != 0
+        result = np.zeros(self.confidence.shape, dtype=bool)
+        for name in names:
+            result |= self.mask(name)
+        return result
+
+    def addInvalidMask(self, name, mask):
+        """ Adds the named (height, width) bool mask of pixels which are invalid in addition to the channel """
+        mask = np.asarray(mask, dtype=bool).reshape(self.confidence.shape)
+        self._invalidMasks[name] = mask
+        self._masks[name] = mask
+        # valid and invalid include the new mask
+        self._masks.pop('valid', None)
+        self._masks.pop('invalid', None)
+
+    def copy(self):
+        """ Returns a StateMap with its own copy of the channel, which stays valid when the frame buffer the
+            channel is a view of is reused; the masks decoded so far are shared
+        """
+        state = StateMap(np.array(self.confidence, copy=True), self.isStatemap, self.minConfidence)
+        state._masks = dict(self._masks)
+        state._invalidMasks = collections.OrderedDict(self._invalidMasks)
+        return state
+
+    def counts(self):
+        """ Returns the number of pixels per available mask, e.g. for statistics of the filter settings """
+        return collections.OrderedDict((name, int(np.count_nonzero(self.mask(name)))) for name in self.names)
+
+
+def isStatemapDevice(xmlParser):
+    """ True if the confidence channel of the device is a statemap (Visionary-T Mini and Visionary-S) """
+    return bool(getattr(xmlParser, 'stereo', False) or getattr(xmlParser, 'tofmini', False))
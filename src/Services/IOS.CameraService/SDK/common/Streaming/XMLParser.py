@@ -16,7 +16,7 @@ FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 """
 
 import logging
-from xml.etree import cElementTree as ET
+import xml.etree.ElementTree as ET
 
 
 class XMLParser:
@@ -7,6 +7,18 @@ def convertDistanceToMM(data, xmlParser):
     xmlParser: XML parser which has parsed the corresponding xml segment
     """
 
+    conversionFactor = getDistanceToMMFactor(xmlParser)
+
+    logging.debug("Converting depth map to millimeters (multiplying with factor {}).".format(conversionFactor))
+    return np.multiply(data, conversionFactor)
+
+def getDistanceToMMFactor(xmlParser):
+    """
+    Returns the factor which converts the raw distance data of the device to millimeters.
+
+    xmlParser: XML parser which has parsed the corresponding xml segment
+    """
+
     # Raw output of the devices (before applying exponent)
     #
     # Visionary S (default mode):   Tenth mm
@@ -17,6 +29,4 @@ def convertDistanceToMM(data, xmlParser):
     conversionFactor = 10**xmlParser.decimalExponentDistance
     if xmlParser.tofmini:
         conversionFactor /= 4.0
-
-    logging.debug("Converting depth map to millimeters (multiplying with factor {}).".format(conversionFactor))
-    return np.multiply(data, conversionFactor)
+    return conversionFactor
@@ -20,6 +20,8 @@ import os.path
 import numpy as np
 from skimage import io
 
+from common.Streaming.StateMap import StateMap
+
 def saveDepthToPng(path, distData, intsData, cnfiData, camParams, frameNo, isStereo):
     numRows = camParams.height
     numCols = camParams.width
@@ -50,10 +52,7 @@ def saveDepthToPng(path, distData, intsData, cnfiData, camParams, frameNo, isSte
 
         # Apply the Statemap to the Z-map
         zmapData_with_statemap = zmapDataArray.copy()
-        for i in range(0, numRows):
-            for j in range(0, numCols):
-                if (statemapDataArray[i][j] != 0):
-                    zmapData_with_statemap[i][j] = 0 # Set unvalid pixels to lowest value
+        zmapData_with_statemap[StateMap(statemapDataArray).invalid] = 0 # Set unvalid pixels to lowest value
 
         # Save RGBA image with applied statemap as *.png-file
         io.imsave(os.path.join(path, "z_map_image_with_applied_statemap{}.png".format(frameNo)), zmapData_with_statemap, check_contrast=False)
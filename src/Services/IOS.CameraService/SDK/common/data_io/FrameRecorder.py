@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Records the raw BLOB frames of a streaming channel into segmented capture files with an index
+                 (offset, length, frame number, device timestamp, receive time) and reads them back via mmap.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import collections
+import glob
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BLOB_HEAD_LEN = 11
+
+# one index entry per frame, the index file is an array of these entries
+INDEX_DTYPE = np.dtype([('offset', '<u8'),
+                        ('length', '<u4'),
+                        ('frameNumber', '<u4'),
+                        ('deviceTimestamp', '<u8'),
+                        ('receiveTime', '<f8')])
+
+SEGMENT_SUFFIX = '.blob'
+INDEX_SUFFIX = '.idx'
+
+
+def frameInfo(frame):
+    """ Returns (frameNumber, deviceTimestamp) from the depth map record of a BLOB frame.
+        The frame number is 0 for the old record format and for frames without depth map.
+    """
+    try:
+        numSegments, = struct.unpack_from('>H', frame, BLOB_HEAD_LEN + 2)
+        if numSegments < 2:
+            return 0, 0
+        binaryOffset, = struct.unpack_from('>I', frame, BLOB_HEAD_LEN + 4 + 8)
+        binaryOffset += BLOB_HEAD_LEN
+        timestamp, version = struct.unpack_from('<QH', frame, binaryOffset + 4)
+        frameNumber = struct.unpack_from('<I', frame, binaryOffset + 14)[0] if version == 2 else 0
+        return frameNumber, timestamp
+    except struct.error:
+        return 0, 0
+
+
+class FrameRecorder:
+    """ Appends raw frames to segment files on a background thread.
+
+    record() only copies the frame into a bounded queue, so recording never stalls the acquisition:
+    if the disk cannot keep up, frames are dropped (droppedFrames). A segment is closed when it reaches
+    segmentSize bytes; when all segments in the directory exceed diskBudget bytes the oldest segments
+    are deleted (ring policy). Use FrameCaptureReader to read the capture.
+
+    Attach the recorder to a stream with Streaming.setRecorder() to record every received frame.
+    """
+
+    def __init__(self, directory, prefix='capture', segmentSize=256 * 1024 * 1024, diskBudget=2 * 1024 * 1024 * 1024,
+                 queueSize=32):
+        """
+        directory:   directory of the capture files, created if necessary
+        prefix:      file name prefix, the segments are named <prefix>_<number>.blob/.idx
+        segmentSize: size in bytes after which a new segment is started
+        diskBudget:  maximal size in bytes of all segments with this prefix
+        queueSize:   number of frames waiting to be written
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.segmentSize = segmentSize
+        self.diskBudget = diskBudget
+        self._queue = queue.Queue(queueSize)
+        self._thread = None
+        self._segmentFile = None
+        self._indexFile = None
+        self._segmentLength = 0
+        self._segments = collections.deque()  # (segment path, index path, size) of the segments on disk
+        self.recordedFrames = 0
+        self.droppedFrames = 0
+        self.deletedSegments = 0
+        self.bytesWritten = 0
+
+        os.makedirs(directory, exist_ok=True)
+        for segmentPath in listSegments(directory, prefix):
+            self._segments.append((segmentPath, segmentPath[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX,
+                                   os.path.getsize(segmentPath)))
+        self._nextSegmentNumber = _segmentNumber(self._segments[-1][0]) + 1 if self._segments else 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._writeLoop, name="FrameRecorder", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """ Writes the queued frames and closes the files """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record(self, frame, receiveTime):
+        """ Queues a copy of the frame; returns False if the frame was dropped because the queue is full """
+        try:
+            self._queue.put_nowait((bytes(frame), receiveTime))
+            return True
+        except queue.Full:
+            self.droppedFrames += 1
+            return False
+
+    def _writeLoop(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                try:
+                    self._write(*item)
+                except OSError as err:
+                    logger.error("Writing frame to capture failed: %s" % err)
+                    self.droppedFrames += 1
+                    self._closeSegment()
+        finally:
+            self._closeSegment()
+
+    def _write(self, frame, receiveTime):
+        if self._segmentFile is None or self._segmentLength + len(frame) > self.segmentSize and self._segmentLength:
+            self._openSegment()
+        entry = np.zeros(1, dtype=INDEX_DTYPE)
+        entry['offset'] = self._segmentLength
+        entry['length'] = len(frame)
+        entry['frameNumber'], entry['deviceTimestamp'] = frameInfo(frame)
+        entry['receiveTime'] = receiveTime if receiveTime is not None else 0.0
+        self._segmentFile.write(frame)
+        # the index entry is written after the frame, so every indexed frame is complete on disk
+        self._indexFile.write(entry.tobytes())
+        self._indexFile.flush()
+        self._segmentLength += len(frame)
+        self.bytesWritten += len(frame)
+        self.recordedFrames += 1
+
+    def _openSegment(self):
+        self._closeSegment()
+        base = os.path.join(self.directory, '{}_{:06d}'.format(self.prefix, self._nextSegmentNumber))
+        self._nextSegmentNumber += 1
+        # unbuffered: a frame is written with a single system call
+        self._segmentFile = open(base + SEGMENT_SUFFIX, 'wb', buffering=0)
+        self._indexFile = open(base + INDEX_SUFFIX, 'wb')
+        self._segmentLength = 0
+        self._segments.append((base + SEGMENT_SUFFIX, base + INDEX_SUFFIX, 0))
+        logger.info("Recording to %s" % (base + SEGMENT_SUFFIX))
+        self._enforceBudget()
+
+    def _closeSegment(self):
+        if self._segmentFile is None:
+            return
+        self._segmentFile.close()
+        self._indexFile.close()
+        self._segmentFile = None
+        self._indexFile = None
+        segmentPath, indexPath, _ = self._segments.pop()
+        self._segments.append((segmentPath, indexPath, self._segmentLength))
+
+    def _enforceBudget(self):
+        """ Deletes the oldest closed segments until the budget leaves room for a full new segment """
+        used = sum(size for _, _, size in self._segments)
+        while len(self._segments) > 1 and used + self.segmentSize > self.diskBudget:
+            segmentPath, indexPath, size = self._segments.popleft()
+            for path in (segmentPath, indexPath):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            used -= size
+            self.deletedSegments += 1
+            logger.info("Disk budget reached, deleted %s" % segmentPath)
+
+
+class FrameCaptureReader:
+    """ Reads a capture written by FrameRecorder.
+
+    The segments are memory-mapped, reader[i] returns a memoryview of the i-th frame which can be passed to
+    Data.read() without copying. A segment can not be unmapped while such a view (or an array decoded from it)
+    is alive, close() leaves it to the last of them, see close().
+    """
+
+    def __init__(self, directory, prefix='capture'):
+        self._files = []
+        self._maps = []
+        indexes = []
+        for segmentNumber, segmentPath in enumerate(listSegments(directory, prefix)):
+            indexPath = segmentPath[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+            if not os.path.exists(indexPath) or os.path.getsize(segmentPath) == 0:
+                continue
+            with open(indexPath, 'rb') as indexFile:
+                indexData = indexFile.read()
+            # an entry written while the recorder is still running may not be complete yet
+            index = np.frombuffer(indexData, dtype=INDEX_DTYPE, count=len(indexData) // INDEX_DTYPE.itemsize)
+            segmentFile = open(segmentPath, 'rb')
+            self._files.append(segmentFile)
+            self._maps.append(mmap.mmap(segmentFile.fileno(), 0, access=mmap.ACCESS_READ))
+            segment = np.full(len(index), len(self._maps) - 1, dtype='<u4')
+            indexes.append((index, segment))
+        if indexes:
+            self.index = np.concatenate([index for index, _ in indexes])
+            self._segmentOfFrame = np.concatenate([segment for _, segment in indexes])
+        else:
+            self.index = np.zeros(0, dtype=INDEX_DTYPE)
+            self._segmentOfFrame = np.zeros(0, dtype='<u4')
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        entry = self.index[i]
+        offset = int(entry['offset'])
+        return memoryview(self._maps[self._segmentOfFrame[i]])[offset:offset + int(entry['length'])]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def findFrameNumber(self, frameNumber):
+        """ Returns the position of the frame with this frame number or None """
+        positions = np.flatnonzero(self.index['frameNumber'] == frameNumber)
+        return int(positions[0]) if len(positions) else None
+
+    def close(self):
+        """ Closes the segment files and unmaps the segments. A segment still referenced by a frame view is
+            unmapped when the last view is released (mmap raises BufferError on close() while views exist),
+            so the views stay valid; release them to free the mapping early.
+        """
+        for segmentMap in self._maps:
+            try:
+                segmentMap.close()
+            except BufferError:
+                # the views refer to the map, it is unmapped with the last of them
+                pass
+        for segmentFile in self._files:
+            segmentFile.close()
+        self._maps = []
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def listSegments(directory, prefix='capture'):
+    """ Returns the segment files of a capture, oldest first """
+    return sorted(glob.glob(os.path.join(directory, glob.escape(prefix) + '_*' + SEGMENT_SUFFIX)), key=_segmentNumber)
+
+
+def _segmentNumber(segmentPath):
+    name = os.path.basename(segmentPath)[:-len(SEGMENT_SUFFIX)]
+    try:
+        return int(name.rsplit('_', 1)[1])
+    except (IndexError, ValueError):
+        return -1
@@ -15,12 +15,15 @@ CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTH
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import io
 import numpy as np
 import zipfile
 from struct import unpack_from
 from struct import calcsize
+from struct import pack
 import logging
 from common.Streaming import Data
+from common.Streaming.ParserContext import FrameLayout
 from common.UnitConversion import convertDistanceToMM
 
 tmpDir = "temp_folder"
@@ -36,6 +39,84 @@ def readSsrData(filename, startFrame, nFrames, convertToMM = True):
                     - Millimeters for Visionary T
     """
 
+    archive, myXMLParser, myCamParams = _openSsr(filename)
+    startFrame, nFrames = _checkFrameRange(myXMLParser, startFrame, nFrames)
+    file, ssrFixup, skipLength = _openSsrBinary(archive, myXMLParser)
+
+    # forward to start frame
+    distData = []
+    intsData = []
+    cnfiData = []
+    cnfiAvailable = _ssrConfidenceType(myXMLParser) != None
+
+    # skip frames
+    logging.debug("Skipping first %u frames, each has a length of %u bytes:", startFrame, skipLength)
+    file.read(skipLength * startFrame)
+
+    layout = FrameLayout(myXMLParser)
+    if not ssrFixup and layout.depthMapDtype is not None and layout.depthMapDtype.itemsize == skipLength:
+        # TOF: the frames are stored as depth map records, decode all of them in one call
+        binFrames = file.read(skipLength * nFrames)
+        records = layout.decodeRecords(binFrames, count=nFrames)
+        hasFormat2 = 'frameNumber' in layout.depthMapDtype.names
+        if np.all((records['version'] == 2) == hasFormat2):
+            nFrames = 0  # nothing left for the frame by frame loop below
+            distData = list(records['distance'])
+            intsData = list(records['intensity'])
+            if cnfiAvailable and 'confidence' in layout.depthMapDtype.names:
+                cnfiData = list(records['confidence'])
+            else:
+                cnfiData = None
+        else:
+            logging.debug("Frame versions differ from the xml description, reading frame by frame")
+            file.close()
+            file = io.BytesIO(binFrames)
+
+    for i in range(0, nFrames, 1):
+        logging.debug("Start reading frame: %d", i)
+        dist, ints, cnfi = _readSsrFrame(file, myXMLParser, myCamParams, ssrFixup)
+        distData.append(dist)
+        intsData.append(ints)
+        if cnfiAvailable:
+            cnfiData.append(cnfi)
+        else:
+            cnfiData = None
+
+    file.close()
+
+    if convertToMM:
+        distData = convertDistanceToMM(distData, myXMLParser)
+
+    return distData, intsData, cnfiData, myCamParams, myXMLParser.stereo
+
+
+def iterSsrData(filename, startFrame=0, nFrames=0, convertToMM=True):
+    """
+    Generator version of readSsrData: yields (distData, intsData, cnfiData, myCamParams, isStereo) for one frame
+    at a time, so only one frame of the recording is held in memory. The arguments are the same as for readSsrData.
+    """
+    archive, myXMLParser, myCamParams = _openSsr(filename)
+    startFrame, nFrames = _checkFrameRange(myXMLParser, startFrame, nFrames)
+    file, ssrFixup, skipLength = _openSsrBinary(archive, myXMLParser)
+    cnfiAvailable = _ssrConfidenceType(myXMLParser) != None
+    try:
+        # skip frames without reading them into memory at once
+        remaining = skipLength * startFrame
+        while remaining > 0:
+            remaining -= len(file.read(min(remaining, 1 << 20)))
+
+        for i in range(nFrames):
+            dist, ints, cnfi = _readSsrFrame(file, myXMLParser, myCamParams, ssrFixup)
+            if convertToMM:
+                dist = convertDistanceToMM(dist, myXMLParser)
+            yield dist, ints, cnfi if cnfiAvailable else None, myCamParams, myXMLParser.stereo
+    finally:
+        file.close()
+        archive.close()
+
+
+def _openSsr(filename):
+    """ Opens the SSR archive and parses its xml description; returns (archive, xml parser, camera parameters) """
     archive = zipfile.ZipFile(filename, 'r')
 
     xmlFile = archive.read('main.xml')
@@ -52,36 +133,11 @@ def readSsrData(filename, startFrame, nFrames, convertToMM = True):
                                  cx=myXMLParser.cx, cy=myXMLParser.cy,
                                  k1=myXMLParser.k1, k2=myXMLParser.k2,
                                  f2rc=myXMLParser.f2rc)
+    return archive, myXMLParser, myCamParams
 
-    # extracting data from the binary segment (distance, intensity
-    # and confidence).
-    numBytesDistance = myXMLParser.imageHeight * \
-                       myXMLParser.imageWidth * \
-                       myXMLParser.numBytesPerDistanceValue
-    numBytesIntensity = myXMLParser.imageHeight * \
-                        myXMLParser.imageWidth * \
-                        myXMLParser.numBytesPerIntensityValue
-    numBytesConfidence = myXMLParser.imageHeight * \
-                         myXMLParser.imageWidth * \
-                         myXMLParser.numBytesPerConfidenceValue
-
-    try:
-        numBytesFrameNumber = myXMLParser.numBytesFrameNumber
-        numBytesQuality = myXMLParser.numBytesQuality
-        numBytesStatus = myXMLParser.numBytesStatus
-    except AttributeError:
-        numBytesFrameNumber = 0
-        numBytesQuality = 0
-        numBytesStatus = 0
 
+def _checkFrameRange(myXMLParser, startFrame, nFrames):
     availableFrames = myXMLParser.availableFrames
-    distType = myXMLParser.distType
-    intsType = myXMLParser.intsType
-    try:
-        cnfiType = myXMLParser.confType
-    except AttributeError:
-        cnfiType = None
-
     if startFrame < 0 or startFrame >= availableFrames:
         logging.warning("Requested to read SSR file starting at frame %d. File only contains frame 0 to %d. Starting to read at frame 0 instead.", startFrame, availableFrames-1)
         startFrame = 0
@@ -89,23 +145,27 @@ def readSsrData(filename, startFrame, nFrames, convertToMM = True):
         logging.warning("Requested to read %d frames, starting at frame %d, which is invalid. Reading all remaining frames instead (frame %d to %d).", 
             nFrames, startFrame, startFrame, availableFrames-1)
         nFrames = availableFrames - startFrame
+    return startFrame, nFrames
 
-    #myBinaryParser = Data.BinaryParser() # TODO: use the same binary parser
-    binFileName = myXMLParser.binFileName
-    logging.debug("Binary file name: %s", binFileName)
 
-    file = archive.open('data/'+binFileName,'r')
+def _ssrConfidenceType(myXMLParser):
+    try:
+        return myXMLParser.confType
+    except AttributeError:
+        return None
 
-    # forward to start frame
-    distData = []
-    intsData = []
-    cnfiData = []
 
-    nRows = myCamParams.height
-    nCols = myCamParams.width
+def _openSsrBinary(archive, myXMLParser):
+    """ Opens the binary file of the archive; returns (file, ssrFixup, skipLength) with the file positioned at
+        the first frame
+    """
+    #myBinaryParser = Data.BinaryParser() # TODO: use the same binary parser
+    binFileName = myXMLParser.binFileName
+    logging.debug("Binary file name: %s", binFileName)
 
     logging.info("Reading binary segment...")
 
+    file = archive.open('data/'+binFileName,'r')
     binFrameLength = unpack_from("<I",file.read(4))[0]
     # emulate rewind(), repeat open()
     file.close()
@@ -119,57 +179,123 @@ def readSsrData(filename, startFrame, nFrames, convertToMM = True):
     skipLength = binFrameLength + 4 # 4 bytes length (head)
 
     if ssrFixup:
-        skipLength = int(binFrameLength / availableFrames)
-
-    # skip frames
-    logging.debug("Skipping first %u frames, each has a length of %u bytes:", startFrame, skipLength)
-
-    if ssrFixup:
+        skipLength = int(binFrameLength / myXMLParser.availableFrames)
         file.read(4) # skip length before first frame
 
-    file.read(skipLength * startFrame)
+    return file, ssrFixup, skipLength
 
-    for i in range(0, nFrames, 1):
-        logging.debug("Start reading frame: %d", i)
 
-        if not ssrFixup:
-            # TOF: skip framelength
-            unpack_from("<I",file.read(4))
-
-        timestamp = unpack_from("<Q",file.read(8))
-        version   = unpack_from("<H",file.read(2))
-        #data.logTimeStamp(timeStamp)
-        logging.debug("Format version: %s", version[0])
-
-        if version[0] == 2:
-            assert numBytesFrameNumber == 4
-            assert numBytesQuality == 1
-            assert numBytesStatus == 1
-            format2BlockSize = calcsize('<IBB')
-            (frameNumber, quality, status) = unpack_from('<IBB', file.read(format2BlockSize))
-            logging.debug("FrameNumber: %s", frameNumber)
-            logging.debug("Data quality: %s", quality)
-            logging.debug("Device status: %s", status)
-
-        buffer_dist = file.read(numBytesDistance)
-        buffer_ints = file.read(numBytesIntensity)
-        buffer_cnfi = file.read(numBytesConfidence)
-
-        distData.append(np.reshape(np.frombuffer(buffer_dist, distType), (nRows, nCols)))
-        intsData.append(np.reshape(np.frombuffer(buffer_ints, intsType), (nRows, nCols)))
-        if cnfiType != None:
-            cnfiData.append(np.reshape(np.frombuffer(buffer_cnfi, cnfiType), (nRows, nCols)))
-        else:
-            cnfiData = None
+def _readSsrFrame(file, myXMLParser, myCamParams, ssrFixup):
+    """ Reads the next frame of the binary file; returns (distData, intsData, cnfiData) as image shaped arrays """
+    try:
+        numBytesFrameNumber = myXMLParser.numBytesFrameNumber
+        numBytesQuality = myXMLParser.numBytesQuality
+        numBytesStatus = myXMLParser.numBytesStatus
+    except AttributeError:
+        numBytesFrameNumber = 0
+        numBytesQuality = 0
+        numBytesStatus = 0
 
-        if not ssrFixup:
-            # TOF: skip crc and framelength
-            unpack_from("<I",file.read(4))
-            unpack_from("<I",file.read(4))
+    nRows = myCamParams.height
+    nCols = myCamParams.width
+    numBytesDistance = nRows * nCols * myXMLParser.numBytesPerDistanceValue
+    numBytesIntensity = nRows * nCols * myXMLParser.numBytesPerIntensityValue
+    numBytesConfidence = nRows * nCols * myXMLParser.numBytesPerConfidenceValue
+    cnfiType = _ssrConfidenceType(myXMLParser)
+
+    if not ssrFixup:
+        # TOF: skip framelength
+        unpack_from("<I",file.read(4))
+
+    timestamp = unpack_from("<Q",file.read(8))
+    version   = unpack_from("<H",file.read(2))
+    #data.logTimeStamp(timeStamp)
+    logging.debug("Format version: %s", version[0])
+
+    if version[0] == 2:
+        assert numBytesFrameNumber == 4
+        assert numBytesQuality == 1
+        assert numBytesStatus == 1
+        format2BlockSize = calcsize('<IBB')
+        (frameNumber, quality, status) = unpack_from('<IBB', file.read(format2BlockSize))
+        logging.debug("FrameNumber: %s", frameNumber)
+        logging.debug("Data quality: %s", quality)
+        logging.debug("Device status: %s", status)
+
+    buffer_dist = file.read(numBytesDistance)
+    buffer_ints = file.read(numBytesIntensity)
+    buffer_cnfi = file.read(numBytesConfidence)
+
+    distData = np.reshape(np.frombuffer(buffer_dist, myXMLParser.distType), (nRows, nCols))
+    intsData = np.reshape(np.frombuffer(buffer_ints, myXMLParser.intsType), (nRows, nCols))
+    cnfiData = None
+    if cnfiType != None:
+        cnfiData = np.reshape(np.frombuffer(buffer_cnfi, cnfiType), (nRows, nCols))
+
+    if not ssrFixup:
+        # TOF: skip crc and framelength
+        unpack_from("<I",file.read(4))
+        unpack_from("<I",file.read(4))
+
+    return distData, intsData, cnfiData
+
+
+def packBlobFrame(xmlSegment, binarySegment, overlaySegment=b'', changedCounter=0):
+    """
+    Packs the segments into a BLOB frame as it is sent by the device on the streaming channel
+    (the inverse of Data.read()).
 
-    file.close()
+    changedCounter: Changed counter reported for every segment.
+    """
+    numSegments = 3
+    segmentTableLength = 4 + numSegments * 8  # segid, numSegments, (offset, changedCounter) per segment
+    offsets = []
+    position = segmentTableLength
+    for segment in (xmlSegment, binarySegment, overlaySegment):
+        offsets.append(position)
+        position += len(segment)
+
+    # pkgLength counts everything after the length field except the checksum
+    pkgLength = 3 + position
+    frame = bytearray(pack('>IIHB', 0x02020202, pkgLength, 0x0001, 0x62))
+    frame += pack('>HH', 1, numSegments)
+    for segmentOffset in offsets:
+        frame += pack('>II', segmentOffset, changedCounter)
+    frame += xmlSegment
+    frame += binarySegment
+    frame += overlaySegment
+    frame += b'E'  # checksum expected by Data.read()
+    return frame
+
+
+def readSsrBlobFrames(filename, changedCounter=0):
+    """
+    Reads all frames of a (TOF) SSR file and returns them as BLOB frames which can be passed
+    to Data.read(), e.g. to replay a recording without a device.
+    """
+    archive = zipfile.ZipFile(filename, 'r')
 
-    if convertToMM:
-        distData = convertDistanceToMM(distData, myXMLParser)
+    xmlFile = archive.read('main.xml')
+    try:
+        overlayFile = archive.read('data/overlay.xml')
+    except KeyError:
+        overlayFile = b''
 
-    return distData, intsData, cnfiData, myCamParams, myXMLParser.stereo
+    myXMLParser = Data.XMLParser()
+    myXMLParser.parse(xmlFile)
+    binData = archive.read('data/' + myXMLParser.binFileName)
+    archive.close()
+
+    frames = []
+    position = 0
+    for i in range(myXMLParser.availableFrames):
+        binFrameLength = unpack_from("<I", binData, position)[0]
+        if binFrameLength != (myXMLParser.getFrameLengthDepthMap() + 8):
+            logging.error("SSR file %s uses the broken stereo format, can not repack it as BLOB frames", filename)
+            return []
+        # the binary segment of a BLOB has the same layout as a frame in the SSR file
+        recordLength = binFrameLength + 4
+        frames.append(packBlobFrame(xmlFile, binData[position:position + recordLength], overlayFile, changedCounter))
+        position += recordLength
+
+    return frames
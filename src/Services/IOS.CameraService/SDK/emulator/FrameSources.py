@@ -0,0 +1,154 @@
+"""
+@Description :   模拟器的帧源：回放SSR录像中的帧，或由合成场景(地面+箱体)生成深度帧
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import struct
+import time
+
+import numpy as np
+
+from common.Streaming.BinaryParser import compileDepthMapDtype
+from common.data_io.SsrLoader import packBlobFrame, readSsrBlobFrames
+
+BLOB_HEAD_LEN = 11
+
+
+def encodeTimeStamp(seconds=None):
+    """
+    将时间(秒，UTC)编码为设备帧头中的位域时间戳，为common.Streaming.BinaryParser.decodeTimeStamp的逆运算
+    """
+    if seconds is None:
+        seconds = time.time()
+    t = time.gmtime(seconds)
+    ms = int((seconds - int(seconds)) * 1000)
+    return ((t.tm_year & 0xFFF) << 47) | ((t.tm_mon & 0xF) << 43) | ((t.tm_mday & 0x1F) << 38) | \
+        ((t.tm_hour & 0x1F) << 22) | ((t.tm_min & 0x3F) << 16) | ((t.tm_sec & 0x3F) << 10) | (ms & 0x3FF)
+
+
+def binarySegmentOffset(frame):
+    """返回BLOB帧中二进制段(深度图记录)的起始位置"""
+    numSegments, = struct.unpack_from('>H', frame, BLOB_HEAD_LEN + 2)
+    offsets = struct.unpack_from('>%uI' % (numSegments * 2), frame, BLOB_HEAD_LEN + 4)
+    return offsets[2] + BLOB_HEAD_LEN
+
+
+def patchFrame(frame, frameNumber, timeStamp):
+    """
+    改写BLOB帧中深度图记录的时间戳和帧号(就地修改)
+    记录头: length(uint32) timestamp(uint64) version(uint16) [frameNumber(uint32)]
+    """
+    offset = binarySegmentOffset(frame)
+    struct.pack_into('<Q', frame, offset + 4, timeStamp)
+    version, = struct.unpack_from('<H', frame, offset + 12)
+    if version == 2:
+        struct.pack_into('<I', frame, offset + 14, frameNumber & 0xFFFFFFFF)
+    return frame
+
+
+class SsrFrameSource:
+    """循环回放SSR录像(如sample_data/visionaryT_sample.ssr)中的帧"""
+
+    def __init__(self, filename):
+        self.frames = readSsrBlobFrames(filename)
+        if not self.frames:
+            raise ValueError("SSR文件中没有可回放的帧: {}".format(filename))
+        self.deviceName = "Visionary-T"
+        self._index = 0
+
+    def nextFrame(self, frameNumber, timeStamp):
+        frame = bytearray(self.frames[self._index % len(self.frames)])
+        self._index += 1
+        return patchFrame(frame, frameNumber, timeStamp)
+
+
+_SYNTHETIC_XML = """<?xml version="1.0" encoding="UTF-8"?><SickRecord><Revision>SICK V1.00</Revision><DataSets>\
+<DataSetDepthMap id="1" datacount="1"><DeviceDescription><Family>V3SXX5-1</Family><Ident>{ident}</Ident>\
+<Version>V0.0.0</Version></DeviceDescription><FormatDescriptionDepthMap><TimestampUTC/><Version>uint16</Version>\
+<DataStream><Interleaved>false</Interleaved><Width>{width}</Width><Height>{height}</Height>\
+<CameraToWorldTransform>{cam2world}</CameraToWorldTransform>\
+<CameraMatrix><FX>{fx}</FX><FY>{fy}</FY><CX>{cx}</CX><CY>{cy}</CY></CameraMatrix>\
+<CameraDistortionParams><K1>{k1}</K1><K2>{k2}</K2><P1>0.0</P1><P2>0.0</P2><K3>0.0</K3></CameraDistortionParams>\
+<FocalToRayCross>{f2rc}</FocalToRayCross>{frameInfo}<Distance decimalexponent="0" min="0" max="65535">uint16</Distance>\
+<Intensity type="Amplitude" decimalexponent="0" min="0" max="65535">uint16</Intensity>\
+<Confidence min="0" max="65535">uint16</Confidence></DataStream></FormatDescriptionDepthMap>\
+<DataLink><FileName>data.bin</FileName></DataLink></DataSetDepthMap></DataSets></SickRecord>"""
+# 格式版本2的深度图记录中帧号、质量和状态字段的描述
+_FRAME_INFO_XML = "<FrameNumber>uint32</FrameNumber><Quality>uint8</Quality><Status>uint8</Status>"
+
+
+class SyntheticFrameSource:
+    """
+    合成场景帧源：相机竖直向下安装在地面上方camera_height处，视野中心放置一个箱体。
+    输出格式与Visionary-T Mini一致(距离单位1/4毫米，置信度为状态图，0表示有效)。
+    """
+
+    def __init__(self, width=512, height=424, camera_height=2000.0, box_size=(600.0, 400.0), box_height=300.0,
+                 noise_mm=2.0, fx=366.0, fy=366.0, k1=0.0, k2=0.0, f2rc=0.0, seed=None, version=2):
+        """
+        Args:
+            width, height (int): 图像尺寸
+            camera_height (float): 相机到地面的高度(毫米)
+            box_size (tuple): 箱体长宽(毫米)
+            box_height (float): 箱体高度(毫米)
+            noise_mm (float): 距离噪声标准差(毫米)
+            fx, fy, k1, k2, f2rc (float): 相机内参
+            version (int): 深度图记录的格式版本，1为没有帧号、质量和状态的旧格式
+        """
+        self.deviceName = "Visionary-T Mini CX"
+        self.width = width
+        self.height = height
+        self.noise_mm = noise_mm
+        self.version = version
+        self._rng = np.random.default_rng(seed)
+        cx, cy = width / 2.0, height / 2.0
+        # 相机坐标z朝下，世界坐标z朝上且地面为0
+        cam2world = [1.0, 0.0, 0.0, 0.0,
+                     0.0, -1.0, 0.0, 0.0,
+                     0.0, 0.0, -1.0, camera_height,
+                     0.0, 0.0, 0.0, 1.0]
+        xml = _SYNTHETIC_XML.format(ident=self.deviceName, width=width, height=height,
+                                    cam2world=''.join('<value>{:f}</value>'.format(v) for v in cam2world),
+                                    fx=fx, fy=fy, cx=cx, cy=cy, k1=k1, k2=k2, f2rc=f2rc,
+                                    frameInfo=_FRAME_INFO_XML if version == 2 else "")
+        self.xmlSegment = xml.encode('utf-8')
+
+        # 按SDK的相机模型计算每个像素射线的s0，距离 = (z_cam + f2rc) * s0
+        u, v = np.meshgrid(np.arange(width), np.arange(height))
+        xp = (cx - u) / fx
+        yp = (cy - v) / fy
+        r2 = xp * xp + yp * yp
+        k = 1 + k1 * r2 + k2 * r2 * r2
+        xd = xp * k
+        yd = yp * k
+        s0 = np.sqrt(xd * xd + yd * yd + 1)
+        z_cam = np.full((height, width), camera_height)
+        # 箱体顶面在相机坐标中的范围
+        z_top = camera_height - box_height
+        x_cam = xd * (z_top + f2rc)
+        y_cam = yd * (z_top + f2rc)
+        on_box = (np.abs(x_cam) <= box_size[0] / 2.0) & (np.abs(y_cam) <= box_size[1] / 2.0)
+        z_cam[on_box] = z_top
+        self.distance_mm = (z_cam + f2rc) * s0
+        self.intensity = np.where(on_box, 2500, 1200).astype('<u2')
+
+        frameInfoBytes = (4, 1, 1) if version == 2 else (0, 0, 0)
+        self.dtype = compileDepthMapDtype(*frameInfoBytes, width * height * 2, width * height * 2, 2,
+                                          width * height * 2, width, height)
+        self._record = np.zeros(1, dtype=self.dtype)
+        self._record['length'] = self.dtype.itemsize - 4
+        self._record['lengthAtEnd'] = self.dtype.itemsize - 4
+        self._record['version'] = version
+        self._record['intensity'][0] = self.intensity
+
+    def nextFrame(self, frameNumber, timeStamp):
+        distance = self.distance_mm
+        if self.noise_mm > 0:
+            distance = distance + self._rng.normal(0.0, self.noise_mm, distance.shape)
+        # Visionary-T Mini的距离单位为1/4毫米
+        self._record['distance'][0] = np.clip(np.rint(distance * 4.0), 0, 65535)
+        self._record['timestamp'] = timeStamp
+        if self.version == 2:
+            self._record['frameNumber'] = frameNumber & 0xFFFFFFFF
+        return bytearray(packBlobFrame(self.xmlSegment, self._record.tobytes()))
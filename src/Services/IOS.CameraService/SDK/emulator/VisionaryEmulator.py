@@ -0,0 +1,471 @@
+"""
+@Description :   本地Visionary相机模拟器，用于无真实相机时的性能测试和回归测试。
+                 控制端口实现CoLa2的会话、登录、设备标识、帧周期、BLOB传输配置以及开始/停止/单步命令，
+                 数据端口按设定帧率发送BLOB帧(TCP，或UDP分片)，可注入延迟、抖动和丢包。
+                 在SDK目录下运行: python -m emulator.VisionaryEmulator --source ssr
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import argparse
+import collections
+import hashlib
+import logging
+import os
+import random
+import socket
+import struct
+import threading
+import time
+
+from common.Protocol.Cola2 import Cola2
+from common.Protocol.ColaBase import ColaBase
+from emulator.FrameSources import SsrFrameSource, SyntheticFrameSource, encodeTimeStamp
+
+logger = logging.getLogger(__name__)
+
+# CoLa错误码，见common/Protocol/ColaErrors.py
+COLA_ERROR_ACCESS_DENIED = 0x0001
+COLA_ERROR_UNKNOWN_METHOD = 0x0002
+COLA_ERROR_UNKNOWN_VARIABLE = 0x0003
+COLA_ERROR_UNKNOWN_SESSION = 0x0022
+
+USER_LEVEL_NAMES = ["Run", "Operator", "Maintenance", "AuthorizedClient", "Service"]
+DEFAULT_PASSWORDS = {3: "CLIENT", 4: "CUST_SERV"}
+
+UDP_HEADER_LEN = 14
+UDP_FLAG_LAST_FRAGMENT = 0x80
+
+DEFAULT_SSR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "sick_visionary_python_samples", "sample_data", "visionaryT_sample.ssr")
+
+
+class NetworkConditions:
+    """
+    注入的网络条件：固定延迟、均匀分布抖动和丢包率(TCP为整帧丢弃，UDP为分片丢弃)；
+    UDP分片还可以重复发送(duplicate)或与下一个分片交换顺序(reorder)
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, loss=0.0, seed=None, duplicate=0.0, reorder=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss = loss
+        self.duplicate = duplicate
+        self.reorder = reorder
+        self._random = random.Random(seed)
+
+    def delay_s(self):
+        jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms > 0 else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+    def lost(self):
+        return self.loss > 0 and self._random.random() < self.loss
+
+    def duplicated(self):
+        return self.duplicate > 0 and self._random.random() < self.duplicate
+
+    def reordered(self):
+        return self.reorder > 0 and self._random.random() < self.reorder
+
+
+class VisionaryEmulator:
+    """
+    模拟一台Visionary相机：
+    - 控制端口(默认2122)：CoLa2协议，支持QtVisionSick.connect()/get_frame()/disconnect()用到的全部命令
+    - 数据端口(默认2114)：TCP BLOB流；写入BlobTransportProtocolAPI=1后改为向BlobUdpReceiverIPAPI发送UDP分片
+    """
+
+    def __init__(self, frame_source, host="127.0.0.1", control_port=2122, streaming_port=2114,
+                 frame_period_us=33333, conditions=None):
+        """
+        Args:
+            frame_source: 帧源，SsrFrameSource或SyntheticFrameSource
+            host (str): 监听地址
+            control_port (int): CoLa2控制端口
+            streaming_port (int): BLOB数据端口
+            frame_period_us (int): 初始帧周期(微秒)，可通过framePeriodUs变量修改
+            conditions (NetworkConditions): 注入的网络条件
+        """
+        self.frame_source = frame_source
+        self.host = host
+        self.control_port = control_port
+        self.conditions = conditions or NetworkConditions()
+        self.variables = {
+            b'DeviceIdent': self._flexstring(frame_source.deviceName.encode('utf-8')) + self._flexstring(b'V1.0.0 emulator'),
+            b'framePeriodUs': struct.pack('>I', frame_period_us),
+            b'BlobTransportProtocolAPI': struct.pack('>B', 0),
+            b'BlobTcpPortAPI': struct.pack('>H', streaming_port),
+            b'BlobUdpReceiverPortAPI': struct.pack('>H', streaming_port),
+            b'BlobUdpReceiverIPAPI': self._flexstring(b'127.0.0.1'),
+            b'BlobUdpControlPortAPI': struct.pack('>H', streaming_port),
+            b'BlobUdpMaxPacketSizeAPI': struct.pack('>H', 1024),
+            b'BlobUdpIdleTimeBetweenPacketsAPI': struct.pack('>H', 0),
+            b'BlobUdpHeartbeatInterval': struct.pack('>I', 0),
+            b'BlobUdpHeaderEnabled': struct.pack('>?', True),
+            b'BlobUdpFECEnabled': struct.pack('>?', False),
+            b'BlobUdpAutoTransmit': struct.pack('>?', True),
+            b'enDepthAPI': struct.pack('>?', True),
+            b'integrationTimeUs': struct.pack('>I', 1000),
+        }
+        # 采集状态
+        self._state_lock = threading.Condition()
+        self._playing = False
+        self._single_steps = 0
+        self._frame_number = 0
+        self._running = False
+        self._threads = []
+        self._control_server = None
+        self._stream_server = None
+        self._stream_clients = []
+        self._udp_socket = None
+        self._outgoing = collections.deque()  # (发送时刻, 帧号, 帧)
+        self._outgoing_lock = threading.Condition()
+        # 统计
+        self.stats = collections.Counter()
+
+    # ------------------------------------------------------------------ 生命周期
+    def start(self):
+        """启动控制端口、数据端口和采集/发送线程"""
+        self._running = True
+        self._control_server = self._listen(self.control_port)
+        self._stream_server = self._listen(self.streaming_port)
+        self._udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for target, name in ((self._accept_control, "EmulatorControl"),
+                             (self._accept_stream, "EmulatorStreamAccept"),
+                             (self._acquisition_loop, "EmulatorAcquisition"),
+                             (self._transmit_loop, "EmulatorTransmit")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("模拟器已启动: 控制端口 %s:%d, 数据端口 %d", self.host, self.control_port, self.streaming_port)
+
+    def stop(self):
+        self._running = False
+        with self._state_lock:
+            self._state_lock.notify_all()
+        with self._outgoing_lock:
+            self._outgoing_lock.notify_all()
+        for sock in [self._control_server, self._stream_server, self._udp_socket] + self._stream_clients:
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+        for thread in self._threads:
+            thread.join(2.0)
+        self._threads = []
+        logger.info("模拟器已停止，统计: %s", dict(self.stats))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def streaming_port(self):
+        return struct.unpack('>H', self.variables[b'BlobTcpPortAPI'])[0]
+
+    @property
+    def frame_period_s(self):
+        return struct.unpack('>I', self.variables[b'framePeriodUs'])[0] / 1e6
+
+    def _listen(self, port):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((self.host, port))
+        server.listen(4)
+        server.settimeout(0.5)
+        return server
+
+    # ------------------------------------------------------------------ CoLa2控制通道
+    def _accept_control(self):
+        while self._running:
+            try:
+                client, address = self._control_server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            logger.info("控制连接: %s", address)
+            thread = threading.Thread(target=self._serve_control, args=(client,), name="EmulatorSession", daemon=True)
+            thread.start()
+
+    def _serve_control(self, client):
+        session = {'id': 0, 'level': 0, 'challenge': None}
+        try:
+            while self._running:
+                request = self._recv_request(client)
+                if request is None:
+                    break
+                session_id, request_id, cmd, mode, body = request
+                response = self._handle(session, session_id, cmd, mode, body)
+                response_cmd, response_mode, payload = response
+                message = Cola2.HEADER.pack(session['id'], request_id, response_cmd, response_mode) + payload
+                client.sendall(ColaBase.START_STX + struct.pack('>IBB', len(message) + 2, 0, 0) + message)
+        except OSError as e:
+            logger.debug("控制连接断开: %s", e)
+        finally:
+            client.close()
+
+    @staticmethod
+    def _recv_exactly(sock, length):
+        data = bytearray()
+        while len(data) < length:
+            chunk = sock.recv(length - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return bytes(data)
+
+    def _recv_request(self, client):
+        header = self._recv_exactly(client, 8)
+        if header is None:
+            return None
+        if header[:4] != ColaBase.START_STX:
+            raise OSError("CoLa2帧起始符错误")
+        length, = struct.unpack_from('>I', header, 4)
+        packet = self._recv_exactly(client, length)
+        if packet is None:
+            return None
+        # 跳过HubCntr和NoC
+        session_id, request_id, cmd, mode = Cola2.HEADER.unpack_from(packet, 2)
+        return session_id, request_id, cmd, mode, packet[2 + Cola2.HEADER.size:]
+
+    def _handle(self, session, session_id, cmd, mode, body):
+        """处理一条CoLa2命令，返回(响应命令, 响应模式, 负载)"""
+        self.stats['commands'] += 1
+        if cmd == b'O' and mode == b'x':
+            session['id'] = random.randint(1, 0x7FFFFFFF)
+            return b'O', b'A', b''
+        if session_id != session['id'] or session['id'] == 0:
+            return b'F', b'A', struct.pack('>H', COLA_ERROR_UNKNOWN_SESSION)
+
+        name, _, data = body.partition(b' ')
+        if cmd == b'R':
+            if name not in self.variables:
+                return b'F', b'A', struct.pack('>H', COLA_ERROR_UNKNOWN_VARIABLE)
+            return b'R', b'A', b' ' + name + b' ' + self.variables[name]
+        if cmd == b'W':
+            if session['level'] < 3:
+                return b'F', b'A', struct.pack('>H', COLA_ERROR_ACCESS_DENIED)
+            self._write_variable(name, data)
+            return b'W', b'A', b' ' + name + b' '
+        if cmd == b'M':
+            result = self._invoke(session, name, data)
+            if result is None:
+                return b'F', b'A', struct.pack('>H', COLA_ERROR_UNKNOWN_METHOD)
+            return b'A', b'N', b' ' + name + b' ' + result
+        return b'F', b'A', struct.pack('>H', COLA_ERROR_UNKNOWN_METHOD)
+
+    def _write_variable(self, name, data):
+        self.variables[name] = data
+        logger.debug("写入变量 %s = %s", name, data)
+        if name == b'BlobTcpPortAPI' and self._stream_server is not None:
+            port = struct.unpack('>H', data)[0]
+            if port != self._stream_server.getsockname()[1]:
+                # 数据端口变化，重新监听
+                old_server = self._stream_server
+                self._stream_server = self._listen(port)
+                old_server.close()
+                logger.info("数据端口改为 %d", port)
+        elif name == b'BlobTransportProtocolAPI':
+            logger.info("传输协议改为 %s", "UDP" if data[:1] == b'\x01' else "TCP")
+
+    def _invoke(self, session, name, data):
+        if name == b'GetChallenge':
+            # SUL1：状态 + 16字节随机数
+            session['challenge'] = os.urandom(16)
+            return struct.pack('>B', 0) + session['challenge']
+        if name == b'SetUserLevel':
+            level = data[32] if len(data) >= 33 else 0
+            ok = session['challenge'] is not None and level in DEFAULT_PASSWORDS and \
+                data[:32] == self._challenge_response(level, session['challenge'])
+            if ok:
+                session['level'] = level
+            return struct.pack('>B', 0 if ok else 1)
+        if name == b'Run':
+            session['level'] = 0
+            return struct.pack('>B', 1)
+        if name in (b'PLAYSTART', b'PLAYSTOP', b'PLAYNEXT'):
+            with self._state_lock:
+                if name == b'PLAYSTART':
+                    self._playing = True
+                elif name == b'PLAYSTOP':
+                    self._playing = False
+                    self._single_steps = 0
+                else:
+                    self._single_steps += 1
+                self._state_lock.notify_all()
+            logger.debug("采集命令 %s", name)
+            return b''
+        if name in (b'GetBlobClientConfig', b'DeviceReInit'):
+            return b''
+        return None
+
+    @staticmethod
+    def _challenge_response(level, challenge):
+        """与Control.calculateChallengeHash相同的计算(SUL1，无salt)"""
+        password = (USER_LEVEL_NAMES[level] + ':SICK Sensor:' + DEFAULT_PASSWORDS[level]).encode('utf-8')
+        pw_hash = hashlib.sha256(password).digest()
+        return hashlib.sha256(pw_hash + challenge).digest()
+
+    @staticmethod
+    def _flexstring(value):
+        return struct.pack('>H', len(value)) + value
+
+    # ------------------------------------------------------------------ BLOB数据通道
+    def _accept_stream(self):
+        while self._running:
+            server = self._stream_server
+            try:
+                client, address = server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                if server is self._stream_server:
+                    break
+                continue  # 数据端口刚被切换
+            logger.info("数据连接: %s", address)
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._stream_clients.append(client)
+            # 客户端可能发送BlbReq，读取并丢弃
+            threading.Thread(target=self._drain, args=(client,), daemon=True).start()
+
+    def _drain(self, client):
+        try:
+            while self._running and client.recv(64):
+                pass
+        except OSError:
+            pass
+
+    def _acquisition_loop(self):
+        """按帧周期生成帧(连续模式)，或每收到一次PLAYNEXT生成一帧(单步模式)"""
+        next_capture = time.monotonic()
+        while self._running:
+            with self._state_lock:
+                while self._running and not self._playing and self._single_steps == 0:
+                    self._state_lock.wait(0.5)
+                    next_capture = time.monotonic()
+                if not self._running:
+                    break
+                if self._single_steps > 0 and not self._playing:
+                    self._single_steps -= 1
+                else:
+                    wait = next_capture - time.monotonic()
+                    if wait > 0:
+                        self._state_lock.wait(wait)
+                        continue
+                    next_capture += self.frame_period_s
+                    # 跟不上帧率时不补发积压的帧
+                    next_capture = max(next_capture, time.monotonic())
+            capture_time = time.time()
+            self._frame_number += 1
+            frame = self.frame_source.nextFrame(self._frame_number, encodeTimeStamp(capture_time))
+            self.stats['frames'] += 1
+            with self._outgoing_lock:
+                due = time.monotonic() + self.conditions.delay_s()
+                if self._outgoing:
+                    due = max(due, self._outgoing[-1][0])  # 帧序不变
+                self._outgoing.append((due, self._frame_number, frame))
+                self._outgoing_lock.notify_all()
+
+    def _transmit_loop(self):
+        while self._running:
+            with self._outgoing_lock:
+                while self._running and not self._outgoing:
+                    self._outgoing_lock.wait(0.5)
+                if not self._running:
+                    break
+                due, frame_number, frame = self._outgoing[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._outgoing_lock.wait(wait)
+                    continue
+                self._outgoing.popleft()
+            if self.variables[b'BlobTransportProtocolAPI'][:1] == b'\x01':
+                self._send_udp(frame, frame_number)
+            else:
+                self._send_tcp(frame)
+
+    def _send_tcp(self, frame):
+        if self.conditions.lost():
+            self.stats['lost_frames'] += 1
+            return
+        for client in list(self._stream_clients):
+            try:
+                client.sendall(frame)
+                self.stats['sent_frames'] += 1
+            except OSError:
+                logger.info("数据连接已断开")
+                self._stream_clients.remove(client)
+                client.close()
+
+    def _send_udp(self, frame, frame_number):
+        ip_length, = struct.unpack_from('>H', self.variables[b'BlobUdpReceiverIPAPI'])
+        receiver = (self.variables[b'BlobUdpReceiverIPAPI'][2:2 + ip_length].decode('utf-8') or '127.0.0.1',
+                    struct.unpack('>H', self.variables[b'BlobUdpReceiverPortAPI'])[0])
+        payload_size = struct.unpack('>H', self.variables[b'BlobUdpMaxPacketSizeAPI'])[0] - UDP_HEADER_LEN
+        blob_number = frame_number & 0xFFFF
+        num_fragments = (len(frame) + payload_size - 1) // payload_size
+        view = memoryview(frame)
+        order = list(range(num_fragments))
+        for position in range(num_fragments - 1):
+            if self.conditions.reordered():
+                order[position], order[position + 1] = order[position + 1], order[position]
+                self.stats['reordered_fragments'] += 1
+        for fragment in order:
+            if self.conditions.lost():
+                self.stats['lost_fragments'] += 1
+                continue
+            flags = UDP_FLAG_LAST_FRAGMENT if fragment == num_fragments - 1 else 0
+            header = struct.pack('<H', blob_number) + struct.pack('>HHB', fragment, 0, flags) + bytes(7)
+            datagram = header + view[fragment * payload_size:(fragment + 1) * payload_size]
+            copies = 1
+            if self.conditions.duplicated():
+                copies = 2
+                self.stats['duplicated_fragments'] += 1
+            try:
+                for _ in range(copies):
+                    self._udp_socket.sendto(datagram, receiver)
+            except OSError as e:
+                logger.warning("UDP发送失败: %s", e)
+                return
+        self.stats['sent_frames'] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local emulator of a SICK Visionary device (CoLa2 + BLOB stream).")
+    parser.add_argument('--host', default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument('-c', '--control_port', type=int, default=2122, help="CoLa2 control port.")
+    parser.add_argument('-s', '--streaming_port', type=int, default=2114, help="BLOB streaming port.")
+    parser.add_argument('--source', choices=['ssr', 'synthetic'], default='ssr', help="Frame source.")
+    parser.add_argument('-f', '--filename', default=DEFAULT_SSR, help="SSR file for --source ssr.")
+    parser.add_argument('--fps', type=float, default=30.0, help="Initial frame rate.")
+    parser.add_argument('--latency_ms', type=float, default=0.0, help="Injected latency per frame.")
+    parser.add_argument('--jitter_ms', type=float, default=0.0, help="Uniform jitter added to the latency.")
+    parser.add_argument('--loss', type=float, default=0.0, help="Loss probability (frames for TCP, fragments for UDP).")
+    parser.add_argument('--duplicate', type=float, default=0.0, help="Probability that a UDP fragment is sent twice.")
+    parser.add_argument('--reorder', type=float, default=0.0,
+                        help="Probability that a UDP fragment is swapped with the next one.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    source = SsrFrameSource(args.filename) if args.source == 'ssr' else SyntheticFrameSource()
+    emulator = VisionaryEmulator(source, args.host, args.control_port, args.streaming_port,
+                                 frame_period_us=int(1e6 / args.fps),
+                                 conditions=NetworkConditions(args.latency_ms, args.jitter_ms, args.loss,
+                                                              duplicate=args.duplicate, reorder=args.reorder))
+    emulator.start()
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
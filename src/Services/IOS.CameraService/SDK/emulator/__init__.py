@@ -0,0 +1,5 @@
+"""
+@Description :   Local emulator of a SICK Visionary device for offline benchmarking
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
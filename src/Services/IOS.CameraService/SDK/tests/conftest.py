@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   pytest configuration: the tests import the SDK packages (common, emulator) like the SDK itself.
+                 Run in the SDK directory: python -m pytest -q tests
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import os
+import socket
+import sys
+
+import pytest
+
+SDK_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SDK_DIRECTORY not in sys.path:
+    sys.path.insert(0, SDK_DIRECTORY)
+
+
+def freePort():
+    """ Returns a TCP/UDP port number which is free at the moment """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as tcp:
+        tcp.bind(("127.0.0.1", 0))
+        port = tcp.getsockname()[1]
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+        udp.bind(("127.0.0.1", port))
+    return port
+
+
+@pytest.fixture
+def emulatedCamera(tmp_path):
+    """ Factory of connected QtVisionSick instances, each streaming from its own VisionaryEmulator """
+    from SickSDK import QtVisionSick
+    from emulator.FrameSources import SyntheticFrameSource
+    from emulator.VisionaryEmulator import VisionaryEmulator
+
+    started = []
+
+    def connect(frameSource=None, conditions=None, framePeriodUs=10000, **cameraOptions):
+        controlPort, streamingPort = freePort(), freePort()
+        emulator = VisionaryEmulator(frameSource or SyntheticFrameSource(seed=0), control_port=controlPort,
+                                     streaming_port=streamingPort, frame_period_us=framePeriodUs,
+                                     conditions=conditions)
+        emulator.start()
+        cameraOptions.setdefault('ray_table_directory', str(tmp_path))
+        camera = QtVisionSick(ipAddr="127.0.0.1", port=controlPort, **cameraOptions)
+        camera.streaming_port = streamingPort
+        started.append((emulator, camera))
+        assert camera.connect()
+        return camera
+
+    yield connect
+    for emulator, camera in started:
+        try:
+            camera.disconnect()
+        finally:
+            emulator.stop()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Camera hub: the receive buffers of released, evicted and dropped frames go back to the frame pool.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import time
+
+from common.CameraHub import CameraHub, releaseFrameset
+
+FRAMES = 30
+
+
+def startHub(camera, **options):
+    hub = CameraHub(**options)
+    hub.addCamera("camera", camera.streaming_device, camera.parser_context)
+    hub.start()
+    return hub
+
+
+def test_released_framesets_reuse_the_frame_buffers(emulatedCamera):
+    camera = emulatedCamera()
+    hub = startHub(camera)
+    try:
+        for _ in range(FRAMES):
+            frameset = hub.getFrameset(timeout=5.0)
+            assert frameset["camera"].data.depthmap.distance.shape == (424, 512)
+            releaseFrameset(frameset)
+    finally:
+        hub.stop()
+    statistics = hub.getStatistics()["camera"]
+    assert statistics["decoded"] >= FRAMES
+    assert camera.streaming_device.framePool.allocatedFrames <= 4
+
+
+def test_evicted_framesets_are_released(emulatedCamera):
+    camera = emulatedCamera()
+    hub = startHub(camera, maxQueuedFramesets=1)
+    try:
+        deadline = time.time() + 10.0
+        while hub.droppedFramesets < FRAMES and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        hub.stop()
+    assert hub.droppedFramesets >= FRAMES
+    # the queued frameset, a frame being decoded and a frame being received
+    assert camera.streaming_device.framePool.allocatedFrames <= 4
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Frame recorder: frames written by FrameRecorder are read back unchanged by FrameCaptureReader, the
+                 segments rotate and the oldest are deleted when the disk budget is reached.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import os
+
+import numpy as np
+
+from common.Streaming import Data
+from common.data_io.FrameRecorder import FrameCaptureReader, FrameRecorder, listSegments
+from emulator.FrameSources import SyntheticFrameSource
+
+
+def syntheticFrames(count):
+    source = SyntheticFrameSource(width=64, height=53, seed=0)
+    return [source.nextFrame(number, 0) for number in range(1, count + 1)]
+
+
+def test_recorded_frames_are_read_back_unchanged(tmp_path):
+    frames = syntheticFrames(10)
+    with FrameRecorder(str(tmp_path), queueSize=len(frames)) as recorder:
+        for number, frame in enumerate(frames):
+            assert recorder.record(frame, 1000.0 + number)
+    assert recorder.recordedFrames == len(frames) and recorder.droppedFrames == 0
+
+    with FrameCaptureReader(str(tmp_path)) as reader:
+        assert len(reader) == len(frames)
+        for frame, recorded in zip(frames, reader):
+            assert bytes(recorded) == bytes(frame)
+        assert list(reader.index['frameNumber']) == list(range(1, 11))
+        assert np.allclose(reader.index['receiveTime'], 1000.0 + np.arange(10))
+        position = reader.findFrameNumber(7)
+        myData = Data.Data()
+        myData.read(reader[position], asNumpy=True)
+        assert myData.depthmap.frameNumber == 7
+        assert myData.depthmap.distance.shape == (53, 64)
+
+
+def test_segments_rotate_within_the_disk_budget(tmp_path):
+    frames = syntheticFrames(20)
+    frameSize = len(frames[0])
+    # three frames per segment, the budget holds a closed and the current segment
+    with FrameRecorder(str(tmp_path), segmentSize=3 * frameSize, diskBudget=7 * frameSize,
+                       queueSize=len(frames)) as recorder:
+        for frame in frames:
+            recorder.record(frame, None)
+    assert recorder.recordedFrames == 20
+    assert recorder.deletedSegments == 5
+
+    segments = listSegments(str(tmp_path))
+    assert [os.path.basename(path) for path in segments] == ['capture_000005.blob', 'capture_000006.blob']
+    assert sum(os.path.getsize(path) for path in segments) <= 7 * frameSize
+    with FrameCaptureReader(str(tmp_path)) as reader:
+        assert list(reader.index['frameNumber']) == list(range(16, 21))
+        assert bytes(reader[len(reader) - 1]) == bytes(frames[-1])
+
+    # a new recorder continues after the newest segment
+    with FrameRecorder(str(tmp_path), segmentSize=3 * frameSize, diskBudget=7 * frameSize) as recorder:
+        recorder.record(frames[0], None)
+    assert os.path.basename(listSegments(str(tmp_path))[-1]) == 'capture_000007.blob'
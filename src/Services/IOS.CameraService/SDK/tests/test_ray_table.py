@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Ray table cache: an unreadable cache file is recomputed and overwritten.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from common.PointCloud.RayTable import RayTable, RayTableCache
+from common.Streaming import Data
+from emulator.FrameSources import SyntheticFrameSource
+
+
+@pytest.fixture
+def cameraParams():
+    myData = Data.Data()
+    myData.read(SyntheticFrameSource(seed=0).nextFrame(1, 0), asNumpy=True)
+    return myData.cameraParams
+
+
+@pytest.mark.parametrize('damage', ['truncate', 'empty', 'garbage'])
+def test_unreadable_cache_file_is_recomputed(tmp_path, cameraParams, damage):
+    expected = RayTableCache(str(tmp_path)).get(cameraParams, withCam2world=True)
+    filename, = glob.glob(os.path.join(str(tmp_path), '*.npz'))
+    size = os.path.getsize(filename)
+    with open(filename, 'r+b') as f:
+        if damage == 'truncate':
+            f.truncate(size // 2)
+        elif damage == 'empty':
+            f.truncate(0)
+        else:
+            f.write(b'\xff' * 64)
+
+    table = RayTableCache(str(tmp_path)).get(cameraParams, withCam2world=True)
+    assert np.array_equal(table.rayZ, expected.rayZ)
+    # the file was overwritten with a readable table
+    reloaded = RayTable.load(filename, table.key, table.cam2world)
+    assert reloaded is not None and np.array_equal(reloaded.worldRay, expected.worldRay)
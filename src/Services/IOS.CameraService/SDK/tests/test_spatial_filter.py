@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Spatial filter: the median stage only rewrites valid pixels, holes stay holes without inpainting.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import numpy as np
+
+from common.Filtering.SpatialFilter import SpatialDepthFilter
+
+
+def distanceWithHoles():
+    distance = np.full((32, 32), 4000, dtype=np.uint16)
+    distance[:, 16:] = 4040
+    holes = np.zeros(distance.shape, dtype=bool)
+    holes[10, 10] = holes[20, 16] = holes[5:7, 25:27] = True
+    distance[holes] = 0
+    return distance, holes
+
+
+def test_median_does_not_fill_holes():
+    distance, holes = distanceWithHoles()
+    spatialFilter = SpatialDepthFilter(medianSize=3, bilateralDiameter=5, inpaintRadius=0)
+    output = spatialFilter.apply(distance)
+    assert np.all(output[holes] == 0)
+    # the input of the bilateral stage (the median result) has no values in the holes either
+    assert np.all(spatialFilter._float[holes] == 0)
+    assert np.all(output[~holes] > 0)
+
+
+def test_median_keeps_values_of_valid_pixels():
+    distance, holes = distanceWithHoles()
+    output = SpatialDepthFilter(medianSize=3).apply(distance)
+    assert np.array_equal(output[~holes], distance[~holes])
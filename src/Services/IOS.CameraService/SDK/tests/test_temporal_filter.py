@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   Temporal filter: repeated frames are added once, frames without frame number (old depth map
+                 format, version 1) are always added.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import numpy as np
+
+from SickSDK import QtVisionSick
+from common.Filtering.TemporalFilter import TemporalDepthFilter
+from emulator.FrameSources import SyntheticFrameSource
+
+CAMERA_HEIGHTS = (1000.0, 2000.0, 3000.0)
+
+
+class SequenceStream:
+    """ Streaming stand-in which returns the given frames one after another """
+
+    def __init__(self, frames, acquiring=False):
+        self.frames = frames
+        self.acquiring = acquiring
+        self.frame = None
+        self.consumedSequence = 0
+
+    def isAcquiring(self):
+        return self.acquiring
+
+    def releaseFrame(self, frame):
+        pass
+
+    def getFrame(self):
+        self.frame = self.frames[self.consumedSequence % len(self.frames)]
+        self.consumedSequence += 1
+
+    def get_latest(self, max_age_ms=None):
+        # the acquisition thread has not received a newer frame
+        return self.frame
+
+
+def floorDistances(version):
+    """ One frame per camera height, without noise; returns the frames and the distance of pixel (0, 0) """
+    frames, distances = [], []
+    for cameraHeight in CAMERA_HEIGHTS:
+        source = SyntheticFrameSource(camera_height=cameraHeight, noise_mm=0.0, version=version)
+        frames.append(source.nextFrame(1, 0))
+        distances.append(source.distance_mm[0, 0])
+    return frames, distances
+
+
+def connectedCamera(stream):
+    camera = QtVisionSick(ray_table_directory=None, temporal_filter='median', temporal_filter_frames=3)
+    camera.is_connected = True
+    camera.streaming_device = stream
+    return camera
+
+
+def test_negative_frame_numbers_are_always_added():
+    temporalFilter = TemporalDepthFilter(frames=3, mode='median', jumpThreshold=50.0)
+    for distance in (1000.0, 2000.0, 3000.0):
+        filtered = temporalFilter.update(np.full((4, 4), distance, dtype=np.float32), frameNumber=-1)
+        assert np.allclose(filtered, distance)
+    assert temporalFilter.repeatedFrames == 0
+
+
+def test_repeated_frame_numbers_are_added_once():
+    temporalFilter = TemporalDepthFilter(frames=3, mode='median', jumpThreshold=None)
+    temporalFilter.update(np.full((4, 4), 1000.0, dtype=np.float32), frameNumber=7)
+    filtered = temporalFilter.update(np.full((4, 4), 4000.0, dtype=np.float32), frameNumber=7)
+    assert np.allclose(filtered, 1000.0)
+    assert temporalFilter.repeatedFrames == 1
+
+
+def test_version1_frames_are_not_frozen():
+    frames, distances = floorDistances(version=1)
+    camera = connectedCamera(SequenceStream(frames))
+    for expected in distances:
+        depth = np.asarray(camera.get_depth_data()).reshape(424, 512)
+        assert abs(depth[0, 0] - expected) < 1.0
+    assert camera.temporal_filter.repeatedFrames == 0
+
+
+def test_latest_frame_of_the_acquisition_thread_is_added_once():
+    frames, distances = floorDistances(version=1)
+    stream = SequenceStream(frames, acquiring=True)
+    camera = connectedCamera(stream)
+    stream.getFrame()
+    for _ in range(3):
+        camera.get_depth_data()
+    assert camera.temporal_filter.repeatedFrames == 2
+    stream.getFrame()
+    depth = np.asarray(camera.get_depth_data()).reshape(424, 512)
+    assert abs(depth[0, 0] - distances[1]) < 1.0
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+@Description :   UDP transport: reassembly of BLOB fragments which arrive out of order, twice, not at all or with
+                 wrapped blob numbers, directly and streamed through the emulator with injected network conditions.
+@Author      :   Cao Yingjie
+@Time        :   2026/10/16
+"""
+
+import socket
+import struct
+
+import numpy as np
+import pytest
+
+from common.Stream import UdpStreaming
+from emulator.FrameSources import SyntheticFrameSource
+from emulator.VisionaryEmulator import NetworkConditions, UDP_FLAG_LAST_FRAGMENT
+from tests.conftest import freePort
+
+PAYLOAD_SIZE = 200
+
+
+def fragmentsOf(frame, blobNumber):
+    """ Datagrams of one BLOB as sent by the device (header of UdpStreaming.UDP_HEADER_LEN bytes) """
+    count = (len(frame) + PAYLOAD_SIZE - 1) // PAYLOAD_SIZE
+    datagrams = []
+    for fragment in range(count):
+        flags = UDP_FLAG_LAST_FRAGMENT if fragment == count - 1 else 0
+        header = struct.pack('<H', blobNumber) + struct.pack('>HHB', fragment, 0, flags) + bytes(7)
+        datagrams.append(header + bytes(frame[fragment * PAYLOAD_SIZE:(fragment + 1) * PAYLOAD_SIZE]))
+    return datagrams
+
+
+@pytest.fixture
+def udpStream():
+    stream = UdpStreaming('127.0.0.1', freePort(), receiveBufferSize=1024 * 1024)
+    stream.openStream()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    yield stream, lambda datagrams: [sender.sendto(datagram, ('127.0.0.1', stream.udpPort))
+                                     for datagram in datagrams]
+    sender.close()
+    stream.sock_stream.close()
+
+
+def test_reassembly_of_reordered_duplicate_lost_and_wrapped_fragments(udpStream):
+    stream, send = udpStream
+    source = SyntheticFrameSource(width=64, height=53, seed=0)
+    frames = [source.nextFrame(number, 0) for number in range(4)]
+
+    # 65534: reversed order and one fragment twice
+    fragments = fragmentsOf(frames[0], 0xFFFE)
+    send(fragments[::-1][:3] + [fragments[-3]] + fragments[::-1][3:])
+    stream.getFrame()
+    assert bytes(stream.frame) == bytes(frames[0])
+
+    # 65535 loses a fragment, it is dropped when blob 0 (after the wrap around) is complete
+    lost = fragmentsOf(frames[1], 0xFFFF)
+    send(lost[:2] + lost[3:])
+    send(fragmentsOf(frames[2], 0))
+    stream.getFrame()
+    assert bytes(stream.frame) == bytes(frames[2])
+
+    # the lost fragment arrives late, blob 1 is still reassembled
+    send(lost[2:3] + fragmentsOf(frames[3], 1))
+    stream.getFrame()
+    assert bytes(stream.frame) == bytes(frames[3])
+
+    assert stream.getStatistics() == {'completeBlobs': 3, 'incompleteBlobs': 1, 'invalidBlobs': 0,
+                                      'lateFragments': 1, 'duplicateFragments': 1}
+
+
+def test_streaming_through_the_emulator_with_network_conditions(emulatedCamera):
+    source = SyntheticFrameSource(width=128, height=106, noise_mm=0.0)
+    conditions = NetworkConditions(jitter_ms=2.0, loss=0.005, duplicate=0.02, reorder=0.05, seed=1)
+    camera = emulatedCamera(source, conditions, framePeriodUs=20000, transport_protocol="UDP",
+                            udp_receiver_ip="127.0.0.1", udp_max_packet_size=1024)
+    frameNumbers = []
+    for _ in range(30):
+        myData = camera.get_parsed_frame()
+        assert myData is not None
+        # the distance is transmitted in 1/4 mm
+        assert np.allclose(myData.depthmap.distance, source.distance_mm, atol=0.125 + 1e-6)
+        frameNumbers.append(myData.depthmap.frameNumber)
+    assert all(later > earlier for earlier, later in zip(frameNumbers, frameNumbers[1:]))
+
+    statistics = camera.streaming_device.getStatistics()
+    assert statistics['completeBlobs'] >= 30
+    assert statistics['incompleteBlobs'] >= 1  # about 1 of 3 frames loses a fragment
+    assert statistics['duplicateFragments'] >= 1
+    assert statistics['invalidBlobs'] == 0
@@ -21,10 +21,35 @@ def on_camera_command(topic: str, data, msg):
       # min_z = camera.get_min_z_coordinate()
       min_z = 2.1
       logger.info(f"开始相机，方向: {direction}, 最小高度: {min_z}")
+      # 调度器等待的结果先发布，不被后面的点云计算延迟
       camera_mqtt.publish("vision/height/result", {"min_height": min_z})
+      # 参考平面高度和体积来自同一帧，只取一次帧
+      my_data = camera.get_parsed_frame()
+      if my_data is None:
+        return
+      # 相对于空输送线参考平面的货物高度，不受相机或输送线轻微移动的影响
+      max_height = camera.get_max_height_above_reference(my_data=my_data)
+      camera_mqtt.publish("vision/height/reference/result", {"max_height": max_height})
+      # 不规则货物的体积估计，单独的结果主题
+      volume = camera.get_volume_statistics(my_data=my_data)
+      if volume is not None:
+        camera_mqtt.publish("vision/volume/result", volume.toDict())
   except Exception as e:
     logger.exception(f"数据非json格式: {e}")
 
+
+def on_reference_command(topic: str, data, msg):
+  # 输送线为空时由调度器触发，学习参考平面并缓存到磁盘，之后只在平面漂移时自动重新估计
+  try:
+    logger.info(f"收到参考平面学习指令: {topic}")
+    plane = camera.learn_reference_plane()
+    result = {"success": plane is not None}
+    if plane is not None:
+      result.update(plane.toDict())
+    camera_mqtt.publish("vision/reference/result", result)
+  except Exception as e:
+    logger.exception(f"学习参考平面失败: {e}")
+
 if __name__ == "__main__":
   logger.info("相机服务启动中...")
   
@@ -51,6 +76,8 @@ if __name__ == "__main__":
     logger.info("订阅MQTT主题...")
     camera_mqtt.subscribe("vision/height", qos=MqttQos.EXACTLY_ONCE, callback=on_camera_command)
     logger.info("成功订阅主题: vision/height")
+    camera_mqtt.subscribe("vision/reference", qos=MqttQos.EXACTLY_ONCE, callback=on_reference_command)
+    logger.info("成功订阅主题: vision/reference")
     
     logger.info("相机服务启动完成，开始等待指令...")
     